@@ -1,63 +1,392 @@
-from flask import Flask
+from flask import Flask, Response, g, jsonify, request
 import joblib
 import os
 import pickle
+import numpy as np
 import pandas as pd
-from lightfm.data import Dataset
 from joblib import load
 import json
+import time
+
+from .ann_index import ItemIndex
+from .cache import ResponseCache
+from .catalog import build_product_catalog, build_user_item_store
+from .columnar import load_dataset
+from .demand import DemandClusterer, create_sample_data
+from .fingerprints import file_sha256
+from .forest import FlatForest, compile_forest, sample_inputs, verify_forest
+from .ingest import TransactionIngestor
+from .json_provider import AppJSONProvider
+from .memstats import pss_bytes, rss_bytes
+from .metrics import (CONTENT_TYPE, REQUEST_BYTES, REQUEST_ERRORS, REQUEST_LATENCY, RESPONSE_BYTES, Gauge,
+                      metrics)
+from .online import InteractionUpdater, fit_interactions, read_interaction_log
+from .registry import ModelRegistry
+from .rollups import SalesRollup
+from .sales_table import load_sales_table
+from .topk_store import open_topk_store
 
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
 
+COLUMNAR_DIR = os.path.join(BASE_DIR, "columnar")
+
 main_dataset_path = os.path.join(BASE_DIR, "retail_data.csv")
-main_dataset_df = pd.read_csv(main_dataset_path)
+main_dataset_columnar_dir = os.path.join(COLUMNAR_DIR, "retail_data")
 
 feature_names_data_path = os.path.join(BASE_DIR, "feature_names.txt")
 user_product_interaction_data_path = os.path.join(BASE_DIR, "user_product_interactions_large.csv")
+user_product_interaction_columnar_dir = os.path.join(COLUMNAR_DIR, "user_product_interactions")
 
 sales_model_path = os.path.join(BASE_DIR, "sales_prediction_model.joblib")
 sales_encoders_path = os.path.join(BASE_DIR, "label_encoders.joblib")
 sales_scaler_path = os.path.join(BASE_DIR, "scaler.joblib")
+sales_table_path = os.path.join(BASE_DIR, "sales_forecast_table.npz")
+
+product_recommendation_model_path = os.path.join(BASE_DIR, "lightfm_model.pkl")
+topk_store_dir = os.path.join(BASE_DIR, "topk_store")
+# Interactions ingested online since the model was trained; see online.py
+online_interactions_path = os.path.join(BASE_DIR, "online_interactions.csv")
+
+customers_path = os.path.join(BASE_DIR, "customers.csv")
 
 churn_model_path = os.path.join(BASE_DIR, "rf_model.joblib")
 churn_feature_path = os.path.join(BASE_DIR, "feature_list.json")
 churn_scalar_path = os.path.join(BASE_DIR, "churn_scaler.joblib")
+churn_forest_path = os.path.join(BASE_DIR, "churn_forest.joblib")
 
+# Every model and dataset is loaded on first use; see registry.py
+registry = ModelRegistry()
+dataset_load_stats = {}
 
-sales_model = joblib.load(sales_model_path)
-sales_encoders = joblib.load(sales_encoders_path)
-sales_scaler = joblib.load(sales_scaler_path)
+metrics.add(Gauge('model_version', 'Model generation currently served', lambda: registry.current.version))
 
-user_product_interaction_df = pd.read_csv(user_product_interaction_data_path)
-user_product_interaction_data = Dataset()
-user_product_interaction_data.fit(
-    users=user_product_interaction_df["user_id"].unique(),
-    items=user_product_interaction_df["product_id"].unique()
+# Responses of deterministic GET routes, keyed by arguments and artifact versions; see cache.py
+response_cache = ResponseCache(
+    registry,
+    max_entries=int(os.getenv('RESPONSE_CACHE_SIZE', 1024)),
+    ttl=float(os.getenv('RESPONSE_CACHE_TTL', 300))
 )
 
-product_recommendation_model_path = os.path.join(BASE_DIR, "lightfm_model.pkl")
 
-with open(feature_names_data_path, 'r') as f:
-    feature_names = f.read().split(',')
+@registry.artifact("main_dataset_df")
+def _load_main_dataset():
+    df, dataset_load_stats["main_dataset_df"] = load_dataset(main_dataset_path, main_dataset_columnar_dir)
+    return df
+
+
+@registry.artifact("sales_rollup")
+def _load_sales_rollup():
+    return SalesRollup.from_frame(registry.get("main_dataset_df"))
+
+
+@registry.artifact("transaction_ingestor")
+def _load_transaction_ingestor():
+    return TransactionIngestor(
+        registry.get("sales_rollup"), main_dataset_path, list(registry.get("main_dataset_df").columns),
+        main_dataset_columnar_dir
+    )
+
+
+@registry.artifact("feature_names")
+def _load_feature_names():
+    with open(feature_names_data_path, 'r') as f:
+        return f.read().split(',')
+
+
+@registry.artifact("sales_model")
+def _load_sales_model():
+    return joblib.load(sales_model_path)
+
+
+@registry.artifact("sales_encoders")
+def _load_sales_encoders():
+    return joblib.load(sales_encoders_path)
+
+
+@registry.artifact("sales_scaler")
+def _load_sales_scaler():
+    return joblib.load(sales_scaler_path)
+
+
+@registry.artifact("sales_table")
+def _load_sales_table():
+    return load_sales_table(
+        sales_table_path, registry.get("sales_model"), sales_model_path, registry.get("feature_names")
+    )
+
+
+@registry.artifact("user_product_interaction_df")
+def _load_user_product_interaction_df():
+    df, dataset_load_stats["user_product_interaction_df"] = load_dataset(
+        user_product_interaction_data_path, user_product_interaction_columnar_dir
+    )
+    return df
+
+
+@registry.artifact("online_interactions")
+def _load_online_interactions():
+    return read_interaction_log(online_interactions_path)
+
+
+def _all_interactions():
+    """The interaction log followed by what was ingested online"""
+    df = registry.get("user_product_interaction_df")
+    online = registry.get("online_interactions")
+    return pd.concat([df, online], ignore_index=True) if len(online) else df
+
+
+@registry.artifact("user_product_interaction_data")
+def _load_user_product_interaction_data():
+    from lightfm.data import Dataset
+
+    df = registry.get("user_product_interaction_df")
+    dataset = Dataset()
+    dataset.fit(
+        users=df["user_id"].unique(),
+        items=df["product_id"].unique()
+    )
+    # Online ids come after the trained ones, so the model's indices stay valid
+    online = registry.get("online_interactions")
+    if len(online):
+        dataset.fit_partial(users=online["user_id"].unique(), items=online["product_id"].unique())
+    return dataset
+
+
+@registry.artifact("product_catalog")
+def _load_product_catalog():
+    return build_product_catalog(_all_interactions(), registry.get("user_product_interaction_data"))
+
+
+@registry.artifact("user_item_store")
+def _load_user_item_store():
+    return build_user_item_store(_all_interactions(), registry.get("user_product_interaction_data"))
+
+
+@registry.artifact("product_recommendation_model")
+def _load_product_recommendation_model():
+    with open(product_recommendation_model_path, "rb") as f:
+        model = pickle.load(f)
+    # Replay what was learned online since the model was trained
+    online = registry.get("online_interactions")
+    if len(online):
+        model = fit_interactions(model, registry.get("user_product_interaction_data"), online)
+    return model
+
+
+@registry.artifact("product_recommendation_model_sha256", depends=("product_recommendation_model",))
+def _load_product_recommendation_model_sha256():
+    return file_sha256(product_recommendation_model_path)
+
+
+@registry.artifact("topk_store")
+def _load_topk_store():
+    # Precomputed from the offline model, which online updates have moved away from
+    if len(registry.get("online_interactions")):
+        return None
+    return open_topk_store(topk_store_dir, registry.get("product_recommendation_model_sha256"))
 
-with open(product_recommendation_model_path, "rb") as f:
-    product_recommendation_model = pickle.load(f)
 
-churn_model = load(churn_model_path)
-churn_scaler = load(churn_scalar_path)
+@registry.artifact("item_index")
+def _load_item_index():
+    return ItemIndex.build(registry.get("product_recommendation_model"))
 
-with open(churn_feature_path, 'r') as f:
-    churn_feature_list = json.load(f)
 
-if isinstance(churn_feature_list, dict):
-    churn_feature_list = list(churn_feature_list.values())
+@registry.artifact("interaction_updater")
+def _load_interaction_updater():
+    return InteractionUpdater(registry, online_interactions_path)
+
+
+@registry.artifact("demand_clusterer")
+def _load_demand_clusterer():
+    if os.path.exists(customers_path):
+        customers = pd.read_csv(customers_path)
+    else:
+        print(f"{customers_path} not found, clustering generated sample customers")
+        customers = create_sample_data(seed=42)
+    return DemandClusterer(customers)
+
+
+@registry.artifact("churn_model")
+def _load_churn_model():
+    # mmap_mode maps the numpy payloads of an uncompressed joblib file instead of reading them into the heap
+    return load(churn_model_path, mmap_mode='r')
+
+
+@registry.artifact("churn_engine", depends=("churn_model",))
+def _load_churn_engine():
+    """Compiled forest from compile_churn_forest.py if it matches rf_model.joblib, else compiled now"""
+    model_sha256 = file_sha256(churn_model_path)
+    if os.path.exists(churn_forest_path):
+        engine = FlatForest.load(churn_forest_path, mmap_mode='r')
+        if engine.model_sha256 == model_sha256:
+            return engine
+        print("Compiled churn forest was built for a different model, recompiling")
+
+    churn_model = registry.get("churn_model")
+    engine = compile_forest(churn_model, model_sha256)
+    check = verify_forest(engine, churn_model, sample_inputs(churn_model, 256))
+    if not check['ok']:
+        print(f"Compiled churn forest disagrees with the model ({check}), using the model")
+        return None
+    return engine
+
+
+@registry.artifact("churn_scaler")
+def _load_churn_scaler():
+    return load(churn_scalar_path)
+
+
+@registry.artifact("churn_feature_list")
+def _load_churn_feature_list():
+    with open(churn_feature_path, 'r') as f:
+        churn_feature_list = json.load(f)
+
+    if isinstance(churn_feature_list, dict):
+        churn_feature_list = list(churn_feature_list.values())
+    return churn_feature_list
+
+
+# Checks a reloaded generation must pass before it is swapped in
+@registry.smoke_test("feature_names", "sales_model", "sales_encoders", "sales_scaler", "sales_table")
+def _check_sales_forecast():
+    from .views import forecast_sales_cube
+
+    if not np.isfinite(forecast_sales_cube([0], [0.0])).all():
+        raise ValueError("Sales forecast is not finite")
+
+
+@registry.smoke_test("product_recommendation_model", "user_product_interaction_data", "topk_store", "item_index")
+def _check_recommendations():
+    from .scoring import score_users
+
+    model = registry.get("product_recommendation_model")
+    if not np.isfinite(score_users(model, [0])).all():
+        raise ValueError("Recommendation scores are not finite")
+    n_users, n_items = registry.get("user_product_interaction_data").interactions_shape()
+    if model.user_embeddings.shape[0] != n_users or model.item_embeddings.shape[0] != n_items:
+        raise ValueError("Recommendation model and dataset mapping disagree on the number of users or items")
+
+
+@registry.smoke_test("churn_model", "churn_engine", "churn_scaler", "churn_feature_list")
+def _check_churn():
+    from .churn import predict_churn_proba, scale_features
+
+    features = scale_features(np.zeros((1, len(registry.get("churn_feature_list")))))
+    probabilities, _ = predict_churn_proba(features)
+    if not np.isfinite(probabilities).all():
+        raise ValueError("Churn probabilities are not finite")
+
+
+# Reloaded by POST /admin/reload-models when no artifacts are named; what was built from them follows
+RELOADABLE_MODELS = (
+    "feature_names", "sales_model", "sales_encoders", "sales_scaler",
+    "product_recommendation_model",
+    "churn_model", "churn_scaler", "churn_feature_list",
+)
+
+
+def __getattr__(name):
+    """Keep `from app import sales_model` style imports working; they load on access"""
+    if name in registry:
+        return registry.get(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def create_app():
     app = Flask(__name__)
     app.config['SECRET_KEY'] = os.getenv('SECRET_KEY')
+    # jsonify accepts NumPy and pandas values directly; see json_provider.py
+    app.json = AppJSONProvider(app)
 
     from .views import views
     app.register_blueprint(views, url_prefix='/')
 
-    return app
\ No newline at end of file
+    @app.route('/models/stats', methods=['GET'])
+    def model_stats():
+        process = {'pid': os.getpid(), 'rss_bytes': rss_bytes(), 'pss_bytes': pss_bytes()}
+        return jsonify({
+            'version': registry.version,
+            'artifacts': registry.load_stats(),
+            'datasets': dataset_load_stats,
+            'process': process,
+            'reload': registry.reload_status
+        })
+
+    # Each request sees one model generation from start to finish, even across a reload
+    @app.before_request
+    def pin_models():
+        g.registry_token = registry.pin()
+        g.model_version = registry.version
+
+    @app.after_request
+    def add_model_version(response):
+        response.headers['X-Model-Version'] = str(g.get('model_version', registry.version))
+        return response
+
+    @app.before_request
+    def start_timer():
+        g.request_start = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        if 'request_start' in g:
+            REQUEST_LATENCY.observe(
+                time.perf_counter() - g.request_start,
+                route=route, method=request.method, status=response.status_code
+            )
+        REQUEST_BYTES.observe(request.content_length or 0, route=route)
+        if not response.is_streamed:
+            RESPONSE_BYTES.observe(response.calculate_content_length() or 0, route=route)
+        if response.status_code >= 500:
+            REQUEST_ERRORS.inc(route=route)
+        return response
+
+    @app.route('/metrics', methods=['GET'])
+    def prometheus_metrics():
+        return Response(metrics.render(), content_type=CONTENT_TYPE)
+
+    @app.teardown_request
+    def unpin_models(exc):
+        token = g.pop('registry_token', None)
+        if token is not None:
+            try:
+                registry.unpin(token)
+            except ValueError:
+                pass
+
+    @app.route('/admin/reload-models', methods=['GET', 'POST'])
+    def reload_models():
+        """
+        POST {"artifacts": [...]} loads and smoke tests a new model generation in the
+        background, then swaps it in; GET reports the progress of the last reload.
+        """
+        if request.method == 'GET':
+            return jsonify({'version': registry.current.version, 'reload': registry.reload_status})
+
+        data = request.get_json(silent=True) or {}
+        names = data.get('artifacts') or list(RELOADABLE_MODELS)
+        unknown = [name for name in names if name not in registry]
+        if unknown:
+            return jsonify({'error': f"Unknown artifacts: {unknown}", 'status': 'error'}), 400
+
+        if not registry.reload(names):
+            return jsonify({'error': 'A reload is already running', 'reload': registry.reload_status}), 409
+        return jsonify({'status': 'reloading', 'reload': registry.reload_status}), 202
+
+    @app.route('/cache/stats', methods=['GET'])
+    def cache_stats():
+        return jsonify(response_cache.stats())
+
+    @app.route('/cache/clear', methods=['POST'])
+    def cache_clear():
+        response_cache.clear()
+        return jsonify(response_cache.stats())
+
+    # MODEL_WARMUP: "lazy" (default) loads on first use, "eager" before serving,
+    # "background" on a thread while the app starts serving
+    warmup = os.getenv('MODEL_WARMUP', 'lazy').lower()
+    if warmup in ('eager', 'background'):
+        registry.warm(background=warmup == 'background')
+
+    return app
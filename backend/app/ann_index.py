@@ -0,0 +1,107 @@
+"""
+Approximate nearest-neighbour item index over the LightFM item embeddings.
+
+An inverted-file (IVF) index: items are clustered with k-means on their
+[embedding, bias] vectors, and a query only scores the items of the n_probe
+clusters whose centroids score highest for that user. n_probe trades recall
+for latency; n_probe == n_lists is exact search.
+"""
+import time
+
+import numpy as np
+
+from .scoring import score_users, top_k
+
+
+def _kmeans(vectors, n_clusters, n_iter, rng):
+    """Plain Lloyd iterations; empty clusters are re-seeded from random points"""
+    centroids = vectors[rng.choice(len(vectors), n_clusters, replace=False)].copy()
+    squared_norms = (vectors ** 2).sum(axis=1)
+    for _ in range(n_iter):
+        distances = squared_norms[:, np.newaxis] - 2 * vectors @ centroids.T + (centroids ** 2).sum(axis=1)
+        labels = distances.argmin(axis=1)
+        counts = np.bincount(labels, minlength=n_clusters)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, vectors)
+        empty = counts == 0
+        centroids[~empty] = sums[~empty] / counts[~empty, np.newaxis]
+        centroids[empty] = vectors[rng.choice(len(vectors), empty.sum())]
+    return centroids, labels
+
+
+class ItemIndex:
+    """IVF index; item vectors are [embedding, bias] and user queries [embedding, 1]"""
+
+    def __init__(self, centroids, list_offsets, list_items, item_vectors, n_probe):
+        self.centroids = centroids
+        self.list_offsets = list_offsets
+        self.list_items = list_items
+        self.item_vectors = item_vectors
+        self.n_probe = n_probe
+
+    @property
+    def n_lists(self):
+        return len(self.centroids)
+
+    @classmethod
+    def build(cls, model, n_lists=None, n_probe=None, n_iter=10, seed=42):
+        item_vectors = np.hstack([model.item_embeddings, model.item_biases[:, np.newaxis]]).astype(np.float32)
+        n_items = len(item_vectors)
+        n_lists = min(n_lists or max(1, int(np.sqrt(n_items))), n_items)
+
+        centroids, labels = _kmeans(item_vectors, n_lists, n_iter, np.random.default_rng(seed))
+
+        order = np.argsort(labels, kind='stable')
+        list_offsets = np.concatenate([[0], np.cumsum(np.bincount(labels, minlength=n_lists))])
+        return cls(centroids, list_offsets, order, item_vectors, n_probe or max(1, n_lists // 8))
+
+    def search(self, model, user_indices, k, n_probe=None, exclude=None):
+        """
+        Top-k item indices and scores for each user, best first. exclude is an
+        optional sequence of per-user arrays of item indices to leave out.
+        Rows with fewer than k candidates are padded with -1 / -inf.
+        """
+        n_probe = min(n_probe or self.n_probe, self.n_lists)
+        user_indices = np.asarray(user_indices)
+        queries = np.hstack([
+            model.user_embeddings[user_indices],
+            np.ones((len(user_indices), 1), dtype=np.float32)
+        ])
+        probes = top_k(queries @ self.centroids.T, n_probe)
+
+        items = np.full((len(user_indices), k), -1, dtype=np.intp)
+        scores = np.full((len(user_indices), k), -np.inf, dtype=np.float32)
+        for row, query in enumerate(queries):
+            candidates = np.concatenate([
+                self.list_items[self.list_offsets[probe]:self.list_offsets[probe + 1]] for probe in probes[row]
+            ])
+            if exclude is not None and len(exclude[row]):
+                candidates = candidates[~np.isin(candidates, exclude[row])]
+            candidate_scores = self.item_vectors[candidates] @ query + model.user_biases[user_indices[row]]
+
+            best = top_k(candidate_scores[np.newaxis, :], k)[0]
+            items[row, :len(best)] = candidates[best]
+            scores[row, :len(best)] = candidate_scores[best]
+        return items, scores
+
+
+def evaluate_recall(index, model, user_indices, k=10, n_probe=None):
+    """recall@k of the index against exact scoring, plus per-query latency of both"""
+    start = time.perf_counter()
+    exact = top_k(score_users(model, user_indices), k)
+    exact_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    approximate, _ = index.search(model, user_indices, k, n_probe)
+    approximate_seconds = time.perf_counter() - start
+
+    hits = sum(len(np.intersect1d(exact[row], approximate[row])) for row in range(len(user_indices)))
+    n_queries = max(len(user_indices), 1)
+    return {
+        'k': k,
+        'n_lists': index.n_lists,
+        'n_probe': min(n_probe or index.n_probe, index.n_lists),
+        'recall': hits / (n_queries * k),
+        'exact_ms_per_query': 1000 * exact_seconds / n_queries,
+        'ann_ms_per_query': 1000 * approximate_seconds / n_queries,
+    }
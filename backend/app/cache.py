@@ -0,0 +1,130 @@
+"""
+In-process response cache for deterministic GET routes.
+
+A cached route's key is its path, its normalized query arguments and a version
+stamp of the artifacts it depends on. The stamp holds each artifact's load time
+and, where the artifact has one, its `version` counter (e.g. SalesRollup after
+an ingest). A reload or a data change therefore moves the route to new keys,
+and the stale entries age out of the LRU. clear() drops everything at once.
+
+Responses carry an ETag (a hash of the body) and Cache-Control, so clients can
+revalidate with If-None-Match and get a 304 without the body.
+"""
+import collections
+import functools
+import hashlib
+import threading
+import time
+
+from flask import Response, make_response, request
+
+
+class CachedResponse:
+    def __init__(self, body, mimetype, etag, expires_at):
+        self.body = body
+        self.mimetype = mimetype
+        self.etag = etag
+        self.expires_at = expires_at
+
+
+class ResponseCache:
+    def __init__(self, registry, max_entries=1024, ttl=300.0, max_age=0):
+        self.registry = registry
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_age = max_age
+        self.entries = collections.OrderedDict()
+        self.counts = collections.Counter()
+        self.lock = threading.Lock()
+        self.generation = 0
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.generation += 1
+            self.counts['invalidations'] += 1
+
+    def version_stamp(self, depends):
+        stamp = []
+        for name in depends:
+            artifact = self.registry.get(name)
+            loaded_at = self.registry.stats.get(name, {}).get('loaded_at')
+            stamp.append((loaded_at, getattr(artifact, 'version', None)))
+        return tuple(stamp)
+
+    def _get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.counts['misses'] += 1
+                return None
+            if entry.expires_at <= time.monotonic():
+                del self.entries[key]
+                self.counts['expired'] += 1
+                self.counts['misses'] += 1
+                return None
+            self.entries.move_to_end(key)
+            self.counts['hits'] += 1
+            return entry
+
+    def _put(self, key, entry):
+        with self.lock:
+            if key[-1] != self.generation:
+                # Cleared while this response was being computed
+                return
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.counts['evictions'] += 1
+
+    def _respond(self, entry):
+        headers = {'Cache-Control': f'private, max-age={self.max_age}' if self.max_age else 'no-cache'}
+        if request.if_none_match.contains(entry.etag):
+            with self.lock:
+                self.counts['not_modified'] += 1
+            response = Response(status=304, headers=headers)
+        else:
+            response = Response(entry.body, mimetype=entry.mimetype, headers=headers)
+        response.set_etag(entry.etag)
+        return response
+
+    def cached(self, depends=(), ttl=None):
+        """
+        Decorator for a GET view whose output only depends on its query arguments
+        and on the registry artifacts named in depends. Only 200 responses are stored.
+        """
+        def decorator(view):
+            @functools.wraps(view)
+            def wrapper(*args, **kwargs):
+                query = tuple(sorted((name, tuple(values)) for name, values in request.args.lists()))
+                key = (request.path, query, self.version_stamp(depends), self.generation)
+
+                entry = self._get(key)
+                if entry is None:
+                    response = make_response(view(*args, **kwargs))
+                    if response.status_code != 200 or response.is_streamed:
+                        return response
+                    body = response.get_data()
+                    etag = hashlib.blake2b(body, digest_size=16).hexdigest()
+                    entry = CachedResponse(body, response.mimetype, etag, time.monotonic() + (ttl or self.ttl))
+                    self._put(key, entry)
+                return self._respond(entry)
+            return wrapper
+        return decorator
+
+    def stats(self):
+        with self.lock:
+            lookups = self.counts['hits'] + self.counts['misses']
+            return {
+                'entries': len(self.entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl,
+                'hits': self.counts['hits'],
+                'misses': self.counts['misses'],
+                'hit_ratio': self.counts['hits'] / lookups if lookups else None,
+                'not_modified': self.counts['not_modified'],
+                'expired': self.counts['expired'],
+                'evictions': self.counts['evictions'],
+                'invalidations': self.counts['invalidations'],
+            }
@@ -0,0 +1,195 @@
+"""
+Bulk recommendation email campaigns.
+
+A campaign is a chain of generators, so one scoring batch and the bounded
+outbox are all that is held in memory however many users are targeted:
+
+    select_users -> recommend_users -> render_emails -> outbox -> sink
+
+The generator chain runs on a producer thread and fills the outbox queue.
+The calling thread drains it into a sink (the SMTP dispatcher, or a file for
+dry runs) at a configurable rate. When sending falls behind, the full outbox
+blocks scoring instead of growing. Items and busy time are recorded per stage.
+"""
+import itertools
+import json
+import queue
+import threading
+import time
+
+from app import registry
+from app.email_templates import RECOMMENDATION_SUBJECT, render_recommendation_email
+from app.views import RECOMMENDATION_BATCH_SIZE, recommend_products_batch
+
+CAMPAIGN_STAGES = ('select', 'recommend', 'render', 'send')
+OUTBOX_SIZE = 1000
+
+
+class PipelineStats:
+    """Items processed and seconds spent per stage, safe to update from several threads"""
+
+    def __init__(self, stages=CAMPAIGN_STAGES):
+        self.stages = {name: {'items': 0, 'seconds': 0.0} for name in stages}
+        self.lock = threading.Lock()
+        self.started = time.perf_counter()
+
+    def record(self, stage, items, seconds):
+        with self.lock:
+            self.stages[stage]['items'] += items
+            self.stages[stage]['seconds'] += seconds
+
+    def snapshot(self):
+        elapsed = time.perf_counter() - self.started
+        with self.lock:
+            stages = {
+                name: {
+                    'items': stage['items'],
+                    'busy_seconds': stage['seconds'],
+                    'items_per_second': stage['items'] / stage['seconds'] if stage['seconds'] else None,
+                }
+                for name, stage in self.stages.items()
+            }
+        return {'elapsed_seconds': elapsed, 'stages': stages}
+
+
+def select_users(stats, user_ids=None, min_spend=None, limit=None):
+    """
+    Campaign segment: the given user ids, or every user known to the model,
+    optionally only those whose total spend is at least min_spend
+    """
+    user_mapping = registry.get('user_product_interaction_data').mapping()[0]
+    total_spend = registry.get('user_item_store').total_spend
+    candidates = user_mapping.keys() if user_ids is None else user_ids
+
+    def segment():
+        for user_id in candidates:
+            start = time.perf_counter()
+            user_index = user_mapping.get(user_id)
+            selected = user_index is not None and (min_spend is None or total_spend[user_index] >= min_spend)
+            stats.record('select', int(selected), time.perf_counter() - start)
+            if selected:
+                yield user_id
+
+    return itertools.islice(segment(), limit)
+
+
+def recommend_users(user_ids, stats, n=5, exclude_purchased=False, search='exact', batch_size=RECOMMENDATION_BATCH_SIZE):
+    """Score users batch by batch with recommend_products_batch, yielding (user_id, recommendations)"""
+    model = registry.get('product_recommendation_model')
+    dataset = registry.get('user_product_interaction_data')
+    catalog = registry.get('product_catalog')
+    user_store = registry.get('user_item_store')
+
+    user_ids = iter(user_ids)
+    while True:
+        batch = list(itertools.islice(user_ids, batch_size))
+        if not batch:
+            return
+        start = time.perf_counter()
+        results = recommend_products_batch(batch, model, dataset, catalog, user_store, n, exclude_purchased, search)
+        stats.record('recommend', len(batch), time.perf_counter() - start)
+        for user_id in batch:
+            if results.get(user_id):
+                yield user_id, results[user_id]
+
+
+def render_emails(recommendations, address_for, stats):
+    """Render each user's recommendations into a message dict; users without an address are skipped"""
+    for user_id, items in recommendations:
+        start = time.perf_counter()
+        address = address_for(user_id)
+        if address is None:
+            continue
+        message = {
+            'user_id': user_id,
+            'to': address,
+            'subject': RECOMMENDATION_SUBJECT,
+            'body': render_recommendation_email(user_id, items),
+        }
+        stats.record('render', 1, time.perf_counter() - start)
+        yield message
+
+
+class FileSink:
+    """Dry-run sink writing one JSON line per message"""
+
+    def __init__(self, path):
+        self.file = open(path, 'w', encoding='utf-8')
+
+    def send(self, message):
+        self.file.write(json.dumps(message, default=str) + '\n')
+
+    def close(self):
+        self.file.close()
+
+
+class DispatcherSink:
+    """Hands messages to a mailer.EmailDispatcher and waits for its queue to drain on close"""
+
+    def __init__(self, dispatcher):
+        self.dispatcher = dispatcher
+
+    def send(self, message):
+        self.dispatcher.enqueue(message['to'], message['subject'], message['body'])
+
+    def close(self):
+        self.dispatcher.stop()
+
+
+def drain_outbox(messages, sink, stats, rate=None, outbox_size=OUTBOX_SIZE, progress=None):
+    """
+    Run the message generator on a producer thread into a bounded outbox and
+    send from it at no more than rate messages per second (unlimited if None).
+    progress, if given, is called with the stats snapshot after every send.
+    """
+    outbox = queue.Queue(maxsize=outbox_size)
+    done = object()
+    errors = []
+
+    def produce():
+        try:
+            for message in messages:
+                outbox.put(message)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            outbox.put(done)
+
+    producer = threading.Thread(target=produce, name='campaign-producer', daemon=True)
+    producer.start()
+
+    interval = 1.0 / rate if rate else 0.0
+    next_send = time.perf_counter()
+    try:
+        while True:
+            message = outbox.get()
+            if message is done:
+                break
+            if interval:
+                delay = next_send - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                next_send = max(next_send, time.perf_counter()) + interval
+
+            start = time.perf_counter()
+            sink.send(message)
+            stats.record('send', 1, time.perf_counter() - start)
+            if progress is not None:
+                progress(stats.snapshot(), outbox.qsize())
+    finally:
+        sink.close()
+
+    producer.join()
+    if errors:
+        raise errors[0]
+    return stats.snapshot()
+
+
+def run_campaign(sink, address_for, user_ids=None, min_spend=None, limit=None, n=5, exclude_purchased=False,
+                 search='exact', rate=None, outbox_size=OUTBOX_SIZE, progress=None):
+    """Score, render and send recommendation emails to a user segment; returns per-stage throughput"""
+    stats = PipelineStats()
+    users = select_users(stats, user_ids, min_spend, limit)
+    recommendations = recommend_users(users, stats, n, exclude_purchased, search)
+    messages = render_emails(recommendations, address_for, stats)
+    return drain_outbox(messages, sink, stats, rate, outbox_size, progress)
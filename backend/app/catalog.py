@@ -0,0 +1,127 @@
+"""
+Startup indexes over the user-product interaction log.
+
+Both structures are aligned to the LightFM dataset's internal user and item
+indices, so /recommend can go from a model score straight to product details
+and user spend without touching the interaction DataFrame. The extend_*
+functions return copies grown to a dataset extended with Dataset.fit_partial,
+for interactions ingested after startup.
+"""
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix
+
+
+def _index_order(mapping):
+    """External ids ordered by their internal LightFM index"""
+    ids = np.empty(len(mapping), dtype=object)
+    for external_id, internal_index in mapping.items():
+        ids[internal_index] = external_id
+    return ids
+
+
+class ProductCatalog:
+    """product_id, category and price of every item, indexed by LightFM item index"""
+
+    def __init__(self, product_ids, category_codes, categories, prices):
+        self.product_ids = product_ids
+        self.category_codes = category_codes
+        self.categories = categories
+        self.prices = prices
+
+    def __len__(self):
+        return len(self.product_ids)
+
+    def product_info(self, item_index):
+        return {
+            "product_id": self.product_ids[item_index],
+            "product_category": self.categories[self.category_codes[item_index]],
+            "price": self.prices[item_index]
+        }
+
+
+class UserItemStore:
+    """Sparse user -> purchased items matrix plus each user's total spend, indexed by LightFM user index"""
+
+    def __init__(self, purchases, total_spend):
+        self.purchases = purchases
+        self.total_spend = total_spend
+
+    def purchased_items(self, user_index):
+        start, end = self.purchases.indptr[user_index], self.purchases.indptr[user_index + 1]
+        return self.purchases.indices[start:end]
+
+
+def build_product_catalog(df, dataset):
+    """Take each product's category and price from its first row in the interaction log"""
+    item_mapping = dataset.mapping()[2]
+    product_ids = _index_order(item_mapping)
+
+    first_rows = df.drop_duplicates("product_id", keep="first").set_index("product_id")
+    first_rows = first_rows.reindex(product_ids)
+    category = pd.Categorical(first_rows["product_category"])
+
+    return ProductCatalog(
+        product_ids=np.array(product_ids.tolist()),
+        category_codes=category.codes,
+        categories=np.asarray(category.categories, dtype=object),
+        prices=first_rows["price"].to_numpy()
+    )
+
+
+def extend_product_catalog(catalog, df, dataset):
+    """Copy of catalog with the items dataset maps beyond it, described by their first row in df"""
+    product_ids = _index_order(dataset.mapping()[2])[len(catalog):]
+    if not len(product_ids):
+        return catalog
+
+    first_rows = df.drop_duplicates("product_id", keep="first").set_index("product_id")
+    first_rows = first_rows.reindex(product_ids)
+    categories = list(catalog.categories)
+    categories += [category for category in first_rows["product_category"].dropna().unique() if category not in categories]
+    category_codes = pd.Categorical(first_rows["product_category"], categories=categories).codes
+
+    return ProductCatalog(
+        product_ids=np.concatenate([catalog.product_ids, np.array(product_ids.tolist())]),
+        category_codes=np.concatenate([catalog.category_codes, category_codes]),
+        categories=np.asarray(categories, dtype=object),
+        prices=np.concatenate([catalog.prices, first_rows["price"].to_numpy()])
+    )
+
+
+def _purchase_matrix(df, dataset):
+    """CSR matrix of the rows with interaction == 1, their user indices and prices"""
+    user_mapping, _, item_mapping, _ = dataset.mapping()
+    purchases = df[df["interaction"] == 1]
+
+    user_index = purchases["user_id"].map(user_mapping).to_numpy()
+    item_index = purchases["product_id"].map(item_mapping).to_numpy()
+    shape = (len(user_mapping), len(item_mapping))
+
+    matrix = csr_matrix((np.ones(len(purchases), dtype=np.int32), (user_index, item_index)), shape=shape)
+    matrix.sum_duplicates()
+    return matrix, user_index, purchases["price"].to_numpy()
+
+
+def build_user_item_store(df, dataset):
+    """Build the CSR purchase matrix and per-user spend from rows with interaction == 1"""
+    matrix, user_index, prices = _purchase_matrix(df, dataset)
+    total_spend = np.bincount(user_index, weights=prices, minlength=matrix.shape[0])
+
+    return UserItemStore(matrix, total_spend)
+
+
+def extend_user_item_store(store, df, dataset):
+    """Copy of store grown to dataset's users and items, with the purchases in df added"""
+    new_purchases, user_index, prices = _purchase_matrix(df, dataset)
+    n_users = new_purchases.shape[0]
+
+    old = store.purchases
+    indptr = np.concatenate([old.indptr, np.full(n_users - old.shape[0], old.indptr[-1], dtype=old.indptr.dtype)])
+    matrix = csr_matrix((old.data, old.indices, indptr), shape=new_purchases.shape) + new_purchases
+
+    total_spend = np.zeros(n_users)
+    total_spend[:len(store.total_spend)] = store.total_spend
+    total_spend += np.bincount(user_index, weights=prices, minlength=n_users)
+
+    return UserItemStore(matrix.tocsr(), total_spend)
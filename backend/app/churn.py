@@ -0,0 +1,120 @@
+"""
+Churn scoring shared by the /predict-churn endpoint and offline batch jobs.
+
+Records are scored in fixed-size chunks: each chunk is preprocessed as one
+array, the forest is traversed once through predict_proba, and labels are
+derived from those probabilities instead of a second predict() pass. Scoring
+goes through the compiled flat forest (forest.py) when it is available.
+"""
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from app import registry
+from app.metrics import ITEMS_PROCESSED, stage
+
+CHURN_CHUNK_SIZE = 1024
+
+
+def scale_features(features):
+    """Apply the fitted StandardScaler in place, with the same arithmetic as its transform()"""
+    churn_scaler = registry.get('churn_scaler')
+    if churn_scaler.with_mean:
+        features -= churn_scaler.mean_
+    if churn_scaler.with_std:
+        features /= churn_scaler.scale_
+    return features
+
+
+def preprocess_input(input_data):
+    """
+    Preprocess the input data to match the format used during training
+    """
+    try:
+        churn_feature_list = registry.get('churn_feature_list')
+
+        # A single record skips the DataFrame round trip
+        if isinstance(input_data, dict):
+            missing_features = [feat for feat in churn_feature_list if feat not in input_data]
+            if missing_features:
+                raise ValueError(f"Missing required features: {missing_features}")
+            features = np.array([[input_data[feat] for feat in churn_feature_list]], dtype=float)
+            return scale_features(features)
+
+        # Convert to DataFrame if it's a list of dictionaries
+        if isinstance(input_data, list):
+            input_data = pd.DataFrame(input_data)
+
+        # Ensure all required features are present
+        missing_features = [feat for feat in churn_feature_list if feat not in input_data.columns]
+        if missing_features:
+            raise ValueError(f"Missing required features: {missing_features}")
+
+        # Select only the required features in the correct order, as floats
+        features = input_data[churn_feature_list].to_numpy(dtype=float, copy=True)
+
+        return scale_features(features)
+
+    except Exception as e:
+        raise Exception(f"Error in preprocessing: {str(e)}")
+
+
+def predict_churn_proba(processed_data):
+    """Churn probabilities and labels from a single predict_proba pass"""
+    churn_model = registry.get('churn_engine') or registry.get('churn_model')
+    probabilities = churn_model.predict_proba(processed_data)
+    labels = churn_model.classes_.take(np.argmax(probabilities, axis=1), axis=0)
+    return probabilities[:, 1], labels
+
+
+def score_churn_chunk(input_data):
+    """Score a dict, list of dicts or DataFrame; returns aligned probability and label arrays"""
+    try:
+        with stage('predict_churn', 'preprocess'):
+            processed_data = preprocess_input(input_data)
+        with stage('predict_churn', 'inference'):
+            probabilities, labels = predict_churn_proba(processed_data)
+        ITEMS_PROCESSED.inc(len(processed_data), operation='predict_churn')
+        return probabilities, labels
+    except Exception as e:
+        raise Exception(f"Error in prediction: {str(e)}")
+
+
+def predict_churn(input_data):
+    """
+    Make predictions using the loaded model
+    """
+    probabilities, labels = score_churn_chunk(input_data)
+    with stage('predict_churn', 'postprocess'):
+        return {
+            'churn_probability': float(probabilities[0]),  # Convert to float for JSON serialization
+            'churn_prediction': int(labels[0])             # Convert to int for JSON serialization
+        }
+
+
+def iter_churn_scores(records, chunk_size=CHURN_CHUNK_SIZE):
+    """
+    Score an iterable of record dicts chunk by chunk, yielding one result per record
+    as soon as its chunk is done. Only one chunk is held in memory at a time.
+    """
+    records = iter(records)
+    while True:
+        chunk = list(itertools.islice(records, chunk_size))
+        if not chunk:
+            return
+        probabilities, labels = score_churn_chunk(chunk)
+        for probability, label in zip(probabilities, labels):
+            yield {
+                'churn_probability': float(probability),  # Convert to float for JSON serialization
+                'churn_prediction': int(label)            # Convert to int for JSON serialization
+            }
+
+
+def format_churn_result(result):
+    """Human readable form returned by /predict-churn"""
+    return {
+        'churn_probability': f"{result['churn_probability']:.2%}",
+        'churn_prediction': 'Yes' if result['churn_prediction'] == 1 else 'No',
+        'status': 'success'
+    }
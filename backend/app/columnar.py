@@ -0,0 +1,187 @@
+"""
+Columnar binary copies of the startup CSV datasets.
+
+Each dataset directory holds one .npy file per column plus meta.json, written
+with compact dtypes: integers downcast to int32, text columns as categorical
+codes, and dates as datetime64. Floats stay float64, because every float
+column here is a money amount that the rollups and user spend sum. Columns are
+memory-mapped on load, so startup skips CSV parsing. meta.json records the
+size and mtime of the source CSV. A copy whose source has changed since
+conversion is ignored.
+
+Rows appended to the CSV by ingestion are added to a current copy as another
+part with append_columnar, so the copy stays current at the cost of the batch.
+Parts are concatenated on load; convert_datasets.py merges them again.
+"""
+import collections
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from .memstats import rss_bytes
+
+DATE_SUFFIX = '_date'
+
+
+def compact_dtypes(df):
+    """Downcast integer columns and turn text and date columns into categoricals and datetimes"""
+    compact = {}
+    for column in df.columns:
+        values = df[column]
+        if column.endswith(DATE_SUFFIX) and values.dtype == object:
+            compact[column] = pd.to_datetime(values)
+        elif pd.api.types.is_integer_dtype(values) and values.min() >= np.iinfo(np.int32).min \
+                and values.max() <= np.iinfo(np.int32).max:
+            compact[column] = values.astype(np.int32)
+        elif values.dtype == object:
+            compact[column] = values.astype('category')
+        else:
+            compact[column] = values
+    return pd.DataFrame(compact, index=df.index)
+
+
+def _source_stamp(csv_path):
+    stat = os.stat(csv_path)
+    return {'source_size': stat.st_size, 'source_mtime': stat.st_mtime}
+
+
+def is_current(csv_path, directory):
+    """Whether directory holds a columnar copy of csv_path as the CSV is now"""
+    meta_path = os.path.join(directory, 'meta.json')
+    if not os.path.exists(meta_path) or not os.path.exists(csv_path):
+        return False
+    with open(meta_path, 'r') as f:
+        meta = json.load(f)
+    return all(meta.get(key) == value for key, value in _source_stamp(csv_path).items())
+
+
+def _write_meta(directory, meta):
+    path = os.path.join(directory, 'meta.json')
+    with open(path + '.tmp', 'w') as f:
+        json.dump(meta, f)
+    os.replace(path + '.tmp', path)
+
+
+def _write_columns(df, directory, prefix=''):
+    columns = []
+    for position, column in enumerate(df.columns):
+        values = df[column]
+        entry = {'name': column, 'file': f'{prefix}{position}.npy'}
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            entry['kind'] = 'category'
+            entry['categories'] = values.cat.categories.tolist()
+            array = values.cat.codes.to_numpy()
+        elif pd.api.types.is_datetime64_any_dtype(values):
+            entry['kind'] = 'datetime'
+            array = values.to_numpy(dtype='datetime64[ns]')
+        else:
+            entry['kind'] = 'plain'
+            array = values.to_numpy()
+        np.save(os.path.join(directory, entry['file']), array)
+        columns.append(entry)
+    return columns
+
+
+def write_columnar(df, directory, csv_path=None):
+    """Write one .npy per column; categoricals are stored as codes with their categories in meta.json"""
+    os.makedirs(directory, exist_ok=True)
+    # Parts appended to a previous copy are merged into this one
+    for name in os.listdir(directory):
+        if name.startswith('part') and name.endswith('.npy'):
+            os.remove(os.path.join(directory, name))
+    meta = {'columns': _write_columns(df, directory), 'rows': len(df)}
+    if csv_path is not None:
+        meta.update(_source_stamp(csv_path))
+    _write_meta(directory, meta)
+    return meta
+
+
+def append_columnar(df, directory, csv_path):
+    """
+    Add rows just appended to csv_path as a new part of its columnar copy and
+    restamp the copy. Call only if the copy was current before the CSV append.
+    """
+    with open(os.path.join(directory, 'meta.json'), 'r') as f:
+        meta = json.load(f)
+    parts = meta.setdefault('parts', [])
+    columns = _write_columns(compact_dtypes(df), directory, f'part{len(parts) + 1}-')
+    parts.append({'columns': columns, 'rows': len(df)})
+    meta['rows'] += len(df)
+    meta.update(_source_stamp(csv_path))
+    _write_meta(directory, meta)
+    return meta
+
+
+def _concat(arrays):
+    if isinstance(arrays[0], pd.Categorical):
+        return pd.api.types.union_categoricals(arrays)
+    return np.concatenate(arrays)
+
+
+def read_columnar(directory, mmap=True):
+    with open(os.path.join(directory, 'meta.json'), 'r') as f:
+        meta = json.load(f)
+
+    pieces = collections.defaultdict(list)
+    for columns in [meta['columns']] + [part['columns'] for part in meta.get('parts', [])]:
+        for entry in columns:
+            array = np.load(os.path.join(directory, entry['file']), mmap_mode='r' if mmap else None)
+            if entry['kind'] == 'category':
+                array = pd.Categorical.from_codes(array, entry['categories'])
+            pieces[entry['name']].append(array)
+
+    # A single part stays memory-mapped; appended parts are copied into one array
+    data = {name: arrays[0] if len(arrays) == 1 else _concat(arrays) for name, arrays in pieces.items()}
+    return pd.DataFrame(data, copy=False), meta
+
+
+def convert_csv(csv_path, directory):
+    """
+    Read a CSV once, compact its dtypes and write the columnar copy.
+    Returns the row count and the CSV's load time and in-memory size, for comparison.
+    """
+    start = time.perf_counter()
+    df = pd.read_csv(csv_path)
+    csv_seconds = time.perf_counter() - start
+    csv_bytes = df.memory_usage(deep=True).sum()
+    write_columnar(compact_dtypes(df), directory, csv_path)
+    return {'rows': len(df), 'csv_load_seconds': csv_seconds, 'csv_memory_usage_bytes': int(csv_bytes)}
+
+
+def load_dataset(csv_path, directory):
+    """
+    Load a dataset from its columnar copy when it is current, otherwise from the CSV.
+    Returns the DataFrame and a dict with the source, load time and RSS growth.
+    """
+    rss_before = rss_bytes()
+    start = time.perf_counter()
+
+    df = None
+    source = 'csv'
+    meta_path = os.path.join(directory, 'meta.json')
+    if os.path.exists(meta_path):
+        try:
+            df, meta = read_columnar(directory)
+            stamp = _source_stamp(csv_path) if os.path.exists(csv_path) else {}
+            if stamp and any(meta.get(key) != value for key, value in stamp.items()):
+                print(f"Columnar copy in {directory} is older than {csv_path}, reading the CSV")
+                df = None
+            else:
+                source = 'columnar'
+        except Exception as e:
+            print(f"Error reading columnar copy in {directory}: {str(e)}")
+            df = None
+
+    if df is None:
+        df = pd.read_csv(csv_path)
+
+    return df, {
+        'source': source,
+        'rows': len(df),
+        'load_seconds': time.perf_counter() - start,
+        'rss_growth_bytes': rss_bytes() - rss_before,
+        'memory_usage_bytes': int(df.memory_usage(deep=True).sum()),
+    }
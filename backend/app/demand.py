@@ -0,0 +1,264 @@
+"""
+Customer demand clustering behind /api/demand-analysis.
+
+DemandClusterer keeps the customer dataset, the fitted k-means state per
+n_clusters and the finished analysis cached under a fingerprint of the data
+and n_clusters, so repeated page loads do no clustering work. Adding customers
+updates the fitted models incrementally (a warm-started k-means from the
+previous centres, or partial_fit for mini-batch models) instead of clustering
+from scratch.
+"""
+import copy
+import hashlib
+import threading
+
+import numpy as np
+import pandas as pd
+from scipy.spatial import ConvexHull
+from sklearn.cluster import KMeans, MiniBatchKMeans
+
+from .metrics import ITEMS_PROCESSED, stage
+from .tiles import TileIndex
+
+CLUSTER_FEATURES = [
+    'customer_lat', 'customer_lon',
+    'clothing_frequency', 'electronics_frequency',
+    'furniture_frequency', 'groceries_frequency', 'toys_frequency'
+]
+FREQUENCY_COLUMNS = CLUSTER_FEATURES[2:]
+DEMAND_CATEGORIES = ['Clothing', 'Electronics', 'Furniture', 'Groceries', 'Toys']
+CUSTOMER_COLUMNS = ['customer_id', 'customer_lat', 'customer_lon', 'avg_purchase_value'] + FREQUENCY_COLUMNS
+
+# Above this many customers clustering switches to MiniBatchKMeans
+MINIBATCH_THRESHOLD = 50000
+MINIBATCH_SIZE = 4096
+
+def create_sample_data(n_samples=100, seed=None):
+    """Generate sample customer data for demonstration"""
+    rng = np.random.RandomState(seed)
+    return pd.DataFrame({
+        'customer_id': range(1, n_samples + 1),
+        'customer_lat': rng.uniform(19.01, 19.06, n_samples),
+        'customer_lon': rng.uniform(73.00, 73.04, n_samples),
+        'avg_purchase_value': rng.randint(500, 5000, n_samples),
+        'total_transactions': rng.randint(10, 100, n_samples),
+        'clothing_frequency': rng.randint(0, 100, n_samples),
+        'electronics_frequency': rng.randint(0, 100, n_samples),
+        'furniture_frequency': rng.randint(0, 100, n_samples),
+        'groceries_frequency': rng.randint(0, 100, n_samples),
+        'toys_frequency': rng.randint(0, 100, n_samples),
+    })
+
+def format_product_demands(demands):
+    """Category demands of one cluster, highest first, formatted with currency"""
+    order = np.argsort(-demands, kind='stable')
+    return [f"{DEMAND_CATEGORIES[i]}: ₹{demands[i]:,.2f}" for i in order]
+    
+def normalize_features(df, mean=None, std=None):
+    """Standardize the clustering features; pass stored mean/std to reuse an earlier fit's scaling"""
+    features = df[CLUSTER_FEATURES]
+    if mean is None:
+        mean, std = features.mean(), features.std()
+    return (features - mean) / std, mean, std
+
+def make_kmeans(n_clusters, n_samples):
+    """Full k-means for normal sizes, mini-batch k-means for very large customer sets"""
+    if n_samples > MINIBATCH_THRESHOLD:
+        return MiniBatchKMeans(n_clusters=n_clusters, random_state=42, batch_size=MINIBATCH_SIZE, n_init=3)
+    return KMeans(n_clusters=n_clusters, random_state=42)
+
+def fit_demand_clusters(df, n_clusters=6):
+    """Fit k-means on the normalized features; returns labels and the state needed to update it later"""
+    with stage('demand_analysis', 'preprocess'):
+        features_normalized, mean, std = normalize_features(df)
+    with stage('demand_analysis', 'inference'):
+        kmeans = make_kmeans(n_clusters, len(df))
+        labels = kmeans.fit_predict(features_normalized)
+    ITEMS_PROCESSED.inc(len(df), operation='demand_analysis')
+    return labels, {'model': kmeans, 'mean': mean, 'std': std}
+
+def summarize_clusters(df, n_clusters):
+    """
+    Boundaries, weighted centroids and demand per cluster of an already labelled frame.
+    Everything except the hulls comes from one grouped aggregation over all clusters.
+    """
+    try:
+        weights = df['avg_purchase_value'].to_numpy(dtype=float)
+        summary = df[FREQUENCY_COLUMNS + ['avg_purchase_value']].assign(
+            demand_cluster=df['demand_cluster'].to_numpy(),
+            weighted_lat=df['customer_lat'].to_numpy(dtype=float) * weights,
+            weighted_lon=df['customer_lon'].to_numpy(dtype=float) * weights
+        ).groupby('demand_cluster').agg(
+            customer_count=('avg_purchase_value', 'size'),
+            mean_purchase_value=('avg_purchase_value', 'mean'),
+            weight_sum=('avg_purchase_value', 'sum'),
+            weighted_lat=('weighted_lat', 'sum'),
+            weighted_lon=('weighted_lon', 'sum'),
+            **{column: (column, 'sum') for column in FREQUENCY_COLUMNS}
+        ).reindex(range(n_clusters))
+
+        counts = summary['customer_count'].fillna(0).to_numpy(dtype=int)
+        demands = summary[FREQUENCY_COLUMNS].to_numpy(dtype=float) * summary[['mean_purchase_value']].to_numpy() / 100
+        total_demands = demands.sum(axis=1)
+        centroid_lat = summary['weighted_lat'].to_numpy() / summary['weight_sum'].to_numpy()
+        centroid_lon = summary['weighted_lon'].to_numpy() / summary['weight_sum'].to_numpy()
+
+        # Sort once so each cluster's points are a contiguous slice, in their original order
+        order = np.argsort(df['demand_cluster'].to_numpy(), kind='stable')
+        coordinates = df[['customer_lat', 'customer_lon']].to_numpy()[order]
+        offsets = np.concatenate([[0], np.cumsum(counts)])
+
+        clusters = []
+        optimal_locations = []
+        
+        for cluster_id in range(n_clusters):
+            if counts[cluster_id] < 3:
+                continue
+                
+            # Calculate cluster boundaries
+            cluster_coordinates = coordinates[offsets[cluster_id]:offsets[cluster_id + 1]]
+            hull = ConvexHull(cluster_coordinates)
+            boundary_points = cluster_coordinates[hull.vertices].tolist()
+            
+            product_demands = format_product_demands(demands[cluster_id])
+            top_index = int(np.argmax(demands[cluster_id]))
+            
+            cluster_info = {
+                'cluster': int(cluster_id),
+                'boundary_points': boundary_points,
+                'top_product': DEMAND_CATEGORIES[top_index],
+                'top_product_demand': float(demands[cluster_id, top_index]),
+                'total_demand': float(total_demands[cluster_id]),
+                'customer_count': int(counts[cluster_id])
+            }
+            clusters.append(cluster_info)
+            
+            # Store optimal location information
+            optimal_locations.append({
+                'cluster': int(cluster_id),
+                'lat': float(centroid_lat[cluster_id]),
+                'lon': float(centroid_lon[cluster_id]),
+                'product_demands': product_demands,
+                'total_demand': float(total_demands[cluster_id]),
+                'customer_count': int(counts[cluster_id])
+            })
+        
+        return clusters, optimal_locations
+        
+    except Exception as e:
+        print(f"Error in summarize_clusters: {str(e)}")
+        raise
+
+def customer_columns(df):
+    """Customer points as sent to the map, one typed array per field"""
+    return {
+        'id': df['customer_id'].to_numpy(dtype=np.int64),
+        'lat': df['customer_lat'].to_numpy(dtype=float),
+        'lon': df['customer_lon'].to_numpy(dtype=float),
+        'cluster': df['demand_cluster'].to_numpy(dtype=np.int64),
+        'avg_purchase_value': df['avg_purchase_value'].to_numpy(dtype=float),
+    }
+
+def serialize_customers(columns):
+    """Customer points as a list of row objects, built from customer_columns()"""
+    names = list(columns)
+    return [dict(zip(names, row)) for row in zip(*(columns[name].tolist() for name in names))]
+
+def customer_demand(df):
+    """Each customer's demand across all categories, on the same scale as the cluster demands"""
+    return df[FREQUENCY_COLUMNS].to_numpy(dtype=float).sum(axis=1) * df['avg_purchase_value'].to_numpy(dtype=float) / 100
+
+def data_fingerprint(df):
+    """Content hash of the columns the analysis depends on"""
+    digest = hashlib.sha1()
+    for column in CUSTOMER_COLUMNS:
+        digest.update(np.ascontiguousarray(df[column].to_numpy()).tobytes())
+    return digest.hexdigest()
+
+class DemandClusterer:
+    def __init__(self, customers):
+        self.customers = customers.reset_index(drop=True)
+        self.fingerprint = data_fingerprint(self.customers)
+        self.states = {}
+        self.results = {}
+        self.lock = threading.Lock()
+
+    def analysis(self, n_clusters=6):
+        """Clusters, optimal locations and labelled customers, cached per (data fingerprint, n_clusters)"""
+        key = (self.fingerprint, n_clusters)
+        result = self.results.get(key)
+        if result is not None:
+            return result
+
+        with self.lock:
+            key = (self.fingerprint, n_clusters)
+            if key not in self.results:
+                df = self.customers.copy()
+                df['demand_cluster'] = self.labels(n_clusters)
+                with stage('demand_analysis', 'postprocess'):
+                    clusters, optimal_locations = summarize_clusters(df, n_clusters)
+                self.results = {k: v for k, v in self.results.items() if k[0] == self.fingerprint}
+                self.results[key] = {
+                    'fingerprint': self.fingerprint,
+                    'clusters': clusters,
+                    'optimal_locations': optimal_locations,
+                    'customer_columns': customer_columns(df),
+                    'labelled': df
+                }
+            return self.results[key]
+
+    def customer_records(self, n_clusters=6):
+        """Customers as row objects, built once per cached analysis and only if asked for"""
+        analysis = self.analysis(n_clusters)
+        if 'customers' not in analysis:
+            with stage('demand_analysis', 'postprocess'):
+                analysis['customers'] = serialize_customers(analysis['customer_columns'])
+        return analysis['customers']
+
+    def tiles(self, n_clusters=6):
+        """Spatial tile index over the labelled customers, built once per cached analysis"""
+        analysis = self.analysis(n_clusters)
+        if 'tiles' not in analysis:
+            df = analysis['labelled']
+            analysis['tiles'] = TileIndex.build(
+                df['customer_lat'], df['customer_lon'], customer_demand(df), df['demand_cluster'],
+                df['customer_id'].to_numpy(dtype=np.int64), n_clusters
+            )
+        return analysis['tiles']
+
+    def labels(self, n_clusters):
+        """Labels for the current customers, fitting only if this n_clusters was never fitted"""
+        state = self.states.get(n_clusters)
+        if state is None:
+            labels, state = fit_demand_clusters(self.customers, n_clusters)
+            state['labels'] = labels
+            self.states[n_clusters] = state
+        return state['labels']
+
+    def add_customers(self, new_customers):
+        """
+        Append customers and update every fitted model from its previous centres.
+        Features keep the scaling of the original fit, so the centres stay comparable.
+        """
+        new_customers = new_customers[CUSTOMER_COLUMNS].reset_index(drop=True)
+        with self.lock:
+            customers = pd.concat([self.customers, new_customers], ignore_index=True)
+            # Refit into new states and swap them in only once all succeeded, so a failure changes nothing
+            states = {}
+            for n_clusters, state in self.states.items():
+                features_normalized, _, _ = normalize_features(customers, state['mean'], state['std'])
+                if isinstance(state['model'], MiniBatchKMeans):
+                    # Mini-batch models only take a few steps on the new rows
+                    new_normalized, _, _ = normalize_features(new_customers, state['mean'], state['std'])
+                    model = copy.deepcopy(state['model']).partial_fit(new_normalized)
+                    labels = model.predict(features_normalized)
+                else:
+                    model = KMeans(n_clusters=n_clusters, init=state['model'].cluster_centers_, n_init=1, random_state=42)
+                    labels = model.fit_predict(features_normalized)
+                states[n_clusters] = dict(state, model=model, labels=labels)
+
+            self.states = states
+            self.customers = customers
+            self.fingerprint = data_fingerprint(customers)
+            self.results = {}
+            return self.fingerprint
@@ -0,0 +1,41 @@
+"""
+Recommendation email rendering shared by /send-recommendations and campaign jobs.
+"""
+
+RECOMMENDATION_SUBJECT = "Your Personalized Shopping Recommendations"
+
+store_locations = {
+    "Electronics": "Croma, Seawoods Grand Central Mall",
+    "Groceries": "D-Mart, Sector 19, Nerul",
+    "Clothing": "Westside, Sector 15, Nerul",
+    "Toys": "Hamleys, Seawoods Mall",
+    "Furniture": "Home Centre, Seawoods Mall"
+}
+
+SEPARATOR = "-" * 40 + "\n"
+
+
+def render_recommendation_email(user_id, recommendations):
+    """Plain text body listing each recommended item with its store, price and offers"""
+    parts = [f"Hello User {user_id},\n\nHere are your personalized recommendations:\n\n"]
+
+    for item in recommendations:
+        category = item.get('category', 'Unknown')
+        store = store_locations.get(category, "Store location not available")
+        store_name = item.get('storeName', 'Store name not available')
+        price = item.get('price', 0)
+        offers = item.get('offers', [])
+
+        parts.append(f"\nStore: {store_name}\n")
+        parts.append(f"Category: {category}\n")
+        parts.append(f"Location: {store}\n")
+        parts.append(f"Price: ₹{price:.2f}\n")
+
+        if offers:
+            parts.append("Available Offers:\n")
+            parts.extend(f"- {offer.get('description', '')}: {offer.get('discount', '')}\n" for offer in offers)
+
+        parts.append(SEPARATOR)
+
+    parts.append("\nThank you for using our service!\n")
+    return "".join(parts)
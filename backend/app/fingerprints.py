@@ -0,0 +1,11 @@
+"""Content fingerprints used to tie derived artifacts to the model they were built from"""
+import hashlib
+
+
+def file_sha256(path):
+    """sha256 of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
@@ -0,0 +1,144 @@
+"""
+Flat-array inference engine for the churn random forest.
+
+compile_forest() copies every tree of a fitted sklearn forest into shared
+contiguous node arrays (feature, threshold, left/right child, class
+probabilities). Leaves point to themselves, so a batch is scored by stepping
+all (row, tree) positions max_depth times with plain NumPy indexing. This
+skips sklearn's per-call validation and per-tree dispatch, which is what
+dominates single-row latency.
+
+Comparisons follow sklearn: inputs are cast to float32 and go left when
+x <= threshold. Per-tree probabilities are averaged over the trees. NaN and
+infinite inputs raise ValueError, as the sklearn path did, instead of being
+routed down a branch the model never chose for them.
+"""
+import time
+
+import joblib
+import numpy as np
+
+ROW_BLOCK = 4096
+
+
+class FlatForest:
+    def __init__(self, feature, threshold, left, right, value, roots, max_depth, classes, model_sha256=None):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.max_depth = max_depth
+        self.classes_ = classes
+        self.model_sha256 = model_sha256
+
+    def _leaves(self, X):
+        rows = np.arange(len(X))[:, np.newaxis]
+        nodes = np.broadcast_to(self.roots, (len(X), len(self.roots)))
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        return nodes
+
+    def predict_proba(self, X):
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X[np.newaxis, :]
+        if not np.isfinite(X).all():
+            raise ValueError("Input contains NaN, infinity or a value too large for float32")
+        proba = np.empty((len(X), self.value.shape[1]))
+        for start in range(0, len(X), ROW_BLOCK):
+            leaves = self._leaves(X[start:start + ROW_BLOCK])
+            proba[start:start + ROW_BLOCK] = self.value[leaves].sum(axis=1) / len(self.roots)
+        return proba
+
+    def predict(self, X):
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1), axis=0)
+
+    def save(self, path):
+        joblib.dump(self.__dict__, path)
+
+    @classmethod
+    def load(cls, path, mmap_mode='r'):
+        state = joblib.load(path, mmap_mode=mmap_mode)
+        state['classes'] = state.pop('classes_')
+        return cls(**state)
+
+
+def compile_forest(model, model_sha256=None):
+    """Flatten the trees of a fitted sklearn forest classifier into one set of node arrays"""
+    features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+    offset = 0
+    max_depth = 0
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        nodes = np.arange(tree.node_count)
+        is_leaf = tree.children_left == -1
+
+        features.append(np.where(is_leaf, 0, tree.feature))
+        thresholds.append(np.where(is_leaf, 0.0, tree.threshold))
+        lefts.append(np.where(is_leaf, nodes, tree.children_left) + offset)
+        rights.append(np.where(is_leaf, nodes, tree.children_right) + offset)
+
+        # Normalise each node to class probabilities, as DecisionTreeClassifier.predict_proba does
+        value = np.asarray(tree.value[:, 0, :], dtype=np.float64)
+        normalizer = value.sum(axis=1, keepdims=True)
+        normalizer[normalizer == 0.0] = 1.0
+        values.append(value / normalizer)
+
+        roots.append(offset)
+        offset += tree.node_count
+        max_depth = max(max_depth, tree.max_depth)
+
+    return FlatForest(
+        feature=np.concatenate(features).astype(np.intp),
+        threshold=np.concatenate(thresholds).astype(np.float64),
+        left=np.concatenate(lefts).astype(np.intp),
+        right=np.concatenate(rights).astype(np.intp),
+        value=np.concatenate(values),
+        roots=np.array(roots, dtype=np.intp),
+        max_depth=max_depth,
+        classes=np.asarray(model.classes_),
+        model_sha256=model_sha256
+    )
+
+
+def verify_forest(engine, model, X, atol=1e-9):
+    """Largest probability difference and number of label mismatches against the sklearn model"""
+    expected = model.predict_proba(X)
+    actual = engine.predict_proba(X)
+    return {
+        'rows': len(X),
+        'max_abs_diff': float(np.abs(expected - actual).max()) if len(X) else 0.0,
+        'label_mismatches': int(np.count_nonzero(model.predict(X) != engine.predict(X))),
+        'ok': bool(np.allclose(expected, actual, rtol=0.0, atol=atol)),
+    }
+
+
+def sample_inputs(model, n_rows, seed=0):
+    """Random rows spanning each feature's split thresholds, for parity checks and benchmarks"""
+    rng = np.random.default_rng(seed)
+    n_features = model.n_features_in_
+    low = np.full(n_features, -1.0)
+    high = np.full(n_features, 1.0)
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        split = tree.children_left != -1
+        for feature in range(n_features):
+            used = tree.threshold[split & (tree.feature == feature)]
+            if len(used):
+                low[feature] = min(low[feature], used.min() - 1.0)
+                high[feature] = max(high[feature], used.max() + 1.0)
+    return rng.uniform(low, high, size=(n_rows, n_features))
+
+
+def latency_percentiles(predict, X, repeats=1000):
+    """p50 / p99 single-row latency of predict in milliseconds"""
+    timings = np.empty(repeats)
+    for i in range(repeats):
+        row = X[i % len(X)][np.newaxis, :]
+        start = time.perf_counter()
+        predict(row)
+        timings[i] = time.perf_counter() - start
+    return {'p50_ms': 1000 * float(np.percentile(timings, 50)), 'p99_ms': 1000 * float(np.percentile(timings, 99))}
@@ -0,0 +1,110 @@
+"""
+Incremental ingestion of retail transaction batches.
+
+A batch (CSV or NDJSON) is validated, appended to the on-disk dataset so it
+survives restarts, and merged into the monthly rollup so /avg_data and
+/sales_2021 reflect it immediately. A current columnar copy of the dataset is
+extended with the batch too, so restarts keep loading it instead of the CSV.
+"""
+import io
+import os
+import threading
+
+import pandas as pd
+
+from .columnar import append_columnar, is_current
+from .rollups import SUM_FIELDS, rollup_frame
+
+BATCH_FORMATS = ('csv', 'ndjson')
+REQUIRED_COLUMNS = ['transaction_date', 'product_category'] + SUM_FIELDS
+
+
+def read_batch(data, fmt='csv', required_columns=()):
+    """
+    Parse a batch given as text, bytes or an open file and check it has
+    required_columns. Text is always the batch itself, never a path: callers
+    that read files open them first.
+    """
+    if fmt not in BATCH_FORMATS:
+        raise ValueError(f"Unknown batch format: {fmt}. Available formats: {list(BATCH_FORMATS)}")
+    if isinstance(data, bytes):
+        data = io.BytesIO(data)
+    elif isinstance(data, str):
+        data = io.StringIO(data)
+
+    if fmt == 'csv':
+        df = pd.read_csv(data)
+    else:
+        df = pd.read_json(data, lines=True, dtype=False)
+
+    df.columns = df.columns.str.strip()
+    missing_columns = [column for column in required_columns if column not in df.columns]
+    if missing_columns:
+        raise ValueError(f"Missing required columns: {missing_columns}")
+    return df
+
+
+def read_transaction_batch(data, fmt='csv'):
+    """Parse a transaction batch given as text, bytes or an open file"""
+    return read_batch(data, fmt, REQUIRED_COLUMNS)
+
+
+def batch_format(content_type, filename=''):
+    """Guess the batch format from a content type or file name"""
+    if 'ndjson' in (content_type or '') or 'jsonl' in (content_type or '') or filename.endswith(('.ndjson', '.jsonl')):
+        return 'ndjson'
+    return 'csv'
+
+
+class TransactionIngestor:
+    def __init__(self, rollup, dataset_path, dataset_columns, columnar_dir=None):
+        self.rollup = rollup
+        self.dataset_path = dataset_path
+        self.dataset_columns = dataset_columns
+        self.columnar_dir = columnar_dir
+        self.lock = threading.Lock()
+        self.rows_ingested = 0
+        self.batches_ingested = 0
+
+    def append_to_dataset(self, df):
+        """Append the batch to the dataset CSV in its existing column order, and to its columnar copy"""
+        df = df.reindex(columns=self.dataset_columns)
+        columnar_current = self.columnar_dir is not None and is_current(self.dataset_path, self.columnar_dir)
+        needs_newline = False
+        if os.path.exists(self.dataset_path) and os.path.getsize(self.dataset_path):
+            with open(self.dataset_path, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                needs_newline = f.read(1) != b'\n'
+        with open(self.dataset_path, 'a', newline='') as f:
+            if needs_newline:
+                f.write('\n')
+            df.to_csv(f, header=False, index=False)
+        if columnar_current:
+            append_columnar(df, self.columnar_dir, self.dataset_path)
+
+    def check_batch(self, df):
+        """
+        The batch's rollup cube; raises ValueError if dates or amounts do not parse.
+        Run before appending, as a bad row in the dataset breaks the rollup at every restart.
+        """
+        try:
+            delta = rollup_frame(df)
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"Unreadable dates or amounts: {str(e)}")
+        if delta.index.get_level_values('year').isna().any():
+            raise ValueError("transaction_date is missing in some rows")
+        return delta
+
+    def ingest(self, df):
+        delta = self.check_batch(df)
+        with self.lock:
+            self.append_to_dataset(df)
+            version = self.rollup.add_cube(delta)
+            self.rows_ingested += len(df)
+            self.batches_ingested += 1
+            return {
+                'rows': len(df),
+                'rollup_version': version,
+                'rows_ingested': self.rows_ingested,
+                'batches_ingested': self.batches_ingested
+            }
@@ -0,0 +1,91 @@
+"""
+JSON provider that understands NumPy and pandas values.
+
+jsonify() accepts NumPy scalars and arrays, pandas Series and DataFrames, and
+Columns payloads directly, so handlers no longer convert them by hand. When
+orjson is installed it does the encoding: it writes numeric arrays and NumPy
+scalars natively in C and returns bytes, which go straight into the response.
+Otherwise the standard library encoder is used with the same conversions.
+
+Columns is the column-oriented form for large tables: {"name": [values], ...}
+with one array per column instead of one object per row. It is smaller on
+the wire, and with orjson each column is encoded as one contiguous array.
+"""
+import datetime
+import json
+
+import numpy as np
+import pandas as pd
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class Columns:
+    """A table to send column-oriented; wraps a DataFrame or a mapping of name -> array"""
+
+    def __init__(self, data, columns=None):
+        if isinstance(data, pd.DataFrame):
+            columns = list(data.columns) if columns is None else columns
+            data = {column: data[column].to_numpy() for column in columns}
+        self.data = dict(data)
+
+    def to_json_obj(self):
+        return {str(name): np.ascontiguousarray(values) for name, values in self.data.items()}
+
+
+def frame_records(df):
+    """List of row dicts built column by column, with native Python values"""
+    columns = [str(column) for column in df.columns]
+    return [dict(zip(columns, row)) for row in zip(*(df[column].tolist() for column in df.columns))]
+
+
+def to_json_obj(obj):
+    """Encoder fallback for values neither encoder handles by itself"""
+    if isinstance(obj, Columns):
+        obj = obj.to_json_obj()
+        return obj if orjson is not None else {name: values.tolist() for name, values in obj.items()}
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, pd.DataFrame):
+        return frame_records(obj)
+    if isinstance(obj, (pd.Series, pd.Index)):
+        return obj.tolist()
+    if isinstance(obj, (datetime.date, datetime.datetime, pd.Timestamp)):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class AppJSONProvider(DefaultJSONProvider):
+    def _orjson_options(self, pretty=False):
+        option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if pretty:
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def dumps(self, obj, **kwargs):
+        if orjson is not None and not kwargs:
+            return orjson.dumps(obj, default=to_json_obj, option=self._orjson_options()).decode()
+        kwargs.setdefault('default', to_json_obj)
+        kwargs.setdefault('ensure_ascii', self.ensure_ascii)
+        kwargs.setdefault('sort_keys', self.sort_keys)
+        return json.dumps(obj, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        pretty = (self.compact is None and self._app.debug) or self.compact is False
+
+        if orjson is not None:
+            body = orjson.dumps(obj, default=to_json_obj, option=self._orjson_options(pretty)) + b'\n'
+        elif pretty:
+            body = self.dumps(obj, indent=2) + '\n'
+        else:
+            body = self.dumps(obj, separators=(',', ':')) + '\n'
+        return self._app.response_class(body, mimetype=self.mimetype)
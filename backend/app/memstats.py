@@ -0,0 +1,35 @@
+"""Process memory figures for load-time and benchmark reporting"""
+import os
+import resource
+import sys
+
+
+def rss_bytes(pid='self'):
+    """Current resident set size of a process (Linux), or the peak when /proc is unavailable"""
+    try:
+        with open(f'/proc/{pid}/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return peak_rss_bytes()
+
+
+def peak_rss_bytes():
+    """Peak resident set size of this process"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def pss_bytes(pid='self'):
+    """
+    Proportional set size (Linux 4.14+): shared pages are split between the
+    processes mapping them, so the PSS of all workers sums to their real footprint.
+    None where smaps_rollup is unavailable.
+    """
+    try:
+        with open(f'/proc/{pid}/smaps_rollup', 'r') as f:
+            for line in f:
+                if line.startswith('Pss:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    return None
@@ -0,0 +1,147 @@
+"""
+Request and stage instrumentation exposed in Prometheus text format at /metrics.
+
+Histograms keep fixed cumulative buckets per label set, so an observation is a
+bisect and three additions under a lock. Handlers wrap their phases in
+stage(operation, name) to see where time goes (preprocess, inference,
+postprocess, serialize). create_app records per-route latency and
+request/response sizes for every request.
+"""
+import bisect
+import collections
+import threading
+import time
+from contextlib import contextmanager
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = tuple(4 ** i * 256 for i in range(10))  # 256 B .. 64 MiB
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(f'{name}="{_escape(value)}"' for name, value in extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.values = collections.defaultdict(float)
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1.0, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        with self.lock:
+            self.values[key] += amount
+
+    def samples(self):
+        with self.lock:
+            items = list(self.values.items())
+        for key, value in items:
+            yield f'{self.name}{_format_labels(self.labelnames, key)} {value}'
+
+
+class Gauge:
+    """Value read from a callback at scrape time"""
+    kind = 'gauge'
+
+    def __init__(self, name, help, read):
+        self.name = name
+        self.help = help
+        self.read = read
+
+    def samples(self):
+        yield f'{self.name} {self.read()}'
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        # Per label set: [count per bucket (+Inf last), sum]
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def samples(self):
+        with self.lock:
+            items = [(key, list(counts), total) for key, (counts, total) in self.series.items()]
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                yield f'{self.name}_bucket{_format_labels(self.labelnames, key, [("le", bound)])} {cumulative}'
+            yield f'{self.name}_sum{_format_labels(self.labelnames, key)} {total}'
+            yield f'{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}'
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics = []
+
+    def add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+metrics = MetricsRegistry()
+
+REQUEST_LATENCY = metrics.add(Histogram(
+    'http_request_duration_seconds', 'Request latency by route', ('route', 'method', 'status')
+))
+REQUEST_BYTES = metrics.add(Histogram(
+    'http_request_size_bytes', 'Request body size by route', ('route',), SIZE_BUCKETS
+))
+RESPONSE_BYTES = metrics.add(Histogram(
+    'http_response_size_bytes', 'Response body size by route (streamed responses excluded)', ('route',), SIZE_BUCKETS
+))
+REQUEST_ERRORS = metrics.add(Counter(
+    'http_request_errors_total', 'Responses with a 5xx status by route', ('route',)
+))
+STAGE_LATENCY = metrics.add(Histogram(
+    'stage_duration_seconds', 'Time spent in a named stage of an operation', ('operation', 'stage')
+))
+ITEMS_PROCESSED = metrics.add(Counter(
+    'items_processed_total', 'Records, users or customers handled by an operation', ('operation',)
+))
+
+
+@contextmanager
+def stage(operation, name):
+    """Time the enclosed block as one stage of operation"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_LATENCY.observe(time.perf_counter() - start, operation=operation, stage=name)
@@ -0,0 +1,245 @@
+"""
+Online updates of the recommendation model from streamed interactions.
+
+The offline LightFM model only knows the users and products of the CSV it was
+trained on. InteractionUpdater queues ingested batches, and a background
+worker folds each batch in:
+  - Dataset.fit_partial extends the id mapping with the new users and products.
+  - The model's embeddings, biases and optimizer state grow to match.
+  - A few fit_partial epochs train on the batch's purchases only.
+  - The product catalog and user store are extended the same way.
+All of this happens on copies of the serving artifacts. The result is
+published to the registry as a new generation, so requests never wait on
+training and in-flight requests finish on the generation they started with.
+
+New users start with a zero embedding, so until they have purchases they are
+ranked by item bias, i.e. by popularity. New products start with LightFM's
+random initialisation.
+
+Published batches are appended to an interaction log. When the app starts,
+the log is replayed on top of the offline model (see app/__init__.py), so
+online users survive a restart. Fold the log into the interaction CSV and
+delete it when the model is retrained offline.
+"""
+import collections
+import copy
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from .catalog import extend_product_catalog, extend_user_item_store
+from .demand import DEMAND_CATEGORIES
+from .metrics import ITEMS_PROCESSED, stage
+
+INTERACTION_COLUMNS = ['user_id', 'product_id', 'product_category', 'interaction', 'price']
+ONLINE_EPOCHS = int(os.getenv('ONLINE_EPOCHS', 5))
+
+
+def clean_interactions(df):
+    """The interaction columns of df with integer ids and flags and a known category; raises ValueError on bad rows"""
+    df = df[INTERACTION_COLUMNS].copy()
+    unknown = ~df['product_category'].isin(DEMAND_CATEGORIES)
+    if unknown.any():
+        examples = sorted(map(str, df.loc[unknown, 'product_category'].unique()))[:5]
+        raise ValueError(f"product_category must be one of {', '.join(DEMAND_CATEGORIES)}, got {', '.join(examples)}")
+    for column in ('user_id', 'product_id', 'interaction'):
+        values = pd.to_numeric(df[column], errors='raise')
+        if values.isna().any() or (values != values.round()).any():
+            raise ValueError(f"{column} must be an integer in every row")
+        df[column] = values.astype(np.int64)
+    df['price'] = pd.to_numeric(df['price'], errors='raise').astype(float)
+    return df
+
+
+def read_interaction_log(path):
+    if not os.path.exists(path) or not os.path.getsize(path):
+        return pd.DataFrame({column: pd.Series(dtype=np.int64) for column in INTERACTION_COLUMNS})
+    return clean_interactions(pd.read_csv(path))
+
+
+def append_to_log(path, df):
+    write_header = not os.path.exists(path) or not os.path.getsize(path)
+    with open(path, 'a', newline='') as f:
+        df[INTERACTION_COLUMNS].to_csv(f, header=write_header, index=False)
+
+
+def extend_dataset(dataset, df):
+    """Copy of a LightFM Dataset whose mapping also covers the users and products of df"""
+    extended = copy.copy(dataset)
+    # fit_partial only adds to these; existing ids keep their indices
+    for name in ('_user_id_mapping', '_item_id_mapping', '_user_feature_mapping', '_item_feature_mapping'):
+        setattr(extended, name, dict(getattr(dataset, name)))
+    extended.fit_partial(users=df['user_id'].unique(), items=df['product_id'].unique())
+    return extended
+
+
+def _grow_rows(array, n_rows, fill):
+    grown = np.empty((n_rows,) + array.shape[1:], dtype=array.dtype)
+    grown[:len(array)] = array
+    grown[len(array):] = fill
+    return grown
+
+
+def grow_model(model, n_users, n_items):
+    """
+    Copy of a LightFM model with rows for n_users and n_items. Every array is
+    copied, because fit_partial updates them in place while the original serves.
+    """
+    model = copy.copy(model)
+    model.random_state = copy.deepcopy(model.random_state)
+    # adagrad starts its gradient accumulators at one, adadelta at zero; see LightFM._initialize
+    accumulator = 1.0 if model.learning_schedule == 'adagrad' else 0.0
+
+    for side, n_rows in (('user', n_users), ('item', n_items)):
+        embeddings = getattr(model, f'{side}_embeddings')
+        n_new = n_rows - len(embeddings)
+        if side == 'item':
+            init = (model.random_state.rand(n_new, model.no_components) - 0.5) / model.no_components
+        else:
+            init = 0.0
+        setattr(model, f'{side}_embeddings', _grow_rows(embeddings, n_rows, init))
+        setattr(model, f'{side}_embedding_gradients',
+                _grow_rows(getattr(model, f'{side}_embedding_gradients'), n_rows, accumulator))
+        setattr(model, f'{side}_embedding_momentum', _grow_rows(getattr(model, f'{side}_embedding_momentum'), n_rows, 0.0))
+        setattr(model, f'{side}_biases', _grow_rows(getattr(model, f'{side}_biases'), n_rows, 0.0))
+        setattr(model, f'{side}_bias_gradients', _grow_rows(getattr(model, f'{side}_bias_gradients'), n_rows, accumulator))
+        setattr(model, f'{side}_bias_momentum', _grow_rows(getattr(model, f'{side}_bias_momentum'), n_rows, 0.0))
+    return model
+
+
+def fit_interactions(model, dataset, df, epochs=ONLINE_EPOCHS, num_threads=1):
+    """Grown copy of model trained on the purchases in df; dataset must already map their ids"""
+    n_users, n_items = dataset.interactions_shape()
+    model = grow_model(model, n_users, n_items)
+    purchases = df[df['interaction'] == 1]
+    if len(purchases):
+        interactions, _ = dataset.build_interactions(zip(purchases['user_id'], purchases['product_id']))
+        model.fit_partial(interactions, epochs=epochs, num_threads=num_threads)
+    return model
+
+
+class InteractionUpdater:
+    def __init__(self, registry, log_path, epochs=ONLINE_EPOCHS, num_threads=1, retry_seconds=1.0):
+        self.registry = registry
+        self.log_path = log_path
+        self.epochs = epochs
+        self.num_threads = num_threads
+        self.retry_seconds = retry_seconds
+
+        self.pending = collections.deque()
+        self.condition = threading.Condition()
+        self.thread = None
+        self.state = 'idle'
+        self.counts = collections.Counter()
+        self.last_update = None
+        self.last_error = None
+
+    def submit(self, df):
+        """Queue a batch for the next update; returns the queue state"""
+        df = clean_interactions(df)
+        with self.condition:
+            self.pending.append(df)
+            self.counts['rows_received'] += len(df)
+            self.counts['batches_received'] += 1
+            # Started on first use, so a worker forked from a preloaded parent runs its own
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._run, name='interaction-updater', daemon=True)
+                self.thread.start()
+            self.condition.notify()
+            return {'rows': len(df), 'pending_rows': self.pending_rows()}
+
+    def pending_rows(self):
+        return sum(len(df) for df in self.pending)
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while not self.pending:
+                    self.state = 'idle'
+                    self.condition.wait()
+                self.state = 'training'
+                batches = list(self.pending)
+
+            try:
+                published = self.update(pd.concat(batches, ignore_index=True))
+            except Exception as e:
+                print(f"Online recommendation update failed, dropping {len(batches)} batches: {str(e)}")
+                self.last_error = {'error': str(e), 'at': time.time()}
+                self.counts['failed_updates'] += 1
+                published = True
+
+            if not published:
+                # A reload or another swap got in first; train again against what is serving now
+                self.counts['publish_conflicts'] += 1
+                time.sleep(self.retry_seconds)
+                continue
+            with self.condition:
+                for _ in batches:
+                    self.pending.popleft()
+
+    def update(self, df):
+        """Train on df against the serving generation and publish the result; False if it was not published"""
+        start = time.perf_counter()
+        registry = self.registry
+        token = registry.pin()
+        try:
+            base_version = registry.version
+            base_dataset = registry.get('user_product_interaction_data')
+            with stage('online_update', 'preprocess'):
+                dataset = extend_dataset(base_dataset, df)
+                catalog = extend_product_catalog(registry.get('product_catalog'), df, dataset)
+                user_store = extend_user_item_store(registry.get('user_item_store'), df, dataset)
+                online = pd.concat([registry.get('online_interactions'), df], ignore_index=True)
+            with stage('online_update', 'train'):
+                model = fit_interactions(
+                    registry.get('product_recommendation_model'), dataset, df, self.epochs, self.num_threads
+                )
+        finally:
+            registry.unpin(token)
+
+        with stage('online_update', 'publish'):
+            status = registry.publish({
+                'online_interactions': online,
+                'user_product_interaction_data': dataset,
+                'product_recommendation_model': model,
+                'product_catalog': catalog,
+                'user_item_store': user_store,
+                # Precomputed for the offline model; the updated one is scored live
+                'topk_store': None,
+            }, base_version=base_version)
+        if status is False:
+            return False
+        if status['state'] != 'swapped':
+            raise ValueError(status.get('error', 'publish failed'))
+
+        append_to_log(self.log_path, df)
+        ITEMS_PROCESSED.inc(len(df), operation='online_update')
+        old_users, old_items = base_dataset.interactions_shape()
+        n_users, n_items = dataset.interactions_shape()
+        self.counts['rows_trained'] += len(df)
+        self.counts['updates_published'] += 1
+        self.last_update = {
+            'version': status['version'],
+            'rows': len(df),
+            'purchases': int((df['interaction'] == 1).sum()),
+            'new_users': n_users - old_users,
+            'new_items': n_items - old_items,
+            'seconds': time.perf_counter() - start,
+            'finished_at': time.time(),
+        }
+        return True
+
+    def stats(self):
+        with self.condition:
+            pending_rows = self.pending_rows()
+        return {
+            'state': self.state,
+            'pending_rows': pending_rows,
+            'epochs': self.epochs,
+            'counts': dict(self.counts),
+            'last_update': self.last_update,
+            'last_error': self.last_error,
+        }
@@ -0,0 +1,256 @@
+"""
+Lazy, versioned artifact registry.
+
+Models and datasets are registered with a loader and only loaded the first
+time something asks for them, so a worker only pays for what it serves.
+Each load records its wall time and the process RSS growth. warm() loads a set
+of artifacts up front, optionally on a background thread.
+
+Loaded artifacts live in a Generation with a version number. reload() builds
+the next generation on a background thread. Artifacts that are not reloaded
+are carried over. The named artifacts and everything that was loaded from them
+are loaded again, and the registered smoke tests are run against the new
+generation. Only then is it swapped in, with a single reference assignment. A
+failed load or smoke test leaves the serving generation untouched. publish()
+goes through the same steps with artifacts that were built in memory, e.g. a
+model updated online, in place of loading the named ones.
+
+A request pins the generation that is current when it starts (pin()/unpin(),
+done by the app around every request). Every get() in that request resolves
+against that generation even if a swap happens halfway through, so in-flight
+requests finish on the old models.
+"""
+import contextvars
+import threading
+import time
+
+from .memstats import rss_bytes
+
+
+class Generation:
+    def __init__(self, version, names):
+        self.version = version
+        self.artifacts = {}
+        self.stats = {}
+        self.dependencies = {}
+        self.locks = {name: threading.Lock() for name in names}
+        self.created_at = time.time()
+
+
+class ModelRegistry:
+    def __init__(self):
+        self.loaders = {}
+        self.declared_dependencies = {}
+        self.smoke_tests = []
+        self.current = Generation(1, [])
+        self.reload_lock = threading.Lock()
+        self.reload_status = {'state': 'idle'}
+        self._pinned = contextvars.ContextVar('pinned_generation', default=None)
+        self._loading = contextvars.ContextVar('loading_artifact', default=None)
+
+    def artifact(self, name, depends=()):
+        """
+        Decorator registering a zero-argument loader function under name.
+        depends lists artifacts it must be reloaded with although it does not
+        read them through get(), e.g. a hash of another artifact's file.
+        """
+        def register(loader):
+            self.loaders[name] = loader
+            self.declared_dependencies[name] = set(depends)
+            self.current.locks[name] = threading.Lock()
+            return loader
+        return register
+
+    def smoke_test(self, *names):
+        """Decorator registering a check run before a reload of any of names is swapped in"""
+        def register(check):
+            self.smoke_tests.append((frozenset(names), check))
+            return check
+        return register
+
+    def __contains__(self, name):
+        return name in self.loaders
+
+    @property
+    def generation(self):
+        return self._pinned.get() or self.current
+
+    @property
+    def version(self):
+        return self.generation.version
+
+    @property
+    def stats(self):
+        return self.generation.stats
+
+    def pin(self):
+        """Pin the current generation for the calling context; returns a token for unpin()"""
+        return self._pinned.set(self.current)
+
+    def unpin(self, token):
+        self._pinned.reset(token)
+
+    def is_loaded(self, name):
+        return name in self.generation.artifacts
+
+    def get(self, name):
+        generation = self.generation
+        loading = self._loading.get()
+        if loading is not None:
+            # Remember what each loader reads, so a reload also refreshes what was built from it
+            generation.dependencies.setdefault(loading, set()).add(name)
+
+        try:
+            return generation.artifacts[name]
+        except KeyError:
+            pass
+        if name not in self.loaders:
+            raise KeyError(f"Unknown artifact: {name}")
+
+        with generation.locks[name]:
+            if name not in generation.artifacts:
+                rss_before = rss_bytes()
+                start = time.perf_counter()
+                token = self._loading.set(name)
+                try:
+                    artifact = self.loaders[name]()
+                finally:
+                    self._loading.reset(token)
+                # Loaders may pull in other artifacts, whose cost is included here too
+                generation.stats[name] = {
+                    'load_seconds': time.perf_counter() - start,
+                    'rss_growth_bytes': rss_bytes() - rss_before,
+                    'loaded_at': time.time(),
+                    'version': generation.version,
+                }
+                generation.artifacts[name] = artifact
+            return generation.artifacts[name]
+
+    def warm(self, names=None, background=False):
+        """Load artifacts ahead of the first request; failures are reported, not raised"""
+        names = list(self.loaders) if names is None else list(names)
+
+        def load_all():
+            for name in names:
+                try:
+                    self.get(name)
+                except Exception as e:
+                    print(f"Error warming {name}: {str(e)}")
+
+        if not background:
+            load_all()
+            return None
+        thread = threading.Thread(target=load_all, name='model-warmup', daemon=True)
+        thread.start()
+        return thread
+
+    def _reload_set(self, names):
+        """
+        Loaded artifacts among names, plus every loaded artifact built from them.
+        Named artifacts that are not loaded yet will load fresh on first use anyway.
+        """
+        stale = set(self.loaders) if names is None else set(names)
+        loaded = set(self.current.artifacts)
+        changed = True
+        while changed:
+            changed = False
+            for name in loaded - stale:
+                depends = self.current.dependencies.get(name, set()) | self.declared_dependencies[name]
+                if depends & stale:
+                    stale.add(name)
+                    changed = True
+        return stale & loaded
+
+    def _build(self, names, replacements=None):
+        replacements = replacements or {}
+        old = self.current
+        targets = self._reload_set(names) | set(replacements)
+        new = Generation(old.version + 1, self.loaders)
+        for name, artifact in old.artifacts.items():
+            if name not in targets:
+                new.artifacts[name] = artifact
+                new.stats[name] = old.stats[name]
+                new.dependencies[name] = set(old.dependencies.get(name, ()))
+        for name, artifact in replacements.items():
+            new.artifacts[name] = artifact
+            new.stats[name] = {'published_at': time.time(), 'loaded_at': time.time(), 'version': new.version}
+            new.dependencies[name] = set(old.dependencies.get(name, ()))
+
+        token = self._pinned.set(new)
+        try:
+            for name in sorted(targets - set(replacements)):
+                self.get(name)
+            for checked, check in self.smoke_tests:
+                if checked & targets:
+                    check()
+        finally:
+            self._pinned.reset(token)
+        return new, targets
+
+    def reload(self, names=None, background=True):
+        """
+        Load a new generation with names (default: everything loaded) and what
+        depends on them, smoke test it and swap it in. Returns False if a reload
+        is already running; otherwise True, or the status dict when not in the background.
+        """
+        return self._swap(names, None, None, background)
+
+    def publish(self, artifacts, base_version=None, background=False):
+        """
+        Swap in a generation in which artifacts (name -> object) replace the
+        loaded ones; what was built from them is reloaded and smoke tested as in
+        reload(). With base_version, nothing is published unless that is still
+        the serving version. Returns False if a reload is running or the version
+        has moved on; otherwise as reload().
+        """
+        names = list(artifacts)
+        unknown = [name for name in names if name not in self.loaders]
+        if unknown:
+            raise KeyError(f"Unknown artifacts: {unknown}")
+        return self._swap(names, dict(artifacts), base_version, background)
+
+    def _swap(self, names, replacements, base_version, background):
+        if not self.reload_lock.acquire(blocking=False):
+            return False
+        if base_version is not None and self.current.version != base_version:
+            self.reload_lock.release()
+            return False
+
+        self.reload_status = {'state': 'loading', 'version': self.current.version + 1, 'started_at': time.time()}
+
+        def run():
+            start = time.perf_counter()
+            try:
+                new, targets = self._build(names, replacements)
+                self.current = new
+                self.reload_status = {
+                    'state': 'swapped',
+                    'version': new.version,
+                    'reloaded': sorted(targets),
+                    'seconds': time.perf_counter() - start,
+                    'finished_at': time.time(),
+                }
+            except Exception as e:
+                print(f"Model reload failed, keeping version {self.current.version}: {str(e)}")
+                self.reload_status = {
+                    'state': 'failed',
+                    'version': self.current.version,
+                    'error': str(e),
+                    'seconds': time.perf_counter() - start,
+                    'finished_at': time.time(),
+                }
+            finally:
+                self.reload_lock.release()
+
+        if not background:
+            run()
+            return self.reload_status
+        threading.Thread(target=run, name='model-reload', daemon=True).start()
+        return True
+
+    def load_stats(self):
+        generation = self.generation
+        return {
+            name: dict(generation.stats.get(name, {}), loaded=name in generation.artifacts)
+            for name in self.loaders
+        }
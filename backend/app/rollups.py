@@ -0,0 +1,98 @@
+"""
+Monthly sales rollup over the retail transaction dataset.
+
+The cube is indexed by (year, month, product_category) and keeps sums of each
+metric plus non-null counts of the averaged ones, so means are derived on read
+and a new batch of transactions is merged by adding its own small cube, without
+touching history. Updates build a new frame and swap it in, so request threads
+never see a half-written cube.
+"""
+import threading
+
+import pandas as pd
+
+SUM_FIELDS = ['avg_purchase_value', 'total_sales', 'total_transactions', 'avg_transaction_value']
+MEAN_FIELDS = ['avg_purchase_value', 'avg_transaction_value']
+GROUP_KEYS = ['year', 'month', 'product_category']
+
+
+def rollup_frame(df):
+    """Group transactions into per (year, month, category) sums and counts"""
+    df = df.rename(columns=lambda column: column.strip())
+    dates = pd.to_datetime(df['transaction_date'])
+    grouped = df[SUM_FIELDS].astype(float).assign(
+        year=dates.dt.year.to_numpy(),
+        month=dates.dt.month.to_numpy(),
+        product_category=df['product_category'].to_numpy()
+    ).groupby(GROUP_KEYS, dropna=False)
+
+    cube = grouped[SUM_FIELDS].sum()
+    counts = grouped[MEAN_FIELDS].count()
+    for field in MEAN_FIELDS:
+        cube[count_field(field)] = counts[field]
+    return cube
+
+
+def count_field(field):
+    return f'{field}_count'
+
+
+class SalesRollup:
+    def __init__(self, cube):
+        self.cube = cube
+        self.version = 0
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_frame(cls, df):
+        return cls(rollup_frame(df))
+
+    def add_frame(self, df):
+        """Merge a batch of new transactions; cost depends on the batch, not the history"""
+        return self.add_cube(rollup_frame(df))
+
+    def add_cube(self, delta):
+        """Merge a cube built by rollup_frame"""
+        with self.lock:
+            self.cube = self.cube.add(delta, fill_value=0)
+            self.version += 1
+            return self.version
+
+    def years(self):
+        return sorted(self.cube.index.get_level_values('year').unique().tolist())
+
+    def categories(self):
+        return sorted(self.cube.index.get_level_values('product_category').unique().tolist())
+
+    def monthly_metrics(self, year, product_category=None):
+        """
+        Per-month metrics for one year, optionally for a single category:
+        sums for totals and count-weighted means for averages.
+        """
+        cube = self.cube
+        if year not in cube.index.get_level_values('year'):
+            return {}
+        cube = cube.xs(year, level='year')
+        if product_category is not None:
+            cube = cube[cube.index.get_level_values('product_category') == product_category]
+
+        monthly = cube.groupby(level='month').sum()
+        result = {}
+        for month, row in monthly.iterrows():
+            metrics = {field: float(row[field]) for field in SUM_FIELDS}
+            for field in MEAN_FIELDS:
+                count = row[count_field(field)]
+                metrics[field] = float(row[field] / count) if count else None
+            result[int(month)] = metrics
+        return result
+
+    def monthly_sales_by_category(self, year, categories):
+        """total_sales per month for each category in one year"""
+        result = {category: {} for category in categories}
+        if year not in self.cube.index.get_level_values('year'):
+            return result
+        sales = self.cube.xs(year, level='year')['total_sales']
+        for (month, category), total_sales in sales.items():
+            if category in result:
+                result[category][int(month)] = float(total_sales)
+        return result
@@ -0,0 +1,171 @@
+"""
+Exact lookup-table engine for the sales forecast model.
+
+The sales model only sees month_of_year, week_of_year, product_category and
+discount_applied. The first three are small integer domains and the model is a
+tree ensemble, so its output only changes when the (scaled) discount crosses
+one of the split thresholds. Evaluating the model once per
+(month, week, category, discount bucket) therefore gives a piecewise-constant
+table that reproduces it exactly.
+"""
+import json
+
+import numpy as np
+
+from .fingerprints import file_sha256
+
+MONTHS = 12
+WEEKS = 5
+
+
+def _split_feature_index(split, feature_names):
+    """Resolve an xgboost split name ('discount_applied' or 'f3') to a column index"""
+    if split in feature_names:
+        return feature_names.index(split)
+    return int(split.lstrip('f'))
+
+
+def collect_split_thresholds(sales_model, feature_names):
+    """Walk every tree of the booster and collect the split thresholds of each feature"""
+    thresholds = {name: set() for name in feature_names}
+    stack = [json.loads(tree) for tree in sales_model.get_booster().get_dump(dump_format='json')]
+    while stack:
+        node = stack.pop()
+        if 'children' not in node:
+            continue
+        feature = feature_names[_split_feature_index(node['split'], feature_names)]
+        thresholds[feature].add(np.float32(node['split_condition']))
+        stack.extend(node['children'])
+    return {name: np.array(sorted(values), dtype=np.float32) for name, values in thresholds.items()}
+
+
+def _bucket_representatives(thresholds):
+    """One discount value inside each bucket; xgboost goes left when x < threshold"""
+    if len(thresholds) == 0:
+        return np.zeros(1, dtype=np.float32)
+    below = np.nextafter(thresholds[0], np.float32(-np.inf), dtype=np.float32)
+    return np.concatenate([[below], thresholds]).astype(np.float32)
+
+
+def _input_matrix(feature_names, months, weeks, categories, discounts):
+    columns = {
+        'month_of_year': months,
+        'week_of_year': weeks,
+        'product_category': categories,
+        'discount_applied': discounts,
+    }
+    return np.column_stack([np.asarray(columns[feature], dtype=np.float32) for feature in feature_names])
+
+
+class SalesLookupTable:
+    """Piecewise-constant weekly sales table indexed by (month, week, category, discount bucket)"""
+
+    def __init__(self, table, discount_thresholds, model_sha256=None):
+        self.table = table
+        self.discount_thresholds = discount_thresholds
+        self.model_sha256 = model_sha256
+
+    @property
+    def n_categories(self):
+        return self.table.shape[2]
+
+    def lookup(self, months, weeks, categories, discounts_scaled):
+        """
+        Weekly sales for aligned arrays of inputs, or None when any row falls outside
+        the compiled domain and the live model has to answer instead.
+        """
+        months = np.asarray(months)
+        weeks = np.asarray(weeks)
+        categories = np.asarray(categories)
+        discounts = np.asarray(discounts_scaled, dtype=np.float32)
+
+        if (np.isnan(discounts).any()
+                or months.min() < 1 or months.max() > MONTHS
+                or weeks.min() < 1 or weeks.max() > WEEKS
+                or categories.min() < 0 or categories.max() >= self.n_categories
+                or (months % 1).any() or (weeks % 1).any() or (categories % 1).any()):
+            return None
+
+        buckets = np.searchsorted(self.discount_thresholds, discounts, side='right')
+        return self.table[months.astype(int) - 1, weeks.astype(int) - 1, categories.astype(int), buckets]
+
+    def save(self, path):
+        np.savez(
+            path,
+            table=self.table,
+            discount_thresholds=self.discount_thresholds,
+            model_sha256=np.array(self.model_sha256 or ''),
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data['table'], data['discount_thresholds'], str(data['model_sha256']) or None)
+
+
+def compile_sales_table(sales_model, feature_names, n_categories, model_sha256=None):
+    """Evaluate the model once per cell of the (month, week, category, discount bucket) grid"""
+    thresholds = collect_split_thresholds(sales_model, feature_names)['discount_applied']
+    representatives = _bucket_representatives(thresholds)
+
+    months, weeks, categories, buckets = np.meshgrid(
+        np.arange(1, MONTHS + 1), np.arange(1, WEEKS + 1), np.arange(n_categories),
+        np.arange(len(representatives)), indexing='ij'
+    )
+    input_matrix = _input_matrix(
+        feature_names, months.ravel(), weeks.ravel(), categories.ravel(), representatives[buckets.ravel()]
+    )
+    table = np.asarray(sales_model.predict(input_matrix), dtype=np.float32).reshape(months.shape)
+    return SalesLookupTable(table, thresholds, model_sha256)
+
+
+def verify_sales_table(lookup_table, sales_model, feature_names, n_samples=None, seed=0):
+    """
+    Compare the table against the live model on every discount threshold and its
+    float32 neighbours, for every (month, week, category). Passing n_samples checks
+    a random subset of those rows instead. Returns the number of mismatching rows.
+    """
+    thresholds = lookup_table.discount_thresholds
+    probes = np.unique(np.concatenate([
+        thresholds,
+        np.nextafter(thresholds, np.float32(-np.inf), dtype=np.float32),
+        np.nextafter(thresholds, np.float32(np.inf), dtype=np.float32),
+        np.float32([-1e6, 0.0, 1e6]),
+    ]).astype(np.float32))
+
+    months, weeks, categories, discounts = (grid.ravel() for grid in np.meshgrid(
+        np.arange(1, MONTHS + 1), np.arange(1, WEEKS + 1), np.arange(lookup_table.n_categories),
+        probes, indexing='ij'
+    ))
+    if n_samples is not None and n_samples < len(months):
+        rows = np.random.default_rng(seed).choice(len(months), n_samples, replace=False)
+        months, weeks, categories, discounts = months[rows], weeks[rows], categories[rows], discounts[rows]
+
+    expected = np.asarray(
+        sales_model.predict(_input_matrix(feature_names, months, weeks, categories, discounts)),
+        dtype=np.float32
+    )
+    actual = lookup_table.lookup(months, weeks, categories, discounts)
+    return int(np.count_nonzero(expected != actual))
+
+
+def load_sales_table(table_path, sales_model, sales_model_path, feature_names, verify_samples=2000):
+    """Load a compiled table if it matches the current model, otherwise return None"""
+    try:
+        lookup_table = SalesLookupTable.load(table_path)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"Error loading sales lookup table: {str(e)}")
+        return None
+
+    if lookup_table.model_sha256 != file_sha256(sales_model_path):
+        print("Sales lookup table was compiled for a different model, using the live model")
+        return None
+
+    mismatches = verify_sales_table(lookup_table, sales_model, feature_names, n_samples=verify_samples)
+    if mismatches:
+        print(f"Sales lookup table disagrees with the live model on {mismatches} rows, using the live model")
+        return None
+
+    return lookup_table
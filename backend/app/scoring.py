@@ -0,0 +1,38 @@
+"""
+Matrix scoring for the LightFM recommendation model.
+
+The model is trained without side features, so every user and item is its own
+identity feature and LightFM's prediction reduces to
+    user_embedding . item_embedding + user_bias + item_bias
+which can be computed for many users at once as a single matrix product.
+"""
+import numpy as np
+
+
+def score_users(model, user_indices):
+    """Scores of every item for each user, shape (len(user_indices), n_items)"""
+    user_indices = np.asarray(user_indices)
+    scores = model.user_embeddings[user_indices] @ model.item_embeddings.T
+    scores += model.item_biases
+    scores += model.user_biases[user_indices][:, np.newaxis]
+    return scores
+
+
+def mask_purchased(scores, user_store, user_indices):
+    """Push items each user has already bought to the bottom of their ranking"""
+    purchases = user_store.purchases[np.asarray(user_indices)]
+    rows = np.repeat(np.arange(purchases.shape[0]), np.diff(purchases.indptr))
+    scores[rows, purchases.indices] = -np.inf
+    return scores
+
+
+def top_k(scores, k):
+    """Column indices of the k best scores in each row, best first"""
+    k = min(k, scores.shape[1])
+    if k <= 0:
+        return np.empty((scores.shape[0], 0), dtype=np.intp)
+
+    candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+    order = np.argsort(-candidate_scores, axis=1, kind='stable')
+    return np.take_along_axis(candidates, order, axis=1)
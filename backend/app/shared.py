@@ -0,0 +1,58 @@
+"""
+Move the large NumPy arrays of loaded artifacts into shared memory before forking.
+
+Forked workers start out sharing the parent's heap copy-on-write, but any write
+to a page (a refcount, a GC header, an allocator bookkeeping word) copies it
+into that worker, so over time each worker ends up with its own copy. Arrays
+re-mapped from a file in /dev/shm live in the page cache instead: every worker
+maps the same physical pages, and PSS charges each one only its share. Mode
+'c' keeps the arrays writable (a write stays private to the writer), which
+LightFM's Cython routines need.
+"""
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+MIN_SHARED_BYTES = 1 << 20
+
+
+def _map_array(array, directory, name):
+    path = os.path.join(directory, f'{name}.npy')
+    np.save(path, array)
+    mapped = np.load(path, mmap_mode='c')
+    # The mapping keeps the pages alive after the file name is gone
+    os.remove(path)
+    return mapped
+
+
+def share_arrays(obj, directory, prefix, min_bytes=MIN_SHARED_BYTES, depth=2):
+    """
+    Replace ndarray attributes of obj, and of the objects it holds up to depth
+    levels down (e.g. the CSR arrays inside UserItemStore), with shared
+    mappings. Returns the number of bytes moved.
+    """
+    moved = 0
+    for attr, value in list(vars(obj).items()):
+        if isinstance(value, np.ndarray):
+            if isinstance(value, np.memmap) or value.dtype.hasobject or value.nbytes < min_bytes:
+                continue
+            setattr(obj, attr, _map_array(value, directory, f'{prefix}.{attr}'))
+            moved += value.nbytes
+        elif depth > 1 and hasattr(value, '__dict__') and not isinstance(value, type):
+            moved += share_arrays(value, directory, f'{prefix}.{attr}', min_bytes, depth - 1)
+    return moved
+
+
+def share_artifacts(registry, names, min_bytes=MIN_SHARED_BYTES):
+    """Share the arrays of every loaded artifact in names; returns bytes moved per artifact"""
+    directory = tempfile.mkdtemp(prefix='shared-artifacts-', dir='/dev/shm' if os.path.isdir('/dev/shm') else None)
+    moved = {}
+    try:
+        for name in names:
+            if registry.is_loaded(name) and registry.get(name) is not None:
+                moved[name] = share_arrays(registry.get(name), directory, name, min_bytes)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    return moved
@@ -0,0 +1,132 @@
+"""
+Spatial tile index over clustered customers for the demand map.
+
+Customers are bucketed into web-mercator (slippy map) tiles at every zoom
+level between MIN_ZOOM and POINTS_ZOOM. Each level stores per-tile counts,
+summed demand, the dominant cluster and the mean position, sorted by an x-major
+tile key. A bounding-box query is then a few binary searches per tile column,
+so the response size depends on the viewport, not on the number of customers.
+Individual customers are only returned at POINTS_ZOOM and above.
+"""
+import numpy as np
+
+MIN_ZOOM = 8
+POINTS_ZOOM = 16
+MAX_POINTS = 5000
+MAX_TILES = 5000
+
+
+def tile_xy(lat, lon, zoom):
+    """Slippy map tile column and row of each coordinate at a zoom level"""
+    n = 2 ** zoom
+    lat = np.radians(np.clip(lat, -85.0511, 85.0511))
+    x = np.floor((np.asarray(lon) + 180.0) / 360.0 * n).astype(np.int64)
+    y = np.floor((1.0 - np.arcsinh(np.tan(lat)) / np.pi) / 2.0 * n).astype(np.int64)
+    return np.clip(x, 0, n - 1), np.clip(y, 0, n - 1)
+
+
+def _tile_key(x, y):
+    return (x << 32) | y
+
+
+def _column_slices(keys, x_range, y_range):
+    """Index ranges of sorted keys falling inside the tile rectangle, one per tile column"""
+    for x in range(x_range[0], x_range[1] + 1):
+        start = np.searchsorted(keys, _tile_key(x, y_range[0]), side='left')
+        end = np.searchsorted(keys, _tile_key(x, y_range[1]), side='right')
+        if end > start:
+            yield start, end
+
+
+class TileIndex:
+    def __init__(self, levels, points, min_zoom, points_zoom):
+        self.levels = levels
+        self.points = points
+        self.min_zoom = min_zoom
+        self.points_zoom = points_zoom
+
+    @classmethod
+    def build(cls, lat, lon, demand, cluster, customer_ids, n_clusters, min_zoom=MIN_ZOOM, points_zoom=POINTS_ZOOM):
+        lat = np.asarray(lat, dtype=float)
+        lon = np.asarray(lon, dtype=float)
+        demand = np.asarray(demand, dtype=float)
+        cluster = np.asarray(cluster, dtype=np.int64)
+
+        levels = {}
+        for zoom in range(min_zoom, points_zoom + 1):
+            x, y = tile_xy(lat, lon, zoom)
+            keys, inverse = np.unique(_tile_key(x, y), return_inverse=True)
+            counts = np.bincount(inverse, minlength=len(keys))
+            cluster_counts = np.bincount(
+                inverse * n_clusters + cluster, minlength=len(keys) * n_clusters
+            ).reshape(len(keys), n_clusters)
+            levels[zoom] = {
+                'keys': keys,
+                'count': counts,
+                'demand': np.bincount(inverse, weights=demand, minlength=len(keys)),
+                'dominant_cluster': cluster_counts.argmax(axis=1),
+                'lat': np.bincount(inverse, weights=lat, minlength=len(keys)) / counts,
+                'lon': np.bincount(inverse, weights=lon, minlength=len(keys)) / counts,
+            }
+
+        # Points sorted by their finest tile key, so a viewport maps to a few contiguous slices
+        x, y = tile_xy(lat, lon, points_zoom)
+        keys = _tile_key(x, y)
+        order = np.argsort(keys, kind='stable')
+        points = {
+            'keys': keys[order],
+            'id': np.asarray(customer_ids)[order],
+            'lat': lat[order],
+            'lon': lon[order],
+            'cluster': cluster[order],
+            'demand': demand[order],
+        }
+        return cls(levels, points, min_zoom, points_zoom)
+
+    def _tile_range(self, bbox, zoom):
+        south, west, north, east = bbox
+        x0, y0 = tile_xy(north, west, zoom)
+        x1, y1 = tile_xy(south, east, zoom)
+        return (int(x0), int(x1)), (int(y0), int(y1))
+
+    def query(self, bbox, zoom, max_points=MAX_POINTS, max_tiles=MAX_TILES):
+        """Tiles (and, at fine zooms, customers) inside bbox = (south, west, north, east)"""
+        zoom = int(min(max(zoom, self.min_zoom), self.points_zoom))
+        level = self.levels[zoom]
+        x_range, y_range = self._tile_range(bbox, zoom)
+
+        tiles = []
+        for start, end in _column_slices(level['keys'], x_range, y_range):
+            for i in range(start, min(end, start + max_tiles - len(tiles))):
+                tiles.append({
+                    'x': int(level['keys'][i] >> 32),
+                    'y': int(level['keys'][i] & 0xFFFFFFFF),
+                    'count': int(level['count'][i]),
+                    'demand': float(level['demand'][i]),
+                    'dominant_cluster': int(level['dominant_cluster'][i]),
+                    'lat': float(level['lat'][i]),
+                    'lon': float(level['lon'][i]),
+                })
+            if len(tiles) >= max_tiles:
+                break
+
+        result = {'zoom': zoom, 'tiles': tiles, 'tiles_truncated': len(tiles) >= max_tiles}
+        if zoom >= self.points_zoom:
+            points = []
+            for start, end in _column_slices(self.points['keys'], x_range, y_range):
+                end = min(end, start + max_points - len(points))
+                points.extend(
+                    {'id': customer_id, 'lat': lat, 'lon': lon, 'cluster': cluster, 'demand': demand}
+                    for customer_id, lat, lon, cluster, demand in zip(
+                        self.points['id'][start:end].tolist(),
+                        self.points['lat'][start:end].tolist(),
+                        self.points['lon'][start:end].tolist(),
+                        self.points['cluster'][start:end].tolist(),
+                        self.points['demand'][start:end].tolist()
+                    )
+                )
+                if len(points) >= max_points:
+                    break
+            result['points'] = points
+            result['points_truncated'] = len(points) >= max_points
+        return result
@@ -0,0 +1,116 @@
+"""
+Precomputed top-K recommendations served from memory-mapped files.
+
+Layout of a store directory:
+    users.npy            sorted user ids, int64            (the offset index)
+    items.npy            (n_users, K) LightFM item indices, int32
+    scores.npy           (n_users, K) scores, float32
+    purchase_counts.npy  purchases per user when the store was built, int32
+    meta.json            k, model fingerprint and build time, written last
+
+Every user occupies one fixed-width row, so a lookup is a binary search in
+users.npy followed by a zero-copy slice of the mapped arrays. The arrays are
+opened read-only, so all workers share the same page-cached copy.
+"""
+import json
+import os
+import time
+
+import numpy as np
+
+from .scoring import score_users, top_k
+
+STORE_FILES = ('users', 'items', 'scores', 'purchase_counts')
+
+
+class TopKStore:
+    def __init__(self, user_ids, items, scores, purchase_counts, meta):
+        self.user_ids = user_ids
+        self.items = items
+        self.scores = scores
+        self.purchase_counts = purchase_counts
+        self.meta = meta
+
+    @property
+    def k(self):
+        return self.items.shape[1]
+
+    @classmethod
+    def open(cls, directory):
+        with open(os.path.join(directory, 'meta.json'), 'r') as f:
+            meta = json.load(f)
+        arrays = [np.load(os.path.join(directory, f'{name}.npy'), mmap_mode='r') for name in STORE_FILES]
+        return cls(*arrays, meta)
+
+    def lookup(self, user_id, user_index, n, user_store=None):
+        """
+        The user's top-n item indices and scores as views into the mapped arrays,
+        or None if the user has no row, n exceeds the stored K, or the user has
+        bought something since the store was built.
+        """
+        if n > self.k:
+            return None
+        row = np.searchsorted(self.user_ids, user_id)
+        if row >= len(self.user_ids) or self.user_ids[row] != user_id:
+            return None
+        if user_store is not None:
+            purchased = user_store.purchases.indptr[user_index + 1] - user_store.purchases.indptr[user_index]
+            if purchased != self.purchase_counts[row]:
+                return None
+        return self.items[row, :n], self.scores[row, :n]
+
+
+def build_topk_store(model, dataset, user_store, directory, k=50, batch_size=1024, model_sha256=None):
+    """Score every user in the dataset's mapping in batches and write the store to directory"""
+    os.makedirs(directory, exist_ok=True)
+    user_mapping = dataset.mapping()[0]
+    user_ids = np.array(sorted(user_mapping), dtype=np.int64)
+    user_indices = np.array([user_mapping[user_id] for user_id in user_ids.tolist()])
+    k = min(k, model.item_embeddings.shape[0])
+
+    paths = {name: os.path.join(directory, f'{name}.npy.tmp') for name in STORE_FILES}
+    items = np.lib.format.open_memmap(paths['items'], mode='w+', dtype=np.int32, shape=(len(user_ids), k))
+    scores = np.lib.format.open_memmap(paths['scores'], mode='w+', dtype=np.float32, shape=(len(user_ids), k))
+
+    for start in range(0, len(user_ids), batch_size):
+        batch = user_indices[start:start + batch_size]
+        batch_scores = score_users(model, batch)
+        batch_items = top_k(batch_scores, k)
+        items[start:start + len(batch)] = batch_items
+        scores[start:start + len(batch)] = np.take_along_axis(batch_scores, batch_items, axis=1)
+
+    items.flush()
+    scores.flush()
+    del items, scores
+
+    purchase_counts = np.diff(user_store.purchases.indptr)[user_indices].astype(np.int32)
+    with open(paths['users'], 'wb') as f:
+        np.save(f, user_ids)
+    with open(paths['purchase_counts'], 'wb') as f:
+        np.save(f, purchase_counts)
+
+    for name, path in paths.items():
+        os.replace(path, os.path.join(directory, f'{name}.npy'))
+
+    meta = {'k': k, 'n_users': len(user_ids), 'model_sha256': model_sha256, 'built_at': time.time()}
+    with open(os.path.join(directory, 'meta.json.tmp'), 'w') as f:
+        json.dump(meta, f)
+    os.replace(os.path.join(directory, 'meta.json.tmp'), os.path.join(directory, 'meta.json'))
+    return meta
+
+
+def open_topk_store(directory, model_sha256):
+    """Open the store if it exists and was built from the current model, otherwise return None"""
+    try:
+        store = TopKStore.open(directory)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"Error opening top-K store: {str(e)}")
+        return None
+
+    if store.meta.get('model_sha256') != model_sha256:
+        print("Top-K store was built for a different recommendation model, using live scoring")
+        return None
+
+    return store
@@ -1,11 +1,18 @@
-from flask import Blueprint, jsonify, request, make_response
+from flask import Blueprint, Response, jsonify, request, make_response, stream_with_context
 import numpy as np
-from sklearn.cluster import KMeans
-from scipy.spatial import ConvexHull
 import traceback
+import json
 import pandas as pd
 
-from app import feature_names, sales_model, sales_encoders, sales_scaler, product_recommendation_model, user_product_interaction_data, user_product_interaction_df, main_dataset_df, churn_feature_list, churn_scaler, churn_model
+from app.churn import CHURN_CHUNK_SIZE, format_churn_result, iter_churn_scores, predict_churn
+from app.demand import CUSTOMER_COLUMNS
+from app.ingest import read_batch, read_transaction_batch, batch_format
+from app.json_provider import Columns
+from app.metrics import ITEMS_PROCESSED, stage
+from app.online import INTERACTION_COLUMNS
+from app.scoring import score_users, mask_purchased, top_k
+
+from app import registry, response_cache
 
 views = Blueprint('views', __name__)
 category_map = {'Clothing': 0, 'Electronics': 1, 'Furniture': 2, 'Groceries': 3, 'Toys': 4}
@@ -38,54 +45,147 @@ category_offers = {
     ]
 }
 
+# (month, week) rows of the 2022 forecast grid, in the order they are summed
+SALES_GRID_MONTHS = np.repeat(np.arange(1, 13), [4 if month == 2 else 5 for month in range(1, 13)])
+SALES_GRID_WEEKS = np.concatenate([np.arange(1, (4 if month == 2 else 5) + 1) for month in range(1, 13)])
+
+def encode_sales_category(category_name):
+    """Map a category name to the label-encoded value the sales model was trained on, or None"""
+    classes = registry.get('sales_encoders')['product_category'].classes_
+    product_category = category_map.get(category_name)
+    if product_category not in classes:
+        return None
+    return np.where(classes == product_category)[0][0]
+
+def predict_weekly_sales(months, weeks, category_codes, discounts_scaled):
+    """Weekly sales from the compiled lookup table, falling back to the live model"""
+    sales_table = registry.get('sales_table')
+    if sales_table is not None:
+        weekly_sales = sales_table.lookup(months, weeks, category_codes, discounts_scaled)
+        if weekly_sales is not None:
+            return weekly_sales
+
+    columns = {
+        'month_of_year': months,
+        'week_of_year': weeks,
+        'product_category': category_codes,
+        'discount_applied': discounts_scaled,
+    }
+    input_matrix = np.column_stack([columns[feature] for feature in registry.get('feature_names')])
+    return registry.get('sales_model').predict(input_matrix)
+
+def forecast_sales_cube(category_codes, discounts):
+    """
+    Forecast monthly 2022 sales for every (category, discount) pair with one model call.
+    Returns an array of shape (12, len(category_codes), len(discounts)).
+    """
+    category_codes = np.asarray(category_codes, dtype=float)
+    discounts_scaled = registry.get('sales_scaler').transform(np.asarray(discounts, dtype=float).reshape(-1, 1))[:, 0]
+    n_rows, n_categories, n_discounts = len(SALES_GRID_MONTHS), len(category_codes), len(discounts_scaled)
+
+    # One row per (week, category, discount), laid out week-major so a reshape recovers the cube
+    weekly_sales = predict_weekly_sales(
+        np.repeat(SALES_GRID_MONTHS, n_categories * n_discounts),
+        np.repeat(SALES_GRID_WEEKS, n_categories * n_discounts),
+        np.tile(np.repeat(category_codes, n_discounts), n_rows),
+        np.tile(discounts_scaled, n_rows * n_categories)
+    )
+    weekly_sales = np.asarray(weekly_sales, dtype=float).reshape(n_rows, n_categories, n_discounts)
+
+    # Sum weekly sales to get monthly sales
+    monthly_sales = np.zeros((12, n_categories, n_discounts))
+    np.add.at(monthly_sales, SALES_GRID_MONTHS - 1, weekly_sales)
+    return monthly_sales
+
+def parse_list_arg(name):
+    """Read a list query parameter given either repeated or comma separated"""
+    values = []
+    for raw in request.args.getlist(name):
+        values.extend(value.strip() for value in raw.split(',') if value.strip())
+    return values
+
+def parse_positive_int(value):
+    """value as an integer >= 1, or None if it is not one; 2.5 and '3.0' are not truncated"""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    elif isinstance(value, str) and value.strip().isdecimal():
+        value = int(value.strip())
+    if not isinstance(value, int):
+        return None
+    return value if value >= 1 else None
+
 @views.route('/predict-sales', methods=['GET'])
+@response_cache.cached(depends=('sales_model', 'sales_encoders', 'sales_scaler', 'sales_table'))
 def predict_sales():
     """Predict monthly sales for a given product category and discount applied."""
     
-    # Get query parameters
-    product_category = request.args.get('product_category')
-    discount_applied = request.args.get('discount_applied', type=float, default=0.0)
+    with stage('predict_sales', 'preprocess'):
+        # Get query parameters
+        product_category = request.args.get('product_category')
+        discount_applied = request.args.get('discount_applied', type=float, default=0.0)
 
-    if not product_category:
-        return jsonify({'error': 'Missing product_category parameter'}), 400
-    
-    product_category = category_map.get(product_category)
+        if not product_category:
+            return jsonify({'error': 'Missing product_category parameter'}), 400
+        
+        category_encoded = encode_sales_category(product_category)
+        product_category = category_map.get(product_category)
     
     # Validate product category
-    if product_category not in sales_encoders['product_category'].classes_:
+    if category_encoded is None:
         return jsonify({
-            'error': f"Unknown category: {product_category}. Available categories: {list(sales_encoders['product_category'].classes_)}"
+            'error': f"Unknown category: {product_category}. Available categories: {list(registry.get('sales_encoders')['product_category'].classes_)}"
         }), 400
 
-    # Encode category and scale discount
-    category_encoded = np.where(sales_encoders['product_category'].classes_ == product_category)[0][0]
-    discount_scaled = sales_scaler.transform([[discount_applied]])[0][0]
+    # Predict every week of 2022 in a single batch
+    with stage('predict_sales', 'inference'):
+        monthly_sales = forecast_sales_cube([category_encoded], [discount_applied])[:, 0, 0]
 
-    # Predict for each month of 2022
-    sales_predictions_2022 = {}
+    with stage('predict_sales', 'postprocess'):
+        sales_predictions_2022 = {
+            f'Month {month}': float(total_sales)  # Convert to float
+            for month, total_sales in enumerate(monthly_sales, start=1)
+        }
 
-    for month in range(1, 13):  # Months 1 to 12
-        total_sales = 0
-        num_weeks = 4 if month == 2 else 5  # Feb has ~4 weeks, others have ~4-5 weeks
-        
-        for week in range(1, num_weeks + 1):
-            sample_input = {
-                'month_of_year': month,
-                'week_of_year': week,
-                'product_category': category_encoded,
-                'discount_applied': discount_scaled
-            }
+    with stage('predict_sales', 'serialize'):
+        return jsonify({'product_category': product_category, 'sales_predictions_2022': sales_predictions_2022})
 
-            # Create input array in correct order
-            input_array = np.array([[sample_input[feature] for feature in feature_names]])
+@views.route('/predict-sales/sweep', methods=['GET'])
+def predict_sales_sweep():
+    """
+    Predict monthly 2022 sales for several categories over a list of discounts.
+    Example: /predict-sales/sweep?product_categories=Clothing,Toys&discount_applied=0,0.1,0.2
+    Categories default to all known categories and discounts to 0.0.
+    """
+    category_names = parse_list_arg('product_categories') or list(category_map)
+    try:
+        discounts = [float(value) for value in parse_list_arg('discount_applied')] or [0.0]
+    except ValueError:
+        return jsonify({'error': 'discount_applied must be a list of numbers'}), 400
 
-            # Predict weekly sales
-            predicted_sales = sales_model.predict(input_array)[0]
-            total_sales += predicted_sales  # Sum weekly sales to get monthly sales
+    unknown = [name for name in category_names if encode_sales_category(name) is None]
+    if unknown:
+        return jsonify({
+            'error': f"Unknown categories: {unknown}. Available categories: {list(category_map)}"
+        }), 400
+
+    category_codes = [encode_sales_category(name) for name in category_names]
+    cube = forecast_sales_cube(category_codes, discounts)
 
-        sales_predictions_2022[f'Month {month}'] = float(total_sales)  # Convert to float
+    sales_predictions_2022 = {
+        name: {
+            str(discount): {f'Month {month}': float(cube[month - 1, c, d]) for month in range(1, 13)}
+            for d, discount in enumerate(discounts)
+        }
+        for c, name in enumerate(category_names)
+    }
 
-    return jsonify({'product_category': product_category, 'sales_predictions_2022': sales_predictions_2022})
+    return jsonify({
+        'product_categories': category_names,
+        'discounts': discounts,
+        'sales_predictions_2022': sales_predictions_2022
+    })
 
 def get_category_based_offers(product_info, user_total_spend=0):
     category = product_info["product_category"]
@@ -107,34 +207,18 @@ def get_category_based_offers(product_info, user_total_spend=0):
     
     return applicable_offers
 
-def recommend_products_with_offers(user_id, model, dataset, df, n=5):
-    mappings = dataset.mapping()
-    user_mapping = mappings[0]
-    item_mapping = mappings[2]
-    
-    if user_id not in user_mapping:
-        return []
-    
-    user_purchases = df[
-        (df["user_id"] == user_id) & 
-        (df["interaction"] == 1)
-    ]
-    user_total_spend = user_purchases["price"].sum()
-    
-    item_ids = list(item_mapping.keys())
-    user_index = user_mapping[user_id]
-    scores = model.predict(user_index, np.arange(len(item_ids)))
-    top_items = np.argsort(-scores)[:n]
-    
+RECOMMENDATION_BATCH_SIZE = 1024
+RECOMMENDATION_SEARCH_MODES = ('exact', 'ann')
+
+def build_recommendations(item_indices, catalog, user_total_spend):
     recommendations = []
-    for item_index in top_items:
-        product_id = item_ids[item_index]
-        product_info = df[df["product_id"] == product_id].iloc[0].to_dict()
+    for item_index in item_indices:
+        product_info = catalog.product_info(item_index)
         
         offers = get_category_based_offers(product_info, user_total_spend)
         
         recommendations.append({
-            "product_id": product_id,
+            "product_id": product_info["product_id"],
             "category": product_info["product_category"],
             "price": product_info["price"],
             "offers": offers
@@ -142,182 +226,190 @@ def recommend_products_with_offers(user_id, model, dataset, df, n=5):
     
     return recommendations
 
+def score_exact(model, user_store, user_ids, user_indices, n, exclude_purchased=False):
+    """
+    Exact top-n items and scores per user. Users with a current entry in the
+    precomputed top-K store are served from it; the rest are scored live.
+    """
+    top_items = np.full((len(user_indices), n), -1, dtype=np.intp)
+    top_scores = np.full((len(user_indices), n), -np.inf, dtype=np.float32)
+
+    live_rows = []
+    topk_store = registry.get('topk_store')
+    for row, (user_id, user_index) in enumerate(zip(user_ids, user_indices)):
+        stored = None
+        if topk_store is not None and not exclude_purchased:
+            stored = topk_store.lookup(user_id, user_index, n, user_store)
+        if stored is None:
+            live_rows.append(row)
+        else:
+            top_items[row, :len(stored[0])], top_scores[row, :len(stored[1])] = stored
+
+    if live_rows:
+        scores = score_users(model, user_indices[live_rows])
+        if exclude_purchased:
+            mask_purchased(scores, user_store, user_indices[live_rows])
+        live_items = top_k(scores, n)
+        top_items[live_rows, :live_items.shape[1]] = live_items
+        top_scores[live_rows, :live_items.shape[1]] = np.take_along_axis(scores, live_items, axis=1)
+
+    return top_items, top_scores
+
+def recommend_products_batch(user_ids, model, dataset, catalog, user_store, n=5, exclude_purchased=False,
+                             search='exact', n_probe=None):
+    """
+    Recommend products with offers for many users at once.
+    search='ann' scores only the items in the n_probe closest clusters of the item index.
+    Returns a dict of user_id -> recommendations; unknown users are left out.
+    """
+    with stage('recommend', 'preprocess'):
+        user_mapping = dataset.mapping()[0]
+        known_users = [user_id for user_id in user_ids if user_id in user_mapping]
+    ITEMS_PROCESSED.inc(len(user_ids), operation='recommend')
+    
+    results = {}
+    for start in range(0, len(known_users), RECOMMENDATION_BATCH_SIZE):
+        batch_users = known_users[start:start + RECOMMENDATION_BATCH_SIZE]
+        user_indices = np.array([user_mapping[user_id] for user_id in batch_users])
+        
+        with stage('recommend', 'inference'):
+            if search == 'ann':
+                exclude = [user_store.purchased_items(index) for index in user_indices] if exclude_purchased else None
+                top_items, top_scores = registry.get('item_index').search(model, user_indices, n, n_probe, exclude)
+            else:
+                top_items, top_scores = score_exact(model, user_store, batch_users, user_indices, n, exclude_purchased)
+        
+        with stage('recommend', 'postprocess'):
+            for row, user_id in enumerate(batch_users):
+                item_indices = top_items[row][np.isfinite(top_scores[row])]
+                user_total_spend = user_store.total_spend[user_indices[row]]
+                results[user_id] = build_recommendations(item_indices, catalog, user_total_spend)
+    
+    return results
+
+def recommend_products_with_offers(user_id, model, dataset, catalog, user_store, n=5, exclude_purchased=False,
+                                   search='exact', n_probe=None):
+    results = recommend_products_batch(
+        [user_id], model, dataset, catalog, user_store, n, exclude_purchased, search, n_probe
+    )
+    return results.get(user_id, [])
+
 @views.route('/recommend', methods=['GET'])
+@response_cache.cached(depends=('product_recommendation_model', 'user_product_interaction_data',
+                                'product_catalog', 'user_item_store', 'topk_store'))
 def recommend():
-    user_id = int(request.args.get('user_id'))
-    num_recommendations = int(request.args.get('n', 5))
+    user_id = request.args.get('user_id', type=int)
+    num_recommendations = parse_positive_int(request.args.get('n', 5))
+    exclude_purchased = request.args.get('exclude_purchased', 'false').lower() == 'true'
+    search = request.args.get('search', 'exact')
+    n_probe = request.args.get('n_probe')
+
+    if user_id is None:
+        return jsonify({"error": "user_id must be an integer"}), 400
+    if search not in RECOMMENDATION_SEARCH_MODES:
+        return jsonify({"error": f"Unknown search mode: {search}. Available modes: {list(RECOMMENDATION_SEARCH_MODES)}"}), 400
+    if num_recommendations is None:
+        return jsonify({"error": "n must be an integer of at least 1"}), 400
+    if n_probe is not None:
+        n_probe = parse_positive_int(n_probe)
+        if n_probe is None:
+            return jsonify({"error": "n_probe must be an integer of at least 1"}), 400
+
     recommendations = recommend_products_with_offers(
         user_id, 
-        product_recommendation_model, 
-        user_product_interaction_data, 
-        user_product_interaction_df, 
-        num_recommendations
+        registry.get('product_recommendation_model'), 
+        registry.get('user_product_interaction_data'), 
+        registry.get('product_catalog'), 
+        registry.get('user_item_store'), 
+        num_recommendations,
+        exclude_purchased,
+        search,
+        n_probe
     )
 
     if not recommendations:
         return jsonify({"error": "User not found"}), 404
 
-    # Convert all NumPy types to native Python types
-    for rec in recommendations:
-        rec["product_id"] = int(rec["product_id"])
-        rec["price"] = float(rec["price"])
-        rec["offers"] = [
-            {key: (int(value) if isinstance(value, np.integer) else 
-                   float(value) if isinstance(value, np.floating) else 
-                   value) for key, value in offer.items()}
-            for offer in rec["offers"]
-        ]
-
-    return jsonify(recommendations)
-
-def create_sample_data(n_samples=100):
-    """Generate sample customer data for demonstration"""
-    return pd.DataFrame({
-        'customer_id': range(1, n_samples + 1),
-        'customer_lat': np.random.uniform(19.01, 19.06, n_samples),
-        'customer_lon': np.random.uniform(73.00, 73.04, n_samples),
-        'avg_purchase_value': np.random.randint(500, 5000, n_samples),
-        'total_transactions': np.random.randint(10, 100, n_samples),
-        'clothing_frequency': np.random.randint(0, 100, n_samples),
-        'electronics_frequency': np.random.randint(0, 100, n_samples),
-        'furniture_frequency': np.random.randint(0, 100, n_samples),
-        'groceries_frequency': np.random.randint(0, 100, n_samples),
-        'toys_frequency': np.random.randint(0, 100, n_samples),
-    })
+    with stage('recommend', 'serialize'):
+        return jsonify(recommendations)
+
+@views.route('/recommend/batch', methods=['POST'])
+def recommend_batch():
+    """
+    Recommend products for many users in one call.
+    Body: {"user_ids": [1, 2, ...], "n": 5, "exclude_purchased": false, "search": "exact", "n_probe": null}
+    """
+    data = request.get_json(silent=True) or {}
+    search = data.get('search', 'exact')
+    if search not in RECOMMENDATION_SEARCH_MODES:
+        return jsonify({"error": f"Unknown search mode: {search}. Available modes: {list(RECOMMENDATION_SEARCH_MODES)}"}), 400
 
-def get_product_demand_info(cluster_data):
-    """Calculate product demand information for a cluster"""
-    try:
-        product_columns = [
-            'clothing_frequency', 'electronics_frequency',
-            'furniture_frequency', 'groceries_frequency', 'toys_frequency'
-        ]
-        
-        # Calculate product demands
-        sorted_products = []
-        for col in product_columns:
-            product_name = col.split('_')[0].title()
-            demand_value = cluster_data[col].sum() * cluster_data['avg_purchase_value'].mean() / 100
-            sorted_products.append((product_name, demand_value))
-        
-        # Sort by demand value
-        sorted_products.sort(key=lambda x: x[1], reverse=True)
-        
-        # Format as strings with currency
-        return [f"{name}: ₹{value:,.2f}" for name, value in sorted_products]
-    except Exception as e:
-        print(f"Error in get_product_demand_info: {str(e)}")
-        return []
-    
-def process_cluster_data(df, n_clusters=6):
-    """Process customer data into clusters with demand analysis"""
     try:
-        # Prepare features for clustering
-        feature_columns = [
-            'customer_lat', 'customer_lon',
-            'clothing_frequency', 'electronics_frequency',
-            'furniture_frequency', 'groceries_frequency', 'toys_frequency'
-        ]
-        
-        # Normalize features
-        features = df[feature_columns]
-        features_normalized = (features - features.mean()) / features.std()
-        
-        # Perform clustering
-        kmeans = KMeans(n_clusters=n_clusters, random_state=42)
-        df['demand_cluster'] = kmeans.fit_predict(features_normalized)
-        
-        clusters = []
-        optimal_locations = []
-        
-        # Process each cluster
-        for cluster_id in range(n_clusters):
-            cluster_df = df[df['demand_cluster'] == cluster_id]
-            
-            if len(cluster_df) < 3:
-                continue
-                
-            # Calculate cluster boundaries
-            coordinates = cluster_df[['customer_lat', 'customer_lon']].values
-            hull = ConvexHull(coordinates)
-            boundary_points = coordinates[hull.vertices].tolist()
-            
-            # Calculate weighted centroid
-            weighted_lat = np.average(
-                cluster_df['customer_lat'],
-                weights=cluster_df['avg_purchase_value']
-            )
-            weighted_lon = np.average(
-                cluster_df['customer_lon'],
-                weights=cluster_df['avg_purchase_value']
-            )
-            
-            # Get product demand information
-            product_demands = get_product_demand_info(cluster_df)
-            top_product = product_demands[0].split(":")[0]
-            
-            # Calculate total demand for top product
-            top_product_col = f"{top_product.lower()}_frequency"
-            total_top_product_demand = (
-                cluster_df[top_product_col].sum() * 
-                cluster_df['avg_purchase_value'].mean() / 100
-            )
-            
-            # Calculate total demand as sum of all category demands
-            total_demand = sum(
-                cluster_df[f'{cat.lower()}_frequency'].sum() * 
-                cluster_df['avg_purchase_value'].mean() / 100
-                for cat in ['Clothing', 'Electronics', 'Furniture', 'Groceries', 'Toys']
-            )
-            
-            cluster_info = {
-                'cluster': int(cluster_id),
-                'boundary_points': boundary_points,
-                'top_product': top_product,
-                'top_product_demand': float(total_top_product_demand),
-                'total_demand': float(total_demand),
-                'customer_count': int(len(cluster_df))
-            }
-            clusters.append(cluster_info)
-            
-            # Store optimal location information
-            optimal_locations.append({
-                'cluster': int(cluster_id),
-                'lat': float(weighted_lat),
-                'lon': float(weighted_lon),
-                'product_demands': product_demands,
-                'total_demand': float(total_demand),
-                'customer_count': int(len(cluster_df))
-            })
-        
-        return clusters, optimal_locations, df
-        
-    except Exception as e:
-        print(f"Error in process_cluster_data: {str(e)}")
-        raise
+        user_ids = [int(user_id) for user_id in data.get('user_ids', [])]
+    except (TypeError, ValueError):
+        return jsonify({"error": "user_ids must be a list of integers"}), 400
+
+    num_recommendations = parse_positive_int(data.get('n', 5))
+    if num_recommendations is None:
+        return jsonify({"error": "n must be an integer of at least 1"}), 400
+    n_probe = data.get('n_probe')
+    if n_probe is not None:
+        n_probe = parse_positive_int(n_probe)
+        if n_probe is None:
+            return jsonify({"error": "n_probe must be an integer of at least 1"}), 400
+    if not user_ids:
+        return jsonify({"error": "No user_ids provided"}), 400
+
+    results = recommend_products_batch(
+        user_ids,
+        registry.get('product_recommendation_model'),
+        registry.get('user_product_interaction_data'),
+        registry.get('product_catalog'),
+        registry.get('user_item_store'),
+        num_recommendations,
+        bool(data.get('exclude_purchased', False)),
+        search,
+        n_probe
+    )
+
+    with stage('recommend', 'serialize'):
+        return jsonify({
+            "recommendations": {str(user_id): recs for user_id, recs in results.items()},
+            "not_found": [user_id for user_id in user_ids if user_id not in results]
+        })
 
 @views.route('/api/demand-analysis', methods=['GET'])
 def get_demand_analysis():
+    """
+    Clusters, optimal store locations and clustered customers.
+    include_customers=false leaves the customers out (large maps page through /api/demand-tiles);
+    orient=columns sends them as {"id": [...], "lat": [...], ...} instead of one object per customer.
+    """
     try:
-        df = create_sample_data()
-        clusters, optimal_locations, processed_df = process_cluster_data(df)
-        
-        # Prepare customer data
-        customers = processed_df.apply(lambda row: {
-            'id': int(row['customer_id']),
-            'lat': float(row['customer_lat']),
-            'lon': float(row['customer_lon']),
-            'cluster': int(row['demand_cluster']),
-            'avg_purchase_value': float(row['avg_purchase_value'])
-        }, axis=1).tolist()
+        n_clusters = request.args.get('n_clusters', type=int, default=6)
+        if not 1 <= n_clusters <= 50:
+            return jsonify({'error': 'n_clusters must be between 1 and 50'}), 400
+        orient = request.args.get('orient', 'records')
+        if orient not in ('records', 'columns'):
+            return jsonify({'error': 'orient must be records or columns'}), 400
+
+        demand_clusterer = registry.get('demand_clusterer')
+        analysis = demand_clusterer.analysis(n_clusters)
         
         response_data = {
-            'clusters': clusters,
-            'optimal_locations': optimal_locations,
-            'customers': customers
+            'clusters': analysis['clusters'],
+            'optimal_locations': analysis['optimal_locations']
         }
+        if request.args.get('include_customers', 'true').lower() != 'false':
+            if orient == 'columns':
+                response_data['customers'] = Columns(analysis['customer_columns'])
+            else:
+                response_data['customers'] = demand_clusterer.customer_records(n_clusters)
         
-        return jsonify(response_data)
+        with stage('demand_analysis', 'serialize'):
+            response = jsonify(response_data)
+        response.headers['X-Data-Fingerprint'] = analysis['fingerprint']
+        return response
         
     except Exception as e:
         error_response = {
@@ -325,140 +417,200 @@ def get_demand_analysis():
             'traceback': traceback.format_exc()
         }
         return make_response(jsonify(error_response), 500)
+
+@views.route('/api/demand-tiles', methods=['GET'])
+def get_demand_tiles():
+    """
+    Aggregated customer tiles for a map viewport.
+    Example: /api/demand-tiles?bbox=19.01,73.00,19.06,73.04&zoom=14&n_clusters=6
+    bbox is south,west,north,east; customers are included from zoom 16 upwards.
+    """
+    try:
+        bbox = [float(value) for value in request.args.get('bbox', '').split(',')]
+        if len(bbox) != 4:
+            raise ValueError
+    except ValueError:
+        return jsonify({'error': 'bbox must be south,west,north,east'}), 400
+    zoom = request.args.get('zoom', type=int, default=12)
+    n_clusters = request.args.get('n_clusters', type=int, default=6)
+    if not 1 <= n_clusters <= 50:
+        return jsonify({'error': 'n_clusters must be between 1 and 50'}), 400
+
+    tile_index = registry.get('demand_clusterer').tiles(n_clusters)
+    return jsonify(tile_index.query(bbox, zoom))
+
+@views.route('/api/customers', methods=['POST'])
+def add_customers():
+    """Add customers (a JSON list of records) to the demand analysis dataset"""
+    data = request.get_json(silent=True)
+    if not data or not isinstance(data, list):
+        return jsonify({'error': 'Expected a JSON list of customer records'}), 400
+
+    new_customers = pd.DataFrame(data)
+    missing_columns = [column for column in CUSTOMER_COLUMNS if column not in new_customers.columns]
+    if missing_columns:
+        return jsonify({'error': f"Missing required columns: {missing_columns}"}), 400
+    for column in CUSTOMER_COLUMNS:
+        new_customers[column] = pd.to_numeric(new_customers[column], errors='coerce')
+    invalid_columns = [column for column in CUSTOMER_COLUMNS if not np.isfinite(new_customers[column]).all()]
+    if invalid_columns:
+        return jsonify({'error': f"Columns must be finite numbers in every record: {invalid_columns}"}), 400
+
+    demand_clusterer = registry.get('demand_clusterer')
+    fingerprint = demand_clusterer.add_customers(new_customers)
+    return jsonify({'added': len(new_customers), 'customer_count': len(demand_clusterer.customers), 'fingerprint': fingerprint})
     
+def parse_category_arg(value):
+    """Accept either a category name or its numeric id from category_map"""
+    if value is None:
+        return None
+    if value.isdigit():
+        names = {code: name for name, code in category_map.items()}
+        return names.get(int(value), value)
+    return value
+
 @views.route('/avg_data', methods=['GET'])
+@response_cache.cached(depends=('sales_rollup',))
 def avg_data():
-    product_category = int(request.args.get('product_category'))
-
-    main_dataset_df['transaction_date'] = pd.to_datetime(main_dataset_df['transaction_date'])
-    main_dataset_df['year'] = main_dataset_df['transaction_date'].dt.year
-    main_dataset_df['month'] = main_dataset_df['transaction_date'].dt.month
-
-    main_dataset_df.columns = main_dataset_df.columns.str.strip()
-
-    # Filter for year 2021
-    df_2021 = main_dataset_df[main_dataset_df['year'] == 2021]
-
-    if 'transaction_date' not in main_dataset_df.columns:
-        print("Error: 'transaction_date' column is missing!")
-        print("Available columns:", main_dataset_df.columns)
-        exit()
+    product_category = request.args.get('product_category')
+    year = request.args.get('year', type=int, default=2021)
 
-    # Group by month and calculate required metrics
-    monthly_metrics = df_2021.groupby('month').agg({
-        'avg_purchase_value': 'mean',
-        'total_sales': 'sum',
-        'total_transactions': 'sum',
-        'avg_transaction_value': 'mean'
-    }).reset_index()
+    monthly_metrics = registry.get('sales_rollup').monthly_metrics(year, parse_category_arg(product_category))
 
     # Prepare JSON response
-    result_dict = {"product_category": product_category, "sales_2021": {}}
-
-    for _, row in monthly_metrics.iterrows():
-        month = row['month']
-        result_dict["sales_2021"][f"Month {month}"] = {
-            "avg_purchase_value": row['avg_purchase_value'],
-            "total_sales": row['total_sales'],
-            "total_transactions": row['total_transactions'],
-            "avg_transaction_value": row['avg_transaction_value']
-        }
+    if product_category is not None and product_category.isdigit():
+        product_category = int(product_category)
+    result_dict = {"product_category": product_category, f"sales_{year}": {}}
+
+    for month, metrics in monthly_metrics.items():
+        result_dict[f"sales_{year}"][f"Month {month}"] = metrics
 
     return jsonify(result_dict)
 
 @views.route('/sales_2021', methods=['GET'])
+@views.route('/sales', methods=['GET'])
+@response_cache.cached(depends=('sales_rollup',))
 def get_sales_2021():
-    main_dataset_df['transaction_date'] = pd.to_datetime(main_dataset_df['transaction_date'])
-    main_dataset_df['year'] = main_dataset_df['transaction_date'].dt.year
-    main_dataset_df['month'] = main_dataset_df['transaction_date'].dt.month
-
-    # Filter data for 2021
-    df_2021 = main_dataset_df[main_dataset_df['year'] == 2021]
+    year = request.args.get('year', type=int, default=2021)
 
     # Define product categories to filter
     categories = ['Electronics', 'Toys', 'Groceries', 'Furniture', 'Clothing']
-    df_filtered = df_2021[df_2021['product_category'].isin(categories)]
+    requested = request.args.get('product_category')
+    if requested:
+        categories = [parse_category_arg(requested)]
 
-    # Group by month and category, then calculate total sales
-    monthly_sales = df_filtered.groupby(['month', 'product_category'])['total_sales'].sum().reset_index()
+    monthly_sales = registry.get('sales_rollup').monthly_sales_by_category(year, categories)
 
     # Prepare JSON response
     result_dict = {}
 
     for category in categories:
-        category_sales = monthly_sales[monthly_sales['product_category'] == category]
-        sales_data = {f"Month {row['month']}": row['total_sales'] for _, row in category_sales.iterrows()}
-        result_dict[f"{category}_sales_2021"] = sales_data
+        sales_data = {f"Month {month}": total_sales for month, total_sales in monthly_sales[category].items()}
+        result_dict[f"{category}_sales_{year}"] = sales_data
 
     return jsonify(result_dict)
 
-def preprocess_input(input_data):
+@views.route('/ingest/transactions', methods=['POST'])
+def ingest_transactions():
     """
-    Preprocess the input data to match the format used during training
+    Append a batch of transactions and update the monthly rollup.
+    Send CSV (text/csv) or NDJSON (application/x-ndjson) as the request body,
+    or override the format with ?format=csv|ndjson.
     """
+    fmt = request.args.get('format') or batch_format(request.content_type)
     try:
-        # Convert input to DataFrame if it's a dictionary
-        if isinstance(input_data, dict):
-            input_data = pd.DataFrame([input_data])
-        
-        # Ensure all required features are present
-        missing_features = [feat for feat in churn_feature_list if feat not in input_data.columns]
-        if missing_features:
-            raise ValueError(f"Missing required features: {missing_features}")
-        
-        # Select only the required features in the correct order
-        input_df = input_data[churn_feature_list].copy()
-        
-        # Convert to float if needed
-        input_df = input_df.astype(float)
-        
-        # Scale the features
-        scaled_features = churn_scaler.transform(input_df)
-        
-        return scaled_features
-        
+        df = read_transaction_batch(request.get_data(), fmt)
     except Exception as e:
-        raise Exception(f"Error in preprocessing: {str(e)}")
-    
-def predict_churn(input_data):
+        return jsonify({'error': f"Invalid transaction batch: {str(e)}", 'status': 'error'}), 400
+
+    if df.empty:
+        return jsonify({'error': 'Empty transaction batch', 'status': 'error'}), 400
+
+    try:
+        result = registry.get('transaction_ingestor').ingest(df)
+    except ValueError as e:
+        return jsonify({'error': f"Invalid transaction batch: {str(e)}", 'status': 'error'}), 400
+    result['status'] = 'success'
+    return jsonify(result)
+
+@views.route('/ingest/interactions', methods=['POST'])
+def ingest_interactions():
     """
-    Make predictions using the loaded model
+    Queue user-product interactions for the online recommendation update.
+    Columns: user_id, product_id, product_category (one of DEMAND_CATEGORIES), interaction, price. Send CSV
+    (text/csv) or NDJSON (application/x-ndjson), or override with ?format=csv|ndjson.
+    New users get recommendations once the update is published; see online.py.
     """
+    fmt = request.args.get('format') or batch_format(request.content_type)
     try:
-        # Preprocess the input
-        processed_data = preprocess_input(input_data)
-        
-        # Make prediction
-        prediction_prob = churn_model.predict_proba(processed_data)[:, 1]
-        prediction_label = churn_model.predict(processed_data)
-        
-        return {
-            'churn_probability': float(prediction_prob[0]),  # Convert to float for JSON serialization
-            'churn_prediction': int(prediction_label[0])     # Convert to int for JSON serialization
-        }
+        df = read_batch(request.get_data(), fmt, INTERACTION_COLUMNS)
+        if df.empty:
+            return jsonify({'error': 'Empty interaction batch', 'status': 'error'}), 400
+        result = registry.get('interaction_updater').submit(df)
     except Exception as e:
-        raise Exception(f"Error in prediction: {str(e)}")
-    
+        return jsonify({'error': f"Invalid interaction batch: {str(e)}", 'status': 'error'}), 400
+
+    result['status'] = 'queued'
+    return jsonify(result), 202
+
+@views.route('/ingest/interactions/stats', methods=['GET'])
+def interaction_update_stats():
+    stats = registry.get('interaction_updater').stats()
+    stats['online_interactions'] = len(registry.get('online_interactions'))
+    return jsonify(stats)
+
+def iter_ndjson_records(stream):
+    """Parse an NDJSON request body line by line without reading it all first"""
+    for line_number, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            raise ValueError(f"Invalid JSON on line {line_number}")
+
+def stream_churn_scores(stream, chunk_size):
+    try:
+        for result in iter_churn_scores(iter_ndjson_records(stream), chunk_size):
+            yield json.dumps(format_churn_result(result)) + '\n'
+    except Exception as e:
+        yield json.dumps({'error': str(e), 'status': 'error'}) + '\n'
+
 @views.route('/predict-churn', methods=['POST'])
 def predict():
+    """
+    Score one customer (JSON object), a batch (JSON array, answered with a JSON array)
+    or a stream (application/x-ndjson body, answered with an NDJSON stream).
+    """
+    chunk_size = request.args.get('chunk_size', type=int, default=CHURN_CHUNK_SIZE)
+    if chunk_size < 1:
+        return jsonify({'error': 'chunk_size must be positive', 'status': 'error'}), 400
+
+    if 'ndjson' in (request.content_type or ''):
+        return Response(
+            stream_with_context(stream_churn_scores(request.stream, chunk_size)),
+            mimetype='application/x-ndjson'
+        )
+
     try:
         # Get JSON data from request
         input_data = request.get_json()
         
         if not input_data:
             return jsonify({'error': 'No input data provided'}), 400
+
+        if isinstance(input_data, list):
+            results = [format_churn_result(result) for result in iter_churn_scores(input_data, chunk_size)]
+            with stage('predict_churn', 'serialize'):
+                return jsonify({'results': results, 'count': len(results), 'status': 'success'})
             
         # Make prediction
         result = predict_churn(input_data)
         
         # Format the response
-        response = {
-            'churn_probability': f"{result['churn_probability']:.2%}",
-            'churn_prediction': 'Yes' if result['churn_prediction'] == 1 else 'No',
-            'status': 'success'
-        }
-        
-        return jsonify(response)
+        with stage('predict_churn', 'serialize'):
+            return jsonify(format_churn_result(result))
         
     except Exception as e:
-        return jsonify({'error': str(e), 'status': 'error'}), 400
\ No newline at end of file
+        return jsonify({'error': str(e), 'status': 'error'}), 400
@@ -0,0 +1 @@
+"""Synthetic-data benchmarks and load tests for the API; see run.py"""
@@ -0,0 +1,135 @@
+"""
+One request builder per route.
+
+Each scenario returns the keyword arguments of a single request (method, path,
+query_string, json, data, headers) built from a seeded random generator, so
+every run issues the same request sequence. Scenarios that change server state
+(ingest, new customers, online interactions) come last.
+"""
+import json
+
+import numpy as np
+
+from .synthetic import CATEGORIES, churn_frame, interaction_shape, product_table, transaction_frame
+
+DISCOUNTS = (0.0, 0.05, 0.1, 0.15, 0.2, 0.3)
+YEARS = (2019, 2020, 2021, 2022, 2023)
+# Bounds of demand.create_sample_data
+LAT_RANGE = (19.01, 19.06)
+LON_RANGE = (73.00, 73.04)
+
+
+class Scenario:
+    def __init__(self, name, build, mutates=False):
+        self.name = name
+        self.build = build
+        self.mutates = mutates
+
+
+def scenarios(rows, feature_list):
+    """Every benchmarked route for datasets of the given row counts"""
+    n_users, n_products = interaction_shape(rows['interactions'])
+    include_customers = 'true' if rows['customers'] <= 100000 else 'false'
+
+    def user_id(rng):
+        return int(rng.integers(1, n_users + 1))
+
+    def churn_records(rng, size):
+        return churn_frame(size, feature_list, rng)[feature_list].to_dict(orient='records')
+
+    def viewport(rng):
+        zoom = int(rng.integers(8, 17))
+        # Smaller boxes at higher zoom, like a map being zoomed in
+        span = 0.05 / 2 ** max(zoom - 12, 0)
+        south = rng.uniform(LAT_RANGE[0], LAT_RANGE[1] - span / 2)
+        west = rng.uniform(LON_RANGE[0], LON_RANGE[1] - span / 2)
+        return {'bbox': f'{south},{west},{south + span},{west + span}', 'zoom': zoom}
+
+    def new_customers(rng):
+        from app.demand import create_sample_data
+
+        customers = create_sample_data(100, seed=int(rng.integers(1 << 31)))
+        customers['customer_id'] += rows['customers'] + int(rng.integers(1 << 30))
+        return customers.to_dict(orient='records')
+
+    def transaction_batch(rng):
+        return transaction_frame(1000, rng).to_csv(index=False)
+
+    def interaction_batch(rng, size=100):
+        # Half from users the model was trained on, half from new ones
+        products = product_table(n_products).sample(size, replace=True, random_state=int(rng.integers(1 << 31)))
+        return products.assign(
+            user_id=rng.integers(1, 2 * n_users + 1, size),
+            interaction=(rng.random(size) < 0.3).astype(int),
+        )[['user_id', 'product_id', 'product_category', 'interaction', 'price']].to_csv(index=False)
+
+    return [
+        Scenario('predict_sales', lambda rng: {
+            'path': '/predict-sales',
+            'query_string': {'product_category': rng.choice(CATEGORIES), 'discount_applied': rng.choice(DISCOUNTS)},
+        }),
+        Scenario('predict_sales_sweep', lambda rng: {
+            'path': '/predict-sales/sweep',
+            'query_string': {'product_categories': ','.join(CATEGORIES), 'discount_applied': '0,0.1,0.2,0.3'},
+        }),
+        Scenario('recommend', lambda rng: {
+            'path': '/recommend', 'query_string': {'user_id': user_id(rng)},
+        }),
+        Scenario('recommend_ann', lambda rng: {
+            'path': '/recommend', 'query_string': {'user_id': user_id(rng), 'search': 'ann'},
+        }),
+        Scenario('recommend_batch', lambda rng: {
+            'method': 'POST', 'path': '/recommend/batch',
+            'json': {'user_ids': [user_id(rng) for _ in range(100)], 'n': 5},
+        }),
+        Scenario('demand_analysis', lambda rng: {
+            'path': '/api/demand-analysis',
+            'query_string': {'n_clusters': int(rng.choice([5, 6])), 'include_customers': include_customers},
+        }),
+        Scenario('demand_tiles', lambda rng: {
+            'path': '/api/demand-tiles', 'query_string': viewport(rng),
+        }),
+        Scenario('avg_data', lambda rng: {
+            'path': '/avg_data',
+            'query_string': {'product_category': rng.choice(CATEGORIES), 'year': int(rng.choice(YEARS))},
+        }),
+        Scenario('sales', lambda rng: {
+            'path': '/sales_2021', 'query_string': {'year': int(rng.choice(YEARS))},
+        }),
+        Scenario('predict_churn', lambda rng: {
+            'method': 'POST', 'path': '/predict-churn', 'json': churn_records(rng, 1)[0],
+        }),
+        Scenario('predict_churn_batch', lambda rng: {
+            'method': 'POST', 'path': '/predict-churn', 'json': churn_records(rng, 1000),
+        }),
+        Scenario('predict_churn_stream', lambda rng: {
+            'method': 'POST', 'path': '/predict-churn',
+            'data': '\n'.join(json.dumps(record) for record in churn_records(rng, 10000)),
+            'headers': {'Content-Type': 'application/x-ndjson'},
+        }),
+        Scenario('models_stats', lambda rng: {'path': '/models/stats'}),
+        Scenario('metrics', lambda rng: {'path': '/metrics'}),
+        Scenario('ingest_transactions', lambda rng: {
+            'method': 'POST', 'path': '/ingest/transactions',
+            'data': transaction_batch(rng), 'headers': {'Content-Type': 'text/csv'},
+        }, mutates=True),
+        Scenario('add_customers', lambda rng: {
+            'method': 'POST', 'path': '/api/customers', 'json': new_customers(rng),
+        }, mutates=True),
+        Scenario('ingest_interactions', lambda rng: {
+            'method': 'POST', 'path': '/ingest/interactions',
+            'data': interaction_batch(rng), 'headers': {'Content-Type': 'text/csv'},
+        }, mutates=True),
+    ]
+
+
+def request_plan(scenario, n_requests, seed=0, distinct=50):
+    """
+    The request kwargs a scenario issues, built up front so building is not
+    timed. At most `distinct` different requests are built and then repeated,
+    which bounds the memory of large payloads and exercises the response cache
+    the way repeated dashboard queries do.
+    """
+    rng = np.random.default_rng([seed, sum(scenario.name.encode())])
+    built = [scenario.build(rng) for _ in range(min(n_requests, distinct))]
+    return [built[i % len(built)] for i in range(n_requests)]
@@ -0,0 +1,337 @@
+"""
+Benchmark every route on synthetic data and compare against a saved baseline.
+
+Usage (from the backend directory):
+    python -m benchmarks.run --rows 100000                          # 10k .. 10M rows per dataset
+    python -m benchmarks.run --rows 1000000 --requests 500 --concurrency 16
+    python -m benchmarks.run --rows 100000 --save-baseline          # record benchmarks/baseline.json
+    python -m benchmarks.run --rows 100000 --url http://127.0.0.1:5000   # load a running server instead
+
+Datasets and models for each scale are generated once into
+benchmarks/data/<rows>/ (see synthetic.py). The app's dataset and model paths
+are pointed there; the sales forecasting model is the checked-in one.
+
+Scenarios that change server state (ingestion, adding customers) append to the
+datasets they are given. When any of them is selected, the in-process run
+works on a temporary copy of the data directory, removed on exit, so every
+run starts from the same generated data and results stay comparable with the
+baseline. With --url the server's own data is written to; benchmark a server
+started on fresh data, or pass --read-only.
+
+Each route first runs --requests requests one at a time through the Flask test
+client. It then runs the same number again from --concurrency threads, each
+with its own client or HTTP session. Throughput, p50/p99 latency, error count
+are recorded for both runs, along with how much the process RSS grew across
+the route's runs (routes share one process, so a process-wide peak would only
+reflect the heaviest route so far; the peak is recorded once for the whole
+run). Model and dataset load times are recorded from the registry. Results
+are written to --output. With --baseline (default benchmarks/baseline.json, if
+it exists), any route whose throughput drops, latency rises or RSS growth
+rises by more than --tolerance is flagged, and the exit status is 1. RSS
+growth below RSS_GROWTH_FLOOR is treated as noise.
+"""
+import argparse
+import atexit
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+BENCHMARK_DIR = os.path.abspath(os.path.dirname(__file__))
+DEFAULT_BASELINE = os.path.join(BENCHMARK_DIR, 'baseline.json')
+# Allocator and page-cache jitter; growth is compared against at least this much
+RSS_GROWTH_FLOOR = 16 * 2 ** 20
+
+
+def point_app_at(paths):
+    """Redirect the app's data and model paths to a generated scale; must run before anything loads"""
+    import app
+
+    directory = os.path.dirname(paths['interactions'])
+    columnar = os.path.join(directory, 'columnar')
+    app.main_dataset_path = paths['transactions']
+    app.main_dataset_columnar_dir = os.path.join(columnar, 'retail_data')
+    app.user_product_interaction_data_path = paths['interactions']
+    app.user_product_interaction_columnar_dir = os.path.join(columnar, 'user_product_interactions')
+    app.product_recommendation_model_path = paths['recommender']
+    app.topk_store_dir = os.path.join(directory, 'topk_store')
+    app.online_interactions_path = os.path.join(directory, 'online_interactions.csv')
+    app.customers_path = paths['customers']
+    app.churn_model_path = paths['churn_model']
+    app.churn_scalar_path = paths['churn_scaler']
+    app.churn_forest_path = os.path.join(directory, 'churn_forest.joblib')
+
+
+def working_copy(data_dir, paths):
+    """Copy data_dir to a temporary directory removed at exit; returns paths pointing into the copy"""
+    copy_dir = tempfile.mkdtemp(prefix='benchmark-data-')
+    atexit.register(shutil.rmtree, copy_dir, ignore_errors=True)
+    shutil.copytree(data_dir, copy_dir, dirs_exist_ok=True)
+    return {name: os.path.join(copy_dir, os.path.relpath(path, data_dir)) for name, path in paths.items()}
+
+
+def percentiles(latencies):
+    latencies = np.asarray(latencies)
+    return {
+        'p50_ms': 1000 * float(np.percentile(latencies, 50)),
+        'p99_ms': 1000 * float(np.percentile(latencies, 99)),
+        'mean_ms': 1000 * float(latencies.mean()),
+    }
+
+
+class TestClientSender:
+    """Issues requests in-process through the Flask test client"""
+
+    def __init__(self, flask_app):
+        self.client = flask_app.test_client()
+
+    def __call__(self, request):
+        request = dict(request)
+        response = self.client.open(request.pop('path'), method=request.pop('method', 'GET'), **request)
+        response.get_data()
+        return response.status_code
+
+
+class HTTPSender:
+    """Issues requests to a running server over one keep-alive session"""
+
+    def __init__(self, base_url):
+        import requests
+
+        self.base_url = base_url.rstrip('/')
+        self.session = requests.Session()
+
+    def __call__(self, request):
+        response = self.session.request(
+            request.get('method', 'GET'),
+            self.base_url + request['path'],
+            params=request.get('query_string'),
+            json=request.get('json'),
+            data=request.get('data'),
+            headers=request.get('headers'),
+        )
+        return response.status_code
+
+
+def timed_requests(send, plan):
+    latencies = []
+    errors = 0
+    for request in plan:
+        start = time.perf_counter()
+        status = send(request)
+        latencies.append(time.perf_counter() - start)
+        if status >= 400:
+            errors += 1
+    return latencies, errors
+
+
+def run_sequential(make_sender, plan):
+    start = time.perf_counter()
+    latencies, errors = timed_requests(make_sender(), plan)
+    elapsed = time.perf_counter() - start
+    return dict(percentiles(latencies), requests=len(plan), errors=errors, throughput_rps=len(plan) / elapsed)
+
+
+def run_concurrent(make_sender, plan, concurrency):
+    shards = [plan[i::concurrency] for i in range(concurrency)]
+    senders = [make_sender() for _ in shards]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(timed_requests, senders, shards))
+    elapsed = time.perf_counter() - start
+    latencies = [latency for shard_latencies, _ in results for latency in shard_latencies]
+    return dict(
+        percentiles(latencies),
+        requests=len(plan),
+        errors=sum(errors for _, errors in results),
+        concurrency=concurrency,
+        throughput_rps=len(plan) / elapsed
+    )
+
+
+def compare(results, baseline, tolerance):
+    """Regressions of results against baseline, as human readable strings"""
+    regressions = []
+    for name, current in results['scenarios'].items():
+        previous = baseline.get('scenarios', {}).get(name)
+        if previous is None:
+            continue
+        for mode in ('sequential', 'concurrent'):
+            now, then = current.get(mode), previous.get(mode)
+            if not now or not then:
+                continue
+            if now['throughput_rps'] < then['throughput_rps'] * (1 - tolerance):
+                regressions.append(
+                    f"{name} {mode}: throughput {then['throughput_rps']:.1f} -> {now['throughput_rps']:.1f} req/s"
+                )
+            for key in ('p50_ms', 'p99_ms'):
+                if now[key] > then[key] * (1 + tolerance):
+                    regressions.append(f"{name} {mode}: {key} {then[key]:.2f} -> {now[key]:.2f}")
+        if current.get('rss_growth_bytes') is not None and previous.get('rss_growth_bytes') is not None:
+            allowed = max(previous['rss_growth_bytes'], RSS_GROWTH_FLOOR) * (1 + tolerance)
+            if current['rss_growth_bytes'] > allowed:
+                regressions.append(
+                    f"{name}: RSS growth {previous['rss_growth_bytes'] / 2 ** 20:.0f} -> "
+                    f"{current['rss_growth_bytes'] / 2 ** 20:.0f} MiB"
+                )
+    return regressions
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCHMARK_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100000, help='Rows per synthetic dataset')
+    parser.add_argument('--customer-rows', type=int, help='Customers for demand clustering (default --rows)')
+    parser.add_argument('--requests', type=int, default=200, help='Requests per route and mode')
+    parser.add_argument('--concurrency', type=int, default=8, help='Threads in the concurrent run')
+    parser.add_argument('--routes', nargs='*', help='Only these scenarios (default all)')
+    parser.add_argument('--read-only', action='store_true', help='Skip scenarios that change server state')
+    parser.add_argument('--no-cache', action='store_true', help='Disable the response cache')
+    parser.add_argument('--url', help='Benchmark a running server instead of the in-process test client')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--data-dir', help='Where generated data lives (default benchmarks/data/<rows>)')
+    parser.add_argument('--output', help='Results file (default benchmarks/results-<rows>.json)')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='Baseline to compare against')
+    parser.add_argument('--save-baseline', action='store_true', help='Write the results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed relative regression')
+    args = parser.parse_args()
+
+    if args.no_cache:
+        os.environ['RESPONSE_CACHE_SIZE'] = '0'
+    os.environ.setdefault('MODEL_WARMUP', 'lazy')
+
+    import app
+    from app.memstats import peak_rss_bytes, rss_bytes
+    from .routes import request_plan, scenarios
+    from .synthetic import generate
+
+    with open(app.churn_feature_path, 'r') as f:
+        feature_list = json.load(f)
+    if isinstance(feature_list, dict):
+        feature_list = list(feature_list.values())
+
+    rows = {
+        'interactions': args.rows,
+        'transactions': args.rows,
+        'churn': args.rows,
+        'customers': args.customer_rows or args.rows,
+    }
+    data_dir = args.data_dir or os.path.join(BENCHMARK_DIR, 'data', str(args.rows))
+    start = time.perf_counter()
+    paths = generate(data_dir, rows, feature_list, args.seed)
+    print(f"Synthetic data ready in {data_dir} ({time.perf_counter() - start:.1f}s)")
+
+    selected = [
+        scenario for scenario in scenarios(rows, feature_list)
+        if (not args.routes or scenario.name in args.routes) and not (args.read_only and scenario.mutates)
+    ]
+    mutating = [scenario.name for scenario in selected if scenario.mutates]
+
+    if args.url:
+        if mutating:
+            print(f"{', '.join(mutating)} will change the data of {args.url}; use --read-only to skip them")
+
+        def make_sender():
+            return HTTPSender(args.url)
+        load_stats = None
+    else:
+        if mutating:
+            start = time.perf_counter()
+            paths = working_copy(data_dir, paths)
+            print(f"Copied the data for {', '.join(mutating)} to {os.path.dirname(paths['interactions'])} "
+                  f"({time.perf_counter() - start:.1f}s)")
+        point_app_at(paths)
+        flask_app = app.create_app()
+
+        def make_sender():
+            return TestClientSender(flask_app)
+
+        start = time.perf_counter()
+        app.registry.warm()
+        load_stats = {
+            'warm_seconds': time.perf_counter() - start,
+            'rss_after_load_bytes': rss_bytes(),
+            'artifacts': app.registry.load_stats(),
+            'datasets': app.dataset_load_stats,
+        }
+
+    results = {
+        'meta': {
+            'rows': rows,
+            'requests': args.requests,
+            'concurrency': args.concurrency,
+            'target': args.url or 'test_client',
+            'response_cache': not args.no_cache,
+            'git_revision': git_revision(),
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'timestamp': time.time(),
+        },
+        'load': load_stats,
+        'scenarios': {},
+    }
+
+    print(f"{'route':<22} {'mode':<11} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for scenario in selected:
+        plan = request_plan(scenario, args.requests, args.seed)
+        rss_before = rss_bytes()
+        result = {
+            'sequential': run_sequential(make_sender, plan),
+            'concurrent': run_concurrent(make_sender, plan, args.concurrency),
+        }
+        if not args.url:
+            result['rss_bytes'] = rss_bytes()
+            result['rss_growth_bytes'] = result['rss_bytes'] - rss_before
+        results['scenarios'][scenario.name] = result
+        for mode in ('sequential', 'concurrent'):
+            r = result[mode]
+            print(f"{scenario.name:<22} {mode:<11} {r['throughput_rps']:>9.1f} {r['p50_ms']:>9.2f} "
+                  f"{r['p99_ms']:>9.2f} {r['errors']:>7}")
+
+    if not args.url:
+        results['peak_rss_bytes'] = peak_rss_bytes()
+
+    output = args.output or os.path.join(BENCHMARK_DIR, f'results-{args.rows}.json')
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output}")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        return 0
+    with open(args.baseline, 'r') as f:
+        baseline = json.load(f)
+    if baseline['meta']['rows'] != rows or baseline['meta']['requests'] != args.requests:
+        print("Baseline was recorded with different rows or requests; comparing anyway")
+
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print(f"{len(regressions)} regressions beyond {args.tolerance:.0%} of the baseline:")
+        for regression in regressions:
+            print(f"  {regression}")
+        return 1
+    print("No regressions against the baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,183 @@
+"""
+Synthetic datasets shaped like the app's inputs, at any scale.
+
+Every generator writes its CSV in chunks of CHUNK_ROWS, so 10M-row files are
+produced in bounded memory, and is seeded, so the same scale always produces
+the same files. train_recommender() and train_churn_model() fit small models
+on the generated data, because the checked-in LightFM model only knows the
+users and products of user_product_interactions_large.csv.
+"""
+import json
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+
+from app.demand import DEMAND_CATEGORIES, create_sample_data
+from app.rollups import SUM_FIELDS
+
+CHUNK_ROWS = 1_000_000
+CATEGORIES = DEMAND_CATEGORIES
+CATEGORY_PRICE = {'Clothing': 150.0, 'Electronics': 600.0, 'Furniture': 900.0, 'Groceries': 60.0, 'Toys': 90.0}
+
+
+def _write_chunks(path, n_rows, make_chunk):
+    """Write make_chunk(start, size) frames for rows [0, n_rows) to one CSV"""
+    with open(path, 'w', newline='') as f:
+        for start in range(0, n_rows, CHUNK_ROWS):
+            chunk = make_chunk(start, min(CHUNK_ROWS, n_rows - start))
+            chunk.to_csv(f, header=start == 0, index=False)
+    return path
+
+
+def interaction_shape(n_rows):
+    """Users and products for an interaction log of n_rows, about 20 rows per user"""
+    return max(100, n_rows // 20), max(50, min(n_rows // 100, 20000))
+
+
+def product_table(n_products, seed=0):
+    rng = np.random.default_rng(seed)
+    categories = rng.choice(CATEGORIES, n_products)
+    base = np.array([CATEGORY_PRICE[category] for category in categories])
+    return pd.DataFrame({
+        'product_id': np.arange(1, n_products + 1),
+        'product_category': categories,
+        'price': base * rng.lognormal(0.0, 0.5, n_products),
+    })
+
+
+def write_interactions(path, n_rows, seed=0):
+    """user_id,product_id,product_category,interaction,price like user_product_interactions_large.csv"""
+    n_users, n_products = interaction_shape(n_rows)
+    products = product_table(n_products, seed)
+    # Skewed popularity, so some products dominate as in real logs
+    popularity = 1.0 / np.arange(1, n_products + 1) ** 0.8
+    popularity /= popularity.sum()
+
+    def make_chunk(start, size):
+        rng = np.random.default_rng([seed, start])
+        item = rng.choice(n_products, size, p=popularity)
+        return pd.DataFrame({
+            'user_id': rng.integers(1, n_users + 1, size),
+            'product_id': products['product_id'].to_numpy()[item],
+            'product_category': products['product_category'].to_numpy()[item],
+            'interaction': (rng.random(size) < 0.3).astype(int),
+            'price': products['price'].to_numpy()[item],
+        })
+
+    return _write_chunks(path, n_rows, make_chunk)
+
+
+def transaction_frame(size, rng):
+    """Retail transactions with the columns the rollup and ingest endpoint read"""
+    days = rng.integers(0, 5 * 365, size)
+    transactions = rng.integers(1, 20, size)
+    avg_transaction_value = rng.gamma(2.0, 150.0, size)
+    return pd.DataFrame({
+        'customer_id': rng.integers(1, 100000, size),
+        'transaction_date': (pd.Timestamp('2019-01-01') + pd.to_timedelta(days, unit='D')).strftime('%Y-%m-%d'),
+        'product_category': rng.choice(CATEGORIES, size),
+        'avg_purchase_value': rng.gamma(2.0, 200.0, size),
+        'total_sales': avg_transaction_value * transactions,
+        'total_transactions': transactions,
+        'avg_transaction_value': avg_transaction_value,
+    })[['customer_id', 'transaction_date', 'product_category'] + SUM_FIELDS]
+
+
+def write_transactions(path, n_rows, seed=0):
+    return _write_chunks(path, n_rows, lambda start, size: transaction_frame(size, np.random.default_rng([seed, start])))
+
+
+def churn_frame(size, feature_list, rng):
+    """Churn records with every feature of feature_list and a label that depends on them"""
+    features = pd.DataFrame(rng.normal(0.0, 1.0, (size, len(feature_list))) * 10 + 50, columns=feature_list)
+    weights = np.linspace(-1.0, 1.0, len(feature_list))
+    logits = ((features.to_numpy() - 50) / 10) @ weights
+    features['churn'] = (rng.random(size) < 1 / (1 + np.exp(-logits))).astype(int)
+    return features
+
+
+def write_churn_records(path, n_rows, feature_list, seed=0):
+    return _write_chunks(
+        path, n_rows, lambda start, size: churn_frame(size, feature_list, np.random.default_rng([seed, start]))
+    )
+
+
+def write_customers(path, n_rows, seed=0):
+    """Customer geodata in the shape of demand.create_sample_data"""
+    def make_chunk(start, size):
+        chunk = create_sample_data(size, seed=seed + start // CHUNK_ROWS)
+        chunk['customer_id'] += start
+        return chunk
+
+    return _write_chunks(path, n_rows, make_chunk)
+
+
+def train_recommender(interactions_path, model_path, epochs=1, seed=0):
+    """Fit a LightFM model on the generated log with the same id mapping the app builds"""
+    from lightfm import LightFM
+    from lightfm.data import Dataset
+
+    df = pd.read_csv(interactions_path)
+    dataset = Dataset()
+    dataset.fit(users=df['user_id'].unique(), items=df['product_id'].unique())
+    purchases = df[df['interaction'] == 1]
+    interactions, _ = dataset.build_interactions(zip(purchases['user_id'], purchases['product_id']))
+
+    model = LightFM(no_components=32, loss='warp', random_state=seed)
+    model.fit(interactions, epochs=epochs, num_threads=os.cpu_count())
+    with open(model_path, 'wb') as f:
+        pickle.dump(model, f)
+    return model_path
+
+
+def train_churn_model(records_path, model_path, scaler_path, feature_list, max_rows=200000, seed=0):
+    """Fit the StandardScaler and random forest the churn endpoint loads"""
+    import joblib
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.preprocessing import StandardScaler
+
+    df = pd.read_csv(records_path, nrows=max_rows)
+    scaler = StandardScaler().fit(df[feature_list])
+    model = RandomForestClassifier(n_estimators=100, max_depth=12, n_jobs=-1, random_state=seed)
+    model.fit(scaler.transform(df[feature_list]), df['churn'])
+    # Uncompressed, so the app can memory-map it
+    joblib.dump(model, model_path)
+    joblib.dump(scaler, scaler_path)
+    return model_path
+
+
+def generate(directory, rows, feature_list, seed=0):
+    """
+    Write every dataset and model for one scale into directory, reusing what is
+    already there. rows maps 'interactions', 'transactions', 'churn' and
+    'customers' to row counts. Returns the file paths.
+    """
+    os.makedirs(directory, exist_ok=True)
+    paths = {
+        'interactions': os.path.join(directory, 'interactions.csv'),
+        'transactions': os.path.join(directory, 'retail_data.csv'),
+        'churn': os.path.join(directory, 'churn_records.csv'),
+        'customers': os.path.join(directory, 'customers.csv'),
+        'recommender': os.path.join(directory, 'lightfm_model.pkl'),
+        'churn_model': os.path.join(directory, 'rf_model.joblib'),
+        'churn_scaler': os.path.join(directory, 'churn_scaler.joblib'),
+        'manifest': os.path.join(directory, 'manifest.json'),
+    }
+    manifest = {'rows': rows, 'seed': seed, 'churn_features': feature_list}
+    if os.path.exists(paths['manifest']):
+        with open(paths['manifest'], 'r') as f:
+            if json.load(f) == manifest:
+                return paths
+
+    write_interactions(paths['interactions'], rows['interactions'], seed)
+    write_transactions(paths['transactions'], rows['transactions'], seed)
+    write_churn_records(paths['churn'], rows['churn'], feature_list, seed)
+    write_customers(paths['customers'], rows['customers'], seed)
+    train_recommender(paths['interactions'], paths['recommender'], seed=seed)
+    train_churn_model(paths['churn'], paths['churn_model'], paths['churn_scaler'], feature_list, seed=seed)
+
+    with open(paths['manifest'], 'w') as f:
+        json.dump(manifest, f)
+    return paths
@@ -0,0 +1,40 @@
+"""
+Precompute the top-K recommendations of every user into a memory-mapped store.
+
+Usage (from the backend directory):
+    python build_topk_store.py [--k 50] [--output app/topk_store]
+
+The app opens the store on the next start and ignores it if the
+recommendation model file changes afterwards.
+"""
+import argparse
+import time
+
+from app import (product_recommendation_model, product_recommendation_model_sha256, topk_store_dir,
+                 user_item_store, user_product_interaction_data)
+from app.topk_store import build_topk_store
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--k', type=int, default=50, help='Recommendations stored per user')
+    parser.add_argument('--batch-size', type=int, default=1024, help='Users scored per matrix product')
+    parser.add_argument('--output', default=topk_store_dir, help='Store directory')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    meta = build_topk_store(
+        product_recommendation_model,
+        user_product_interaction_data,
+        user_item_store,
+        args.output,
+        k=args.k,
+        batch_size=args.batch_size,
+        model_sha256=product_recommendation_model_sha256
+    )
+    elapsed = time.perf_counter() - start
+    print(f"Wrote top-{meta['k']} for {meta['n_users']} users to {args.output} in {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Compile the churn random forest into flat node arrays and compare it with sklearn.
+
+Usage (from the backend directory):
+    python compile_churn_forest.py [--rows 20000] [--repeats 2000]
+
+Writes app/churn_forest.joblib, which the app memory-maps instead of
+recompiling at startup, after checking that the engine's probabilities and
+labels match rf_model.joblib. Prints single-row p50/p99 latency and batch
+throughput for both.
+"""
+import argparse
+import time
+
+from app import churn_forest_path, churn_model, churn_model_path
+from app.fingerprints import file_sha256
+from app.forest import compile_forest, latency_percentiles, sample_inputs, verify_forest
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=20000, help='Random rows used for the parity check')
+    parser.add_argument('--repeats', type=int, default=2000, help='Single-row predictions timed per engine')
+    parser.add_argument('--output', default=churn_forest_path)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    engine = compile_forest(churn_model, file_sha256(churn_model_path))
+    print(f"Compiled {len(engine.roots)} trees, {len(engine.feature)} nodes, "
+          f"max depth {engine.max_depth} in {time.perf_counter() - start:.2f}s")
+
+    X = sample_inputs(churn_model, args.rows)
+    check = verify_forest(engine, churn_model, X)
+    print(f"Parity on {check['rows']} rows: max |diff| {check['max_abs_diff']:.3g}, "
+          f"{check['label_mismatches']} label mismatches")
+    if not check['ok'] or check['label_mismatches']:
+        raise SystemExit("Compiled forest does not match the model, not writing it")
+
+    for name, predictor in (('sklearn', churn_model), ('flat', engine)):
+        single = latency_percentiles(predictor.predict_proba, X, args.repeats)
+        start = time.perf_counter()
+        predictor.predict_proba(X)
+        rows_per_second = len(X) / (time.perf_counter() - start)
+        print(f"{name:>8}: single row p50 {single['p50_ms']:.3f} ms, p99 {single['p99_ms']:.3f} ms, "
+              f"batch {rows_per_second:,.0f} rows/s")
+
+    engine.save(args.output)
+    print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
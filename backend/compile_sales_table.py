@@ -0,0 +1,41 @@
+"""
+Compile the sales forecast model into an exact lookup table.
+
+Usage (from the backend directory):
+    python compile_sales_table.py [--output app/sales_forecast_table.npz]
+
+The table is picked up by the app on the next start; it is ignored if the
+sales model file changes afterwards.
+"""
+import argparse
+import time
+
+from app import feature_names, sales_encoders, sales_model, sales_model_path, sales_table_path
+from app.fingerprints import file_sha256
+from app.sales_table import compile_sales_table, verify_sales_table
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--output', default=sales_table_path, help='Where to write the compiled table')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    lookup_table = compile_sales_table(
+        sales_model,
+        feature_names,
+        len(sales_encoders['product_category'].classes_),
+        model_sha256=file_sha256(sales_model_path)
+    )
+    print(f"Compiled table of shape {lookup_table.table.shape} in {time.perf_counter() - start:.2f}s")
+
+    mismatches = verify_sales_table(lookup_table, sales_model, feature_names)
+    if mismatches:
+        raise SystemExit(f"Table disagrees with the live model on {mismatches} rows, not writing it")
+
+    lookup_table.save(args.output)
+    print(f"Verified against the live model and wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
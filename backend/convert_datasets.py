@@ -0,0 +1,39 @@
+"""
+Convert the startup CSV datasets to compact columnar copies.
+
+Usage (from the backend directory):
+    python convert_datasets.py
+
+Re-run after the CSVs change outside the app; until then the app notices the
+copy is stale and reads the CSV. Transactions ingested through the app are
+added to the copy as extra parts, which a re-run merges into one.
+"""
+import os
+
+from app import (main_dataset_columnar_dir, main_dataset_path, user_product_interaction_columnar_dir,
+                 user_product_interaction_data_path)
+from app.columnar import convert_csv, load_dataset
+
+DATASETS = {
+    "retail_data": (main_dataset_path, main_dataset_columnar_dir),
+    "user_product_interactions": (user_product_interaction_data_path, user_product_interaction_columnar_dir),
+}
+
+
+def main():
+    for name, (csv_path, directory) in DATASETS.items():
+        if not os.path.exists(csv_path):
+            print(f"Skipping {name}: {csv_path} not found")
+            continue
+
+        converted = convert_csv(csv_path, directory)
+        _, stats = load_dataset(csv_path, directory)
+
+        print(f"{name}: {converted['rows']} rows, "
+              f"memory {converted['csv_memory_usage_bytes'] / 2**20:.1f} MiB -> "
+              f"{stats['memory_usage_bytes'] / 2**20:.1f} MiB, "
+              f"load {converted['csv_load_seconds']:.3f}s -> {stats['load_seconds']:.3f}s ({stats['source']})")
+
+
+if __name__ == "__main__":
+    main()
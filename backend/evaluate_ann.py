@@ -0,0 +1,38 @@
+"""
+Measure recall@k and latency of the approximate item index against exact scoring.
+
+Usage (from the backend directory):
+    python evaluate_ann.py --n-lists 32 --n-probe 1 2 4 8 --k 10 --users 500
+"""
+import argparse
+
+import numpy as np
+
+from app import product_recommendation_model
+from app.ann_index import ItemIndex, evaluate_recall
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--n-lists', type=int, default=None, help='Number of clusters (default sqrt(n_items))')
+    parser.add_argument('--n-probe', type=int, nargs='+', default=[1, 2, 4, 8, 16], help='Clusters scanned per query')
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--users', type=int, default=500, help='Number of random users to query')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    model = product_recommendation_model
+    index = ItemIndex.build(model, n_lists=args.n_lists, seed=args.seed)
+    rng = np.random.default_rng(args.seed)
+    n_users = model.user_embeddings.shape[0]
+    user_indices = rng.choice(n_users, min(args.users, n_users), replace=False)
+
+    print(f"{'n_probe':>8} {'recall@' + str(args.k):>10} {'exact ms':>10} {'ann ms':>10}")
+    for n_probe in args.n_probe:
+        result = evaluate_recall(index, model, user_indices, args.k, n_probe)
+        print(f"{result['n_probe']:>8} {result['recall']:>10.3f} "
+              f"{result['exact_ms_per_query']:>10.3f} {result['ann_ms_per_query']:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Send transaction batches (CSV or NDJSON files) to the running app.
+
+Usage (from the backend directory):
+    python ingest_transactions.py batch1.csv batch2.ndjson [--url http://127.0.0.1:5000]
+    python ingest_transactions.py batch.csv --offline
+
+--offline appends the batches to the dataset file directly; a running app only
+sees them after a restart.
+"""
+import argparse
+import sys
+
+import requests
+
+
+def ingest_online(paths, url):
+    for path in paths:
+        content_type = 'application/x-ndjson' if path.endswith(('.ndjson', '.jsonl')) else 'text/csv'
+        with open(path, 'rb') as f:
+            response = requests.post(
+                f"{url.rstrip('/')}/ingest/transactions", data=f, headers={'Content-Type': content_type}
+            )
+        if response.status_code != 200:
+            sys.exit(f"{path}: {response.json().get('error', response.text)}")
+        result = response.json()
+        print(f"{path}: ingested {result['rows']} rows (rollup version {result['rollup_version']})")
+
+
+def ingest_offline(paths):
+    from app import transaction_ingestor
+    from app.ingest import batch_format, read_transaction_batch
+
+    for path in paths:
+        with open(path, 'rb') as f:
+            df = read_transaction_batch(f, batch_format('', path))
+        transaction_ingestor.check_batch(df)
+        transaction_ingestor.append_to_dataset(df)
+        print(f"{path}: appended {len(df)} rows to {transaction_ingestor.dataset_path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('paths', nargs='+', help='CSV or NDJSON (.ndjson/.jsonl) batch files')
+    parser.add_argument('--url', default='http://127.0.0.1:5000', help='Base URL of the running app')
+    parser.add_argument('--offline', action='store_true', help='Append to the dataset file instead of posting')
+    args = parser.parse_args()
+
+    if args.offline:
+        ingest_offline(args.paths)
+    else:
+        ingest_online(args.paths, args.url)
+
+
+if __name__ == "__main__":
+    main()
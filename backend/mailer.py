@@ -0,0 +1,280 @@
+"""
+Background email dispatch.
+
+Requests enqueue messages and return immediately. A small pool of worker
+threads sends them, each keeping one authenticated SMTP connection open and
+sending up to batch_size queued messages per wake-up over it. Failed sends are
+retried with exponential backoff; messages that exhaust their retries are kept
+in dead_letters instead of being lost.
+
+Configuration comes from the environment (see EmailDispatcher.from_env). To
+test against a local stand-in instead of a real server:
+
+    python -m aiosmtpd -n -l localhost:1025
+    SMTP_HOST=localhost SMTP_PORT=1025 SMTP_STARTTLS=false SMTP_USER= python main.py
+"""
+import collections
+import itertools
+import os
+import queue
+import smtplib
+import threading
+import time
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+THROUGHPUT_WINDOW = 60.0
+
+
+class OutgoingEmail:
+    def __init__(self, message_id, to, subject, body):
+        self.message_id = message_id
+        self.to = to
+        self.subject = subject
+        self.body = body
+        self.attempts = 0
+        self.last_error = None
+        self.enqueued_at = time.time()
+
+
+class EmailDispatcher:
+    def __init__(self, host, port, username=None, password=None, sender=None, use_tls=True,
+                 workers=2, batch_size=20, max_retries=5, backoff=1.0, max_backoff=60.0, idle_timeout=30.0):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.sender = sender or username
+        self.use_tls = use_tls
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.idle_timeout = idle_timeout
+
+        self.queue = queue.Queue()
+        self.dead_letters = collections.deque(maxlen=1000)
+        self.sent_times = collections.deque()
+        self.counts = collections.Counter()
+        self.ids = itertools.count(1)
+        self.lock = threading.Lock()
+        self.threads = []
+        # message_id -> (backoff timer, message) for messages waiting to be retried
+        self.retrying = {}
+        self.stopping = threading.Event()
+        self.fork_hook_registered = False
+
+    @classmethod
+    def from_env(cls, **defaults):
+        """
+        SMTP_HOST, SMTP_PORT, SMTP_USER, SMTP_PASSWORD, SMTP_SENDER, SMTP_STARTTLS,
+        EMAIL_WORKERS and EMAIL_BATCH_SIZE override the given defaults. Credentials
+        come only from the environment; raises ValueError when SMTP_HOST is not set.
+        """
+        settings = dict(defaults)
+        env = {
+            'host': os.getenv('SMTP_HOST'),
+            'port': os.getenv('SMTP_PORT'),
+            'username': os.getenv('SMTP_USER'),
+            'password': os.getenv('SMTP_PASSWORD'),
+            'sender': os.getenv('SMTP_SENDER'),
+            'use_tls': os.getenv('SMTP_STARTTLS'),
+            'workers': os.getenv('EMAIL_WORKERS'),
+            'batch_size': os.getenv('EMAIL_BATCH_SIZE'),
+        }
+        for key, value in env.items():
+            if value is not None:
+                settings[key] = value
+        if not settings.get('host'):
+            raise ValueError("SMTP_HOST is not set")
+        for key in ('port', 'workers', 'batch_size'):
+            if key in settings:
+                settings[key] = int(settings[key])
+        if isinstance(settings.get('use_tls'), str):
+            settings['use_tls'] = settings['use_tls'].lower() not in ('0', 'false', 'no')
+        return cls(**settings)
+
+    def start(self):
+        if not self.fork_hook_registered:
+            os.register_at_fork(after_in_child=self._restart_after_fork)
+            self.fork_hook_registered = True
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f'email-worker-{i}', daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        return self
+
+    def _restart_after_fork(self):
+        """Threads do not survive fork; a forked server worker gets its own queue and senders"""
+        if not self.threads:
+            return
+        self.queue = queue.Queue()
+        self.dead_letters = collections.deque(maxlen=1000)
+        self.sent_times = collections.deque()
+        self.counts = collections.Counter()
+        self.lock = threading.Lock()
+        self.threads = []
+        self.retrying = {}
+        self.stopping = threading.Event()
+        self.start()
+
+    def stop(self, timeout=None):
+        """
+        Let the workers finish what is queued, including messages waiting out a
+        retry backoff, then close their connections. With timeout, retries still
+        waiting after that many seconds are moved to dead_letters instead.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            self.queue.join()
+            with self.lock:
+                if not self.retrying and not self.queue.unfinished_tasks:
+                    break
+                if deadline is not None and time.monotonic() >= deadline:
+                    for timer, message in self.retrying.values():
+                        timer.cancel()
+                        print(f"Giving up on email {message.message_id} to {message.to} at shutdown")
+                        self.counts['failed'] += 1
+                        self.dead_letters.append(message)
+                    self.retrying.clear()
+            time.sleep(0.1)
+        self.stopping.set()
+        # Wake workers blocked waiting for a message
+        for _ in self.threads:
+            self.queue.put(None)
+        for thread in self.threads:
+            thread.join(timeout)
+
+    def enqueue(self, to, subject, body):
+        message = OutgoingEmail(next(self.ids), to, subject, body)
+        self.queue.put(message)
+        with self.lock:
+            self.counts['enqueued'] += 1
+        return message.message_id
+
+    def stats(self):
+        now = time.time()
+        with self.lock:
+            while self.sent_times and self.sent_times[0] < now - THROUGHPUT_WINDOW:
+                self.sent_times.popleft()
+            return {
+                'queue_depth': self.queue.qsize(),
+                'pending_retries': len(self.retrying),
+                'enqueued': self.counts['enqueued'],
+                'sent': self.counts['sent'],
+                'retried': self.counts['retried'],
+                'failed': self.counts['failed'],
+                'connections_opened': self.counts['connections_opened'],
+                'sent_per_second': len(self.sent_times) / THROUGHPUT_WINDOW,
+                'workers': len(self.threads),
+            }
+
+    def _connect(self):
+        server = smtplib.SMTP(self.host, self.port, timeout=30)
+        if self.use_tls:
+            server.starttls()
+        if self.username:
+            server.login(self.username, self.password)
+        with self.lock:
+            self.counts['connections_opened'] += 1
+        return server
+
+    @staticmethod
+    def _close(server):
+        try:
+            server.quit()
+        except Exception:
+            pass
+
+    def _build(self, message):
+        msg = MIMEMultipart()
+        msg['From'] = self.sender
+        msg['To'] = message.to
+        msg['Subject'] = message.subject
+        msg.attach(MIMEText(message.body, 'plain'))
+        return msg
+
+    def _retry_later(self, message, error):
+        message.attempts += 1
+        message.last_error = str(error)
+        if message.attempts > self.max_retries:
+            print(f"Giving up on email {message.message_id} to {message.to}: {error}")
+            with self.lock:
+                self.counts['failed'] += 1
+            self.dead_letters.append(message)
+            return
+
+        delay = min(self.backoff * 2 ** (message.attempts - 1), self.max_backoff)
+
+        def requeue():
+            # Put under the lock, so stop() never sees a message neither retrying nor queued
+            with self.lock:
+                if self.retrying.pop(message.message_id, None) is not None:
+                    self.queue.put(message)
+
+        timer = threading.Timer(delay, requeue)
+        timer.daemon = True
+        with self.lock:
+            self.counts['retried'] += 1
+            self.retrying[message.message_id] = (timer, message)
+        timer.start()
+
+    def _next_batch(self):
+        """Block for one message, then take whatever else is queued up to batch_size"""
+        batch = [self.queue.get(timeout=self.idle_timeout)]
+        # Stop at a shutdown sentinel, so each worker takes only one
+        while len(batch) < self.batch_size and batch[-1] is not None:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        server = None
+        while not self.stopping.is_set():
+            try:
+                batch = self._next_batch()
+            except queue.Empty:
+                # Idle: release the connection rather than let the server time it out
+                if server is not None:
+                    self._close(server)
+                    server = None
+                continue
+
+            for message in batch:
+                if message is None:
+                    self.queue.task_done()
+                    continue
+                try:
+                    if server is None:
+                        server = self._connect()
+                    server.send_message(self._build(message))
+                    with self.lock:
+                        self.counts['sent'] += 1
+                        self.sent_times.append(time.time())
+                except smtplib.SMTPRecipientsRefused as e:
+                    print(f"Email {message.message_id} to {message.to} refused: {e}")
+                    message.last_error = str(e)
+                    with self.lock:
+                        self.counts['failed'] += 1
+                    self.dead_letters.append(message)
+                except (smtplib.SMTPException, OSError) as e:
+                    # Drop the connection and retry the message on a fresh one later
+                    if server is not None:
+                        self._close(server)
+                        server = None
+                    self._retry_later(message, e)
+                except Exception as e:
+                    # A message that cannot be built or sent, e.g. a malformed address; retrying will not help
+                    print(f"Email {message.message_id} to {message.to} could not be sent: {e}")
+                    message.last_error = str(e)
+                    with self.lock:
+                        self.counts['failed'] += 1
+                    self.dead_letters.append(message)
+                finally:
+                    self.queue.task_done()
+
+        if server is not None:
+            self._close(server)
@@ -6,11 +6,12 @@ import pandas as pd
 import numpy as np
 from lightfm import LightFM
 from lightfm.data import Dataset
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+import os
 import random
 
+from app.email_templates import RECOMMENDATION_SUBJECT, render_recommendation_email
+from mailer import EmailDispatcher
+
 load_dotenv()
 
 app = create_app()
@@ -23,6 +24,14 @@ CORS(app, resources={
     }
 })
 
+# Emails are sent by background workers over pooled SMTP connections, configured
+# by the SMTP_* variables (e.g. in .env); see mailer.py. Without SMTP_HOST email is disabled.
+if os.getenv('SMTP_HOST'):
+    email_dispatcher = EmailDispatcher.from_env(port=587).start()
+else:
+    print("SMTP_HOST is not set, email sending is disabled")
+    email_dispatcher = None
+
 # Add these category-based offers
 category_offers = {
     "Electronics": [
@@ -47,37 +56,11 @@ category_offers = {
     ]
 }
 
-# Add store locations
-store_locations = {
-    "Electronics": "Croma, Seawoods Grand Central Mall",
-    "Groceries": "D-Mart, Sector 19, Nerul",
-    "Clothing": "Westside, Sector 15, Nerul",
-    "Toys": "Hamleys, Seawoods Mall",
-    "Furniture": "Home Centre, Seawoods Mall"
-}
-
 def send_email(user_email, subject, body):
-    sender_email = "your-email@gmail.com"  # Replace with your email
-    sender_password = "your-app-password"   # Replace with your app password
-    
-    msg = MIMEMultipart()
-    msg['From'] = sender_email
-    msg['To'] = user_email
-    msg['Subject'] = subject
-    
-    msg.attach(MIMEText(body, 'plain'))
-    
-    try:
-        server = smtplib.SMTP('smtp.gmail.com', 587)
-        server.starttls()
-        server.login(sender_email, sender_password)
-        text = msg.as_string()
-        server.sendmail(sender_email, user_email, text)
-        server.quit()
-        return True
-    except Exception as e:
-        print(f"Failed to send email: {e}")
-        return False
+    """Queue an email for the background dispatcher; returns its message id"""
+    if email_dispatcher is None:
+        raise RuntimeError("Email sending is not configured; set SMTP_HOST")
+    return email_dispatcher.enqueue(user_email, subject, body)
 
 @app.route('/send-recommendations', methods=['POST'])
 def send_recommendations():
@@ -92,53 +75,20 @@ def send_recommendations():
         
         if not recommendations:
             return jsonify({"success": False, "message": "No recommendations provided"}), 400
+        if email_dispatcher is None:
+            return jsonify({"success": False, "message": "Email sending is not configured; set SMTP_HOST"}), 503
 
-        # Format email content
-        email_body = f"Hello User {user_id},\n\nHere are your personalized recommendations:\n\n"
-        
-        for item in recommendations:
-            category = item.get('category', 'Unknown')
-            store = store_locations.get(category, "Store location not available")
-            store_name = item.get('storeName', 'Store name not available')
-            price = item.get('price', 0)
-            offers = item.get('offers', [])
-            
-            email_body += f"\nStore: {store_name}\n"
-            email_body += f"Category: {category}\n"
-            email_body += f"Location: {store}\n"
-            email_body += f"Price: ₹{price:.2f}\n"
-            
-            if offers:
-                email_body += "Available Offers:\n"
-                for offer in offers:
-                    email_body += f"- {offer.get('description', '')}: {offer.get('discount', '')}\n"
-            
-            email_body += "-" * 40 + "\n"
-        
-        email_body += "\nThank you for using our service!\n"
-
-        # Email configuration
-        sender_email = "rajneelchoughule@gmail.com"
-        sender_password = "uuua zboo fiij oshp"
-        subject = "Your Personalized Shopping Recommendations"
+        email_body = render_recommendation_email(user_id, recommendations)
+        subject = RECOMMENDATION_SUBJECT
 
-        # Create message
-        msg = MIMEMultipart()
-        msg['From'] = sender_email
-        msg['To'] = user_email
-        msg['Subject'] = subject
-        msg.attach(MIMEText(email_body, 'plain'))
-
-        # Send email
-        with smtplib.SMTP('smtp.gmail.com', 587) as server:
-            server.starttls()
-            server.login(sender_email, sender_password)
-            server.send_message(msg)
-            print(f"Email sent successfully to {user_email}")
-            return jsonify({
-                "success": True, 
-                "message": "Recommendations sent successfully"
-            })
+        # Queue the email and return; the dispatcher sends it in the background
+        message_id = send_email(user_email, subject, email_body)
+        print(f"Email {message_id} queued for {user_email}")
+        return jsonify({
+            "success": True,
+            "message": "Recommendations queued for sending",
+            "message_id": message_id
+        }), 202
 
     except Exception as e:
         print(f"Error sending recommendations: {str(e)}")
@@ -147,5 +97,11 @@ def send_recommendations():
             "message": f"Failed to send recommendations: {str(e)}"
         }), 500
 
+@app.route('/email-queue/stats', methods=['GET'])
+def email_queue_stats():
+    if email_dispatcher is None:
+        return jsonify({"error": "Email sending is not configured; set SMTP_HOST"}), 503
+    return jsonify(email_dispatcher.stats())
+
 if __name__ == "__main__":
     app.run(debug=True, port=5000)
\ No newline at end of file
@@ -0,0 +1,80 @@
+"""
+Send recommendation emails to a segment of users in one streaming job.
+
+Usage (from the backend directory):
+    python run_campaign.py --outbox campaign_outbox.jsonl              # dry run over every user
+    python run_campaign.py --recipients recipients.csv --min-spend 1000 --send --rate 5
+
+recipients.csv has user_id and email columns and also limits the campaign to
+those users. Without it, addresses come from --address-format. With --send,
+messages go through an SMTP dispatcher of its own, configured by the SMTP_*
+and EMAIL_* environment variables (see mailer.py; SMTP_HOST is required);
+otherwise they are written to the --outbox file.
+"""
+import argparse
+import os
+
+import pandas as pd
+
+from app.campaign import DispatcherSink, FileSink, run_campaign
+from mailer import EmailDispatcher
+from app.views import RECOMMENDATION_SEARCH_MODES
+
+
+def print_progress(snapshot, outbox_depth):
+    sent = snapshot['stages']['send']['items']
+    if sent % 100 == 0:
+        rate = sent / max(snapshot['elapsed_seconds'], 1e-9)
+        print(f"\r{sent} sent, {rate:,.1f} msg/s, outbox {outbox_depth}", end='', flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--recipients', help='CSV with user_id and email columns')
+    parser.add_argument('--address-format', default='user{user_id}@example.com',
+                        help='Address used when there is no recipients file')
+    parser.add_argument('--user-ids', nargs='*', type=int, help='Only these users')
+    parser.add_argument('--min-spend', type=float, help='Only users whose total spend is at least this')
+    parser.add_argument('--limit', type=int, help='Stop after this many users')
+    parser.add_argument('--n', type=int, default=5, help='Recommendations per email')
+    parser.add_argument('--exclude-purchased', action='store_true', help='Skip items the user already bought')
+    parser.add_argument('--search', choices=RECOMMENDATION_SEARCH_MODES, default='exact')
+    parser.add_argument('--rate', type=float, default=10.0, help='Messages sent per second, 0 for unlimited')
+    parser.add_argument('--outbox-size', type=int, default=1000, help='Rendered messages buffered ahead of sending')
+    parser.add_argument('--outbox', default='campaign_outbox.jsonl', help='Dry-run output file')
+    parser.add_argument('--send', action='store_true', help='Send through SMTP instead of writing the outbox file')
+    args = parser.parse_args()
+
+    if args.send and not os.getenv('SMTP_HOST'):
+        parser.error('--send needs SMTP_HOST (and usually SMTP_PORT, SMTP_USER, SMTP_PASSWORD) in the environment')
+
+    user_ids = args.user_ids
+    if args.recipients:
+        recipients = pd.read_csv(args.recipients)
+        addresses = dict(zip(recipients['user_id'], recipients['email']))
+        if user_ids is None:
+            user_ids = list(addresses)
+        address_for = addresses.get
+    else:
+        def address_for(user_id):
+            return args.address_format.format(user_id=user_id)
+
+    if args.send:
+        sink = DispatcherSink(EmailDispatcher.from_env(port=587).start())
+    else:
+        sink = FileSink(args.outbox)
+
+    result = run_campaign(
+        sink, address_for, user_ids, args.min_spend, args.limit, args.n, args.exclude_purchased,
+        args.search, args.rate or None, args.outbox_size, print_progress
+    )
+
+    print(f"\nFinished in {result['elapsed_seconds']:.2f}s")
+    for name, stage in result['stages'].items():
+        rate = stage['items_per_second']
+        rate = f"{rate:,.0f}/s busy" if rate is not None else "-"
+        print(f"  {name:<10} {stage['items']:>10} items  {stage['busy_seconds']:8.2f}s  {rate}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Score a large customer file for churn outside the web app.
+
+Usage (from the backend directory):
+    python score_churn.py customers.csv scores.csv [--workers 8] [--chunk-size 50000] [--keep-columns customer_id]
+    python score_churn.py app/columnar/customers scores.csv    # a directory written by convert_datasets.py
+
+The input is read in chunks and spread over a process pool in which every
+worker loads the churn model, scaler and feature list once. At most
+2 x workers chunks are in flight, so memory stays bounded regardless of the
+input size. Scores are written in input order as soon as each chunk is done.
+"""
+import argparse
+import collections
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+
+def _init_worker():
+    from app import registry
+
+    registry.warm(['churn_feature_list', 'churn_scaler', 'churn_model'])
+
+
+def _score_chunk(chunk, keep_columns):
+    from app.churn import score_churn_chunk
+
+    probabilities, labels = score_churn_chunk(chunk)
+    scored = chunk[keep_columns].copy()
+    scored['churn_probability'] = probabilities
+    scored['churn_prediction'] = labels
+    return scored
+
+
+def iter_chunks(path, chunk_size):
+    """Yield DataFrame chunks from a CSV file or a columnar dataset directory"""
+    if os.path.isdir(path):
+        from app.columnar import read_columnar
+
+        df, _ = read_columnar(path)
+        for start in range(0, len(df), chunk_size):
+            yield df.iloc[start:start + chunk_size]
+    else:
+        import pandas as pd
+
+        yield from pd.read_csv(path, chunksize=chunk_size)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('input', help='CSV file or columnar dataset directory')
+    parser.add_argument('output', help='CSV file to write scores to')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Worker processes')
+    parser.add_argument('--chunk-size', type=int, default=50000, help='Rows per chunk')
+    parser.add_argument('--keep-columns', nargs='*', default=[], help='Input columns copied to the output')
+    args = parser.parse_args()
+
+    max_in_flight = 2 * args.workers
+    rows_scored = 0
+    start = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker) as pool, \
+            open(args.output, 'w', newline='') as output:
+        pending = collections.deque()
+        write_header = True
+
+        def write_oldest():
+            nonlocal rows_scored, write_header
+            scored = pending.popleft().result()
+            scored.to_csv(output, header=write_header, index=False)
+            write_header = False
+            rows_scored += len(scored)
+            elapsed = time.perf_counter() - start
+            print(f"\r{rows_scored} rows, {rows_scored / elapsed:,.0f} rows/s", end='', flush=True)
+
+        for chunk in iter_chunks(args.input, args.chunk_size):
+            if len(pending) >= max_in_flight:
+                write_oldest()
+            pending.append(pool.submit(_score_chunk, chunk, args.keep_columns))
+
+        while pending:
+            write_oldest()
+
+    elapsed = time.perf_counter() - start
+    print(f"\nScored {rows_scored} rows in {elapsed:.2f}s ({rows_scored / max(elapsed, 1e-9):,.0f} rows/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""
+Production serving entry point: load once, fork workers that share the models.
+
+Usage (from the backend directory):
+    python serve.py [--host 0.0.0.0] [--port 5000] [--workers 8] [--threads]
+
+The parent process imports the app, loads every registered model and dataset,
+moves the large NumPy arrays (LightFM embeddings and biases, the user-item
+CSR matrix, the item index, the sales lookup table) into /dev/shm mappings
+(see app/shared.py), and freezes the garbage collector so collections in the
+workers do not write to the inherited objects. It then forks --workers
+processes that accept connections on one shared listening socket. The parent
+only supervises: it restarts workers that die and stops them all on
+SIGINT/SIGTERM.
+
+POST /admin/reload-models only reaches the worker that accepts it. To pick up
+retrained models everywhere, send SIGHUP to the parent. It forwards the signal
+to every worker, and each worker reloads in the background and swaps when
+ready. Reloaded models are private to each worker, so restart the server
+during a quiet period to share them again.
+
+Measuring memory and throughput
+-------------------------------
+Every worker reports its pid, RSS and PSS at GET /models/stats. The parent
+prints the same figures for each worker --report-after seconds after startup.
+RSS counts shared pages in full in every worker. PSS splits them between the
+processes that map them, so the parent's PSS plus the workers' is the real
+footprint to compare with the RSS of one `python main.py` process.
+
+For throughput, run the same load against both servers, e.g.:
+
+    python main.py                          # dev server, port 5000
+    python serve.py --port 8000 --workers 8
+    ab -n 20000 -c 64 'http://127.0.0.1:5000/recommend?user_id=310'
+    ab -n 20000 -c 64 'http://127.0.0.1:8000/recommend?user_id=310'
+
+One run, on a 1 vCPU / 6 GB VM with synthetic data (1M interactions, 1M
+transactions, 200k churn rows, 100k customers), 3000 keep-alive GETs per
+route from 8 concurrent clients:
+
+                            dev server (threaded)   serve.py --workers 4
+    memory                  412 MiB RSS             295 MiB RSS, 73 MiB PSS per worker;
+                                                    466 MiB PSS with the parent
+    /recommend              404 req/s, p99 34 ms    439 req/s, p99 29 ms
+    /predict-sales          651 req/s, p99 25 ms    553 req/s, p99 32 ms
+
+Four workers cost 54 MiB more than one process, not 3 x 412 MiB. With a
+single core there is no throughput to gain, so the req/s columns only show
+that forking costs nothing per request. Throughput grows with cores up to
+--workers; measure again on the deployment hardware.
+"""
+import argparse
+import gc
+import os
+import random
+import signal
+import socket
+import sys
+import time
+import traceback
+
+import numpy as np
+
+SHARED_ARTIFACTS = (
+    'product_recommendation_model', 'user_item_store', 'product_catalog', 'item_index', 'sales_table',
+)
+
+
+def load_app():
+    """Import the app with every artifact loaded and its large arrays shared"""
+    # Forking while a background warm-up thread is loading would leave its locks held in the workers
+    os.environ['MODEL_WARMUP'] = 'lazy'
+    from main import app
+    from app import registry
+    from app.shared import share_artifacts
+
+    start = time.perf_counter()
+    registry.warm()
+    moved = share_artifacts(registry, SHARED_ARTIFACTS)
+    print(f"Loaded models in {time.perf_counter() - start:.1f}s, "
+          f"{sum(moved.values()) / 2 ** 20:,.0f} MiB of arrays moved to shared memory")
+    return app
+
+
+def serve_worker(app, listener, threaded):
+    from werkzeug.serving import make_server
+
+    # Each worker gets its own random state instead of a copy of the parent's
+    random.seed()
+    np.random.seed()
+
+    from app import RELOADABLE_MODELS, registry
+
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGHUP, lambda *_: registry.reload(RELOADABLE_MODELS))
+    server = make_server(*listener.getsockname()[:2], app, threaded=threaded, fd=listener.fileno())
+    server.serve_forever()
+
+
+def spawn(app, listener, threaded):
+    pid = os.fork()
+    if pid == 0:
+        try:
+            serve_worker(app, listener, threaded)
+        except SystemExit:
+            os._exit(0)
+        except BaseException:
+            traceback.print_exc()
+            os._exit(1)
+        os._exit(0)
+    return pid
+
+
+def report_memory(workers):
+    from app.memstats import pss_bytes, rss_bytes
+
+    total_pss = 0
+    for pid in sorted(workers):
+        rss, pss = rss_bytes(pid), pss_bytes(pid)
+        total_pss += pss or 0
+        pss_text = f"{pss / 2 ** 20:,.0f} MiB" if pss is not None else "n/a"
+        print(f"  worker {pid}: RSS {rss / 2 ** 20:,.0f} MiB, PSS {pss_text}")
+    parent_pss = pss_bytes() or 0
+    print(f"  parent {os.getpid()}: RSS {rss_bytes() / 2 ** 20:,.0f} MiB, PSS {parent_pss / 2 ** 20:,.0f} MiB; "
+          f"total PSS {(total_pss + parent_pss) / 2 ** 20:,.0f} MiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Worker processes')
+    parser.add_argument('--threads', action='store_true', help='Handle requests on a thread each within a worker')
+    parser.add_argument('--backlog', type=int, default=1024, help='Listen backlog of the shared socket')
+    parser.add_argument('--report-after', type=float, default=5.0,
+                        help='Print per-worker RSS/PSS this many seconds after startup, 0 to skip')
+    args = parser.parse_args()
+
+    app = load_app()
+    listener = socket.create_server((args.host, args.port), backlog=args.backlog)
+
+    # Objects created so far are left alone by the collector, so it never dirties their pages in the workers
+    gc.collect()
+    gc.freeze()
+
+    workers = set()
+    for _ in range(args.workers):
+        workers.add(spawn(app, listener, args.threads))
+    print(f"Serving on http://{args.host}:{args.port} with {len(workers)} workers")
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def reload_workers(signum, frame):
+        for pid in workers:
+            try:
+                os.kill(pid, signal.SIGHUP)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGHUP, reload_workers)
+
+    report_at = time.monotonic() + args.report_after if args.report_after else None
+    while workers:
+        pid, status = os.waitpid(-1, os.WNOHANG)
+        if pid == 0:
+            if report_at is not None and time.monotonic() >= report_at:
+                report_memory(workers)
+                report_at = None
+            time.sleep(0.5)
+            continue
+        workers.discard(pid)
+        if not stopping:
+            print(f"Worker {pid} exited with status {status}, restarting")
+            workers.add(spawn(app, listener, args.threads))
+
+    listener.close()
+
+
+if __name__ == "__main__":
+    main()
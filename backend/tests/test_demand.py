@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+
+from app import demand
+from app.demand import CUSTOMER_COLUMNS, DemandClusterer, create_sample_data
+
+
+def test_failed_update_leaves_every_state_unchanged(monkeypatch):
+    clusterer = DemandClusterer(create_sample_data(100, seed=0)[CUSTOMER_COLUMNS])
+    before = {n_clusters: clusterer.labels(n_clusters).copy() for n_clusters in (3, 4)}
+    fingerprint = clusterer.fingerprint
+    fit_predict = demand.KMeans.fit_predict
+    calls = []
+
+    def fail_second_refit(self, X, *args, **kwargs):
+        calls.append(self.n_clusters)
+        if len(calls) == 2:
+            raise RuntimeError('refit failed')
+        return fit_predict(self, X, *args, **kwargs)
+
+    monkeypatch.setattr(demand.KMeans, 'fit_predict', fail_second_refit)
+    with pytest.raises(RuntimeError):
+        clusterer.add_customers(create_sample_data(10, seed=1)[CUSTOMER_COLUMNS])
+
+    assert len(clusterer.customers) == 100
+    assert clusterer.fingerprint == fingerprint
+    for n_clusters, labels in before.items():
+        np.testing.assert_array_equal(clusterer.labels(n_clusters), labels)
+
+
+def test_update_labels_new_customers():
+    clusterer = DemandClusterer(create_sample_data(100, seed=0)[CUSTOMER_COLUMNS])
+    clusterer.labels(3)
+
+    clusterer.add_customers(create_sample_data(10, seed=1)[CUSTOMER_COLUMNS])
+
+    assert len(clusterer.customers) == 110
+    assert len(clusterer.labels(3)) == 110
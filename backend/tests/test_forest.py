@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+
+from app.forest import FlatForest, compile_forest, sample_inputs, verify_forest
+
+
+def fitted_forest(n_classes, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(0.0, 1.0, (500, 6))
+    y = np.digitize(X[:, 0] + X[:, 1] * X[:, 2] + rng.normal(0.0, 0.5, 500), np.linspace(-1, 1, n_classes - 1))
+    model = RandomForestClassifier(n_estimators=15, max_depth=6, random_state=seed)
+    return model.fit(X, y)
+
+
+def edge_rows(model):
+    """Rows sitting exactly on split thresholds, just either side of them, and at extreme values"""
+    rows = []
+    base = np.zeros(model.n_features_in_)
+    for estimator in model.estimators_[:3]:
+        tree = estimator.tree_
+        for node in np.flatnonzero(tree.children_left != -1)[:20]:
+            threshold = tree.threshold[node]
+            for value in (threshold, np.nextafter(np.float32(threshold), np.float32(-np.inf)),
+                          np.nextafter(np.float32(threshold), np.float32(np.inf))):
+                row = base.copy()
+                row[tree.feature[node]] = value
+                rows.append(row)
+    extreme = np.finfo(np.float32).max
+    rows.extend([base, np.full_like(base, extreme), np.full_like(base, -extreme)])
+    return np.array(rows)
+
+
+@pytest.mark.parametrize('n_classes', [2, 3])
+def test_matches_sklearn(n_classes):
+    model = fitted_forest(n_classes)
+    engine = compile_forest(model)
+    X = np.vstack([sample_inputs(model, 1000), edge_rows(model)])
+
+    np.testing.assert_allclose(engine.predict_proba(X), model.predict_proba(X), rtol=0.0, atol=1e-12)
+    np.testing.assert_array_equal(engine.predict(X), model.predict(X))
+    assert verify_forest(engine, model, X)['ok']
+
+
+def test_single_row_matches_sklearn():
+    model = fitted_forest(2)
+    engine = compile_forest(model)
+    row = sample_inputs(model, 1)[0]
+
+    np.testing.assert_allclose(engine.predict_proba(row), model.predict_proba(row[np.newaxis, :]), atol=1e-12)
+
+
+@pytest.mark.parametrize('value', [np.nan, np.inf, -np.inf, 1e300])
+def test_rejects_non_finite_input(value):
+    engine = compile_forest(fitted_forest(2))
+    X = np.zeros((3, 6))
+    X[1, 2] = value
+
+    with pytest.raises(ValueError):
+        engine.predict_proba(X)
+
+
+def test_saved_engine_matches(tmp_path):
+    model = fitted_forest(2)
+    engine = compile_forest(model, model_sha256='abc')
+    engine.save(tmp_path / 'forest.joblib')
+    loaded = FlatForest.load(tmp_path / 'forest.joblib')
+    X = sample_inputs(model, 200)
+
+    assert loaded.model_sha256 == 'abc'
+    np.testing.assert_array_equal(loaded.predict_proba(X), engine.predict_proba(X))
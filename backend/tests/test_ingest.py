@@ -0,0 +1,38 @@
+import pytest
+
+from app.ingest import read_batch, read_transaction_batch
+
+BATCH = (
+    'transaction_date,product_category,avg_purchase_value,total_sales,total_transactions,avg_transaction_value\n'
+    '2021-03-04,Toys,120.5,241.0,2,120.5\n'
+)
+
+
+@pytest.mark.parametrize('data', [BATCH, BATCH.encode('utf-8')])
+def test_reads_text_and_bytes(data):
+    df = read_transaction_batch(data)
+
+    assert len(df) == 1
+    assert df.loc[0, 'product_category'] == 'Toys'
+
+
+def test_reads_ndjson():
+    df = read_batch(b'{"a": 1, "b": "x"}\n{"a": 2, "b": "y"}\n', 'ndjson', ['a', 'b'])
+
+    assert df['a'].tolist() == [1, 2]
+
+
+def test_path_is_read_as_content(tmp_path):
+    path = tmp_path / 'batch.csv'
+    path.write_text(BATCH)
+
+    with pytest.raises(ValueError, match='Missing required columns'):
+        read_transaction_batch(str(path))
+
+
+def test_reads_open_file(tmp_path):
+    path = tmp_path / 'batch.csv'
+    path.write_text(BATCH)
+
+    with open(path, 'rb') as f:
+        assert len(read_transaction_batch(f)) == 1
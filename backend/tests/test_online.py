@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+import pytest
+from lightfm import LightFM
+from lightfm.data import Dataset
+
+from app.catalog import build_product_catalog, build_user_item_store, extend_product_catalog, extend_user_item_store
+from app.demand import DEMAND_CATEGORIES
+from app.online import clean_interactions, extend_dataset, fit_interactions
+
+
+def interactions(user_ids, product_ids, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'user_id': user_ids,
+        'product_id': product_ids,
+        'product_category': [DEMAND_CATEGORIES[product_id % len(DEMAND_CATEGORIES)] for product_id in product_ids],
+        'interaction': rng.integers(0, 2, len(user_ids)),
+        'price': rng.uniform(10, 500, len(user_ids)),
+    })
+
+
+@pytest.fixture
+def fitted():
+    rng = np.random.default_rng(0)
+    df = interactions(rng.integers(1, 21, 300), rng.integers(100, 112, 300))
+    dataset = Dataset()
+    dataset.fit(users=df['user_id'].unique(), items=df['product_id'].unique())
+    matrix, _ = dataset.build_interactions(zip(df.loc[df['interaction'] == 1, 'user_id'],
+                                               df.loc[df['interaction'] == 1, 'product_id']))
+    model = LightFM(no_components=8, loss='warp', random_state=0).fit(matrix, epochs=3)
+    return df, dataset, model
+
+
+def new_batch():
+    # Two new users, one new product, and a known user buying the new product
+    return interactions([21, 21, 22, 3], [100, 112, 112, 112], seed=1).assign(interaction=1)
+
+
+def test_grows_model_for_new_users_and_items(fitted):
+    df, dataset, model = fitted
+    originals = {name: getattr(model, name).copy() for name in ('user_embeddings', 'item_embeddings', 'item_biases')}
+    batch = clean_interactions(new_batch())
+
+    extended = extend_dataset(dataset, batch)
+    grown = fit_interactions(model, extended, batch, epochs=2)
+
+    assert dataset.interactions_shape() == (20, 12)
+    assert extended.interactions_shape() == (22, 13)
+    assert extended.mapping()[0][1] == dataset.mapping()[0][1]
+    assert grown.user_embeddings.shape == (22, 8)
+    assert grown.item_embeddings.shape == (13, 8)
+    assert grown.item_bias_gradients.shape == (13,)
+    # fit_partial trained the copy only
+    for name, values in originals.items():
+        np.testing.assert_array_equal(getattr(model, name), values)
+    assert not np.array_equal(grown.item_biases[:12], originals['item_biases'])
+
+    user_index = extended.mapping()[0][22]
+    scores = grown.predict(user_index, np.arange(13))
+    assert np.isfinite(scores).all()
+
+
+def test_extends_catalog_and_user_store(fitted):
+    df, dataset, _ = fitted
+    batch = clean_interactions(new_batch())
+    extended = extend_dataset(dataset, batch)
+    user_mapping, _, item_mapping, _ = extended.mapping()
+
+    catalog = extend_product_catalog(build_product_catalog(df, dataset), batch, extended)
+    store = extend_user_item_store(build_user_item_store(df, dataset), batch, extended)
+
+    assert len(catalog) == 13
+    assert catalog.product_info(item_mapping[112])['product_category'] == DEMAND_CATEGORIES[112 % 5]
+    assert store.purchases.shape == (22, 13)
+    assert item_mapping[112] in store.purchased_items(user_mapping[21])
+    assert store.total_spend[user_mapping[22]] == pytest.approx(batch['price'].iloc[2])
+
+
+@pytest.mark.parametrize('category', [None, 'Books', 'electronics'])
+def test_rejects_unknown_category(category):
+    batch = new_batch()
+    batch.loc[1, 'product_category'] = category
+
+    with pytest.raises(ValueError, match='product_category'):
+        clean_interactions(batch)
+
+
+def test_rejects_non_integer_ids():
+    batch = new_batch().astype({'user_id': float})
+    batch.loc[0, 'user_id'] = 21.5
+
+    with pytest.raises(ValueError, match='user_id'):
+        clean_interactions(batch)
@@ -0,0 +1,60 @@
+import pytest
+
+import app
+
+
+@pytest.fixture
+def client():
+    return app.create_app().test_client()
+
+
+def test_interaction_batch_path_is_not_opened(client, tmp_path):
+    path = tmp_path / 'interactions.csv'
+    path.write_text('user_id,product_id,product_category,interaction,price\n1,100,Toys,1,20.0\n')
+
+    response = client.post('/ingest/interactions', data=str(path), content_type='text/csv')
+
+    assert response.status_code == 400
+    assert 'Missing required columns' in response.get_json()['error']
+
+
+def customer(**overrides):
+    record = {
+        'customer_id': 1001, 'customer_lat': 19.03, 'customer_lon': 73.02, 'avg_purchase_value': 1200,
+        'clothing_frequency': 10, 'electronics_frequency': 5, 'furniture_frequency': 0,
+        'groceries_frequency': 40, 'toys_frequency': 3,
+    }
+    return dict(record, **overrides)
+
+
+@pytest.mark.parametrize('value', ['north', None, float('inf')])
+def test_add_customers_rejects_non_finite_values(client, value):
+    response = client.post('/api/customers', json=[customer(), customer(customer_lat=value)])
+
+    assert response.status_code == 400
+    assert 'customer_lat' in response.get_json()['error']
+
+
+@pytest.mark.parametrize('value, expected', [
+    (3, 3), (3.0, 3), ('7', 7), (' 2 ', 2),
+    (2.5, None), ('2.5', None), ('3.0', None), ('-1', None), (0, None), ('', None), (True, None), (None, None),
+])
+def test_parse_positive_int(value, expected):
+    from app.views import parse_positive_int
+
+    assert parse_positive_int(value) == expected
+
+
+def test_batch_rejects_fractional_n_probe(client):
+    response = client.post('/recommend/batch', json={'user_ids': [1], 'search': 'ann', 'n_probe': 2.5})
+
+    assert response.status_code == 400
+    assert 'n_probe' in response.get_json()['error']
+
+
+@pytest.mark.parametrize('query', ['', '?user_id=', '?user_id=abc', '?user_id=2.5'])
+def test_recommend_rejects_bad_user_id(client, query):
+    response = client.get(f'/recommend{query}')
+
+    assert response.status_code == 400
+    assert 'user_id' in response.get_json()['error']